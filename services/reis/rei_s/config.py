@@ -74,9 +74,20 @@ class Config(BaseSettings):
     )
 
     workers: Annotated[int, Field(gt=0)] = 1
+    # the workers start this many interactive tasks (uploads of single files, previews) for every bulk task
+    workers_interactive_weight: Annotated[int, Field(gt=0)] = 8
     metrics_port: Annotated[int, Field(ge=0)] = 9200
     batch_size: Annotated[int, Field(ge=0)] = 200
     filesize_threshold: Annotated[int, Field(gt=0)] = 10**5
+    worker_pool_size: Annotated[int, Field(gt=0)] | None = None
+    worker_max_tasks_per_process: Annotated[int, Field(gt=0)] = 20
+    worker_task_timeout: Annotated[int, Field(gt=0)] = 900
+    # the pages of large pdfs are split into ranges of this many pages, which are processed by several workers at once
+    worker_pages_per_task: Annotated[int, Field(ge=0)] = 100
+    libreoffice_pool_size: Annotated[int, Field(gt=0)] = 2
+    libreoffice_timeout: Annotated[int, Field(gt=0)] = 300
+    ingestion_queue_size: Annotated[int, Field(gt=0)] = 2
+    embeddings_max_concurrency: Annotated[int, Field(gt=0)] = 1
 
     embeddings_type: Literal[
         "azure-openai", "openai", "openai-compatible", "random-test-embeddings", "ollama", "bedrock", "nvidia"
@@ -108,11 +119,31 @@ class Config(BaseSettings):
     embeddings_nvidia_base_url: str | None = None
     embeddings_nvidia_api_key: SecretStr | None = None
 
+    # cache for the embeddings of search queries, a size of 0 disables the cache
+    query_embeddings_cache_type: Literal["memory", "redis"] = "memory"
+    query_embeddings_cache_size: Annotated[int, Field(ge=0)] = 1000
+    query_embeddings_cache_ttl: Annotated[int, Field(gt=0)] = 3600
+    # needed for the redis query embeddings cache
+    query_embeddings_cache_redis_url: SecretStr | None = None
+
+    # persistent cache for the embeddings of chunks (a sqlite file), unset disables the cache
+    chunk_embeddings_cache_path: str | None = None
+
+    # directory of the durable queue for `POST /jobs` (a sqlite file and the uploads), unset disables the queue
+    job_queue_path: str | None = None
+    # number of threads per process which run jobs, 0 only accepts jobs, e.g., for API-only instances
+    job_queue_workers: Annotated[int, Field(ge=0)] = 1
+    job_queue_lease_seconds: Annotated[int, Field(gt=0)] = 300
+    job_queue_max_attempts: Annotated[int, Field(gt=0)] = 3
+    job_queue_retention_seconds: Annotated[int, Field(gt=0)] = 7 * 24 * 3600
+
     stt_type: Literal["azure-openai-whisper"] | None = None
     stt_azure_openai_whisper_endpoint: str | None = None
     stt_azure_openai_whisper_api_key: SecretStr | None = None
     stt_azure_openai_whisper_api_version: str | None = None
     stt_azure_openai_whisper_deployment_name: str | None = None
+    # number of segments of a recording which are transcribed at the same time
+    stt_max_concurrency: Annotated[int, Field(gt=0)] = 4
 
     store_type: Literal["azure-ai-search", "pgvector", "dev-null"]
     # needed for Azure AI Search vectorstore
@@ -122,8 +153,25 @@ class Config(BaseSettings):
     # needed for pgvector vectorstore
     store_pgvector_url: SecretStr | None = None
     store_pgvector_index_name: str = "index"
+    # `hybrid` combines the vector search with a full text search
+    store_pgvector_search_mode: Literal["vector", "hybrid"] = "vector"
+    # the postgres text search configuration of the full text search, e.g. `simple` or `german`
+    store_pgvector_text_search_config: Annotated[str, Field(pattern=r"^[a-z_]+$")] = "simple"
+    # number of vector and keyword matches which are fused for the results of the hybrid search
+    store_pgvector_hybrid_candidates: Annotated[int, Field(gt=0)] = 50
+    # filter and delete by indexed `bucket` and `doc_id` columns, existing tables need to be migrated first
+    store_pgvector_metadata_columns: bool = False
+    # approximate nearest neighbour index per collection, the parameters are explained in the pgvector docs
+    store_pgvector_ann_index: Literal["none", "hnsw", "ivfflat"] = "none"
+    store_pgvector_hnsw_m: Annotated[int, Field(gt=1)] = 16
+    store_pgvector_hnsw_ef_construction: Annotated[int, Field(gt=0)] = 64
+    store_pgvector_hnsw_ef_search: Annotated[int, Field(gt=0)] = 40
+    store_pgvector_ivfflat_lists: Annotated[int, Field(gt=0)] = 100
+    store_pgvector_ivfflat_probes: Annotated[int, Field(gt=0)] = 1
 
     file_store_type: Literal["s3", "filesystem"] | None = None
+    # seconds to remember whether a document exists, 0 checks the store for every search
+    file_store_exists_cache_ttl: Annotated[int, Field(ge=0)] = 10
     # needed for S3 filestore
     file_store_s3_endpoint_url: str | None = None
     file_store_s3_access_key_id: str | None = None
@@ -132,6 +180,11 @@ class Config(BaseSettings):
     file_store_s3_region_name: str | None = None
     # needed for filesystem filestore
     file_store_filesystem_basepath: str | None = None
+    # directory for local copies of the documents of the S3 file store, unset disables the cache
+    file_store_cache_path: str | None = None
+    file_store_cache_size_mb: Annotated[int, Field(gt=0)] = 1024
+    # seconds until a copy is downloaded again, since documents might be deleted through other instances
+    file_store_cache_max_age: Annotated[int, Field(gt=0)] = 3600
 
     @model_validator(mode="after")
     def store_dependend_requirements(self) -> Self:
@@ -224,6 +277,16 @@ class Config(BaseSettings):
 
         return self
 
+    @model_validator(mode="after")
+    def query_embeddings_cache_dependend_requirements(self) -> Self:
+        if self.query_embeddings_cache_type == "redis":
+            needed_for_redis = {
+                "QUERY_EMBEDDINGS_CACHE_REDIS_URL": self.query_embeddings_cache_redis_url,
+            }
+            check_required_arguments(needed_for_redis, "QUERY_EMBEDDINGS_CACHE_TYPE", "redis")
+
+        return self
+
     @model_validator(mode="after")
     def stt_dependend_requirements(self) -> Self:
         if self.stt_type == "azure-openai-whisper":
@@ -1,5 +1,60 @@
-from prometheus_client import Counter
+from prometheus_client import Counter, Gauge, Histogram
 
 files_processed_counter = Counter("files_processed_total", "Number of files that have been processed.")
 
 files_added_to_queue = Counter("files_added_to_queue_total", "Number of files that have been processed.")
+
+query_embeddings_cache_hits = Counter(
+    "query_embeddings_cache_hits_total", "Number of search queries whose embedding was found in the cache."
+)
+
+query_embeddings_cache_misses = Counter(
+    "query_embeddings_cache_misses_total", "Number of search queries whose embedding had to be computed."
+)
+
+query_embeddings_cache_evictions = Counter(
+    "query_embeddings_cache_evictions_total", "Number of query embeddings evicted from the in-memory cache."
+)
+
+chunk_embeddings_cache_hits = Counter(
+    "chunk_embeddings_cache_hits_total", "Number of chunks whose embedding was found in the cache."
+)
+
+chunk_embeddings_cache_misses = Counter(
+    "chunk_embeddings_cache_misses_total", "Number of chunks whose embedding had to be computed."
+)
+
+embeddings_rate_limited = Counter(
+    "embeddings_rate_limited_total", "Number of embedding requests rejected by the rate limit of the model."
+)
+
+embeddings_concurrency_limit = Gauge(
+    "embeddings_concurrency_limit", "Current number of embedding requests allowed to run concurrently."
+)
+
+jobs_finished_counter = Counter(
+    "jobs_finished_total", "Number of ingestion jobs which completed or finally failed.", ["status"]
+)
+
+scheduler_queue_depth = Gauge(
+    "scheduler_queue_depth", "Number of tasks waiting for a worker, by priority class.", ["priority"]
+)
+
+scheduler_wait_seconds = Histogram(
+    "scheduler_wait_seconds",
+    "Seconds tasks waited for a worker, by priority class.",
+    ["priority"],
+    buckets=(0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+
+file_store_cache_hits = Counter(
+    "file_store_cache_hits_total", "Number of documents read from the local copies of the file store."
+)
+
+file_store_cache_misses = Counter(
+    "file_store_cache_misses_total", "Number of documents which had to be downloaded from the file store."
+)
+
+file_store_cache_evictions = Counter(
+    "file_store_cache_evictions_total", "Number of local copies of documents deleted to make room for new ones."
+)
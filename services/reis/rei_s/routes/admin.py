@@ -0,0 +1,39 @@
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi.params import Query
+from pydantic import AfterValidator
+
+from rei_s.config import Config, get_config
+from rei_s.routes.files import check_index_name
+from rei_s.services import store_service
+
+
+router = APIRouter()
+
+
+@router.post(
+    "/admin/indexes/rebuild",
+    tags=["admin"],
+    operation_id="rebuildIndexes",
+    status_code=202,
+    responses={
+        422: {
+            "description": "Validation error",
+        },
+    },
+)
+def rebuild_indexes(
+    config: Annotated[Config, Depends(get_config)],
+    background_tasks: BackgroundTasks,
+    index_name: Annotated[
+        Optional[str], Query(description="The name of the index", alias="indexName"), AfterValidator(check_index_name)
+    ] = None,
+    recreate: Annotated[
+        bool, Query(description="Replace the indexes with new ones using the current index parameters")
+    ] = False,
+) -> None:
+    """
+    Rebuilds the search indexes of the vector store in the background, without blocking searches and uploads.
+    """
+    background_tasks.add_task(store_service.rebuild_index, config, index_name, recreate)
@@ -1,18 +1,24 @@
 import re
 from typing import Annotated, List, Optional
-from asyncio import wrap_future
+from asyncio import to_thread, wrap_future
 import uuid
 import aiofiles
 from urllib.parse import unquote
 
-from fastapi import APIRouter, Depends, Request, Header, Response, HTTPException
+from fastapi import APIRouter, Depends, File, Form, Request, Header, Response, HTTPException, UploadFile
 from fastapi.params import Query
 
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import AfterValidator
 from rei_s.services import store_service
+from rei_s.services.filestore_adapter import DocumentChangedError, DocumentReader
+from rei_s.services.vectorstore_adapter import SearchTuning
 from rei_s.config import Config, get_config
 from rei_s.types.dtos import (
+    BatchSearchRequest,
+    BatchSearchResult,
+    BatchUploadResult,
     FileProcessResult,
     ResultDocument,
     FileResult,
@@ -28,6 +34,11 @@ from rei_s.metrics.metrics import files_added_to_queue
 router = APIRouter()
 
 
+def get_tenant(bucket: str, index_name: str | None) -> str:
+    # the workers are shared fairly between the tenants, see `FairScheduler`
+    return bucket if index_name is None else f"{index_name}/{bucket}"
+
+
 def check_index_name(index_name: str) -> str | None:
     # We enforce the most strict subset of rules to satisfy all vector stores
     # (at the moment that are just the Azure AI Search rules)
@@ -43,6 +54,42 @@ def check_index_name(index_name: str) -> str | None:
     return index_name
 
 
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def parse_range_header(range_header: str, size: int) -> tuple[int, int] | None:
+    """Returns the start and the end (exclusive) of the requested range, `None` means the whole document."""
+    unit, _, byte_range = range_header.partition("=")
+    # multiple ranges are not supported, the standard allows to send the whole document instead
+    if unit.strip() != "bytes" or "," in byte_range:
+        return None
+
+    first, separator, last = byte_range.strip().partition("-")
+    try:
+        if not separator:
+            return None
+        if first == "":
+            # the last bytes of the document, `bytes=-0` can not be satisfied
+            length = int(last)
+            start, end = (max(size - length, 0), size) if length > 0 else (0, 0)
+        else:
+            start = int(first)
+            end = size if last == "" else min(int(last) + 1, size)
+            if end <= start and start < size:
+                return None
+    except ValueError:
+        # invalid ranges are ignored
+        return None
+
+    if start < 0 or start >= end:
+        raise HTTPException(
+            status_code=416, detail="Range not satisfiable", headers={"content-range": f"bytes */{size}"}
+        )
+    return start, end
+
+
 @router.get("/files/types", tags=["files"], operation_id="getFileTypes")
 async def get_file_types(config: Annotated[Config, Depends(get_config)]) -> FileTypesResult:
     """
@@ -64,7 +111,7 @@ async def get_file_types(config: Annotated[Config, Depends(get_config)]) -> File
         },
     },
 )
-def get_files(
+async def get_files(
     config: Annotated[Config, Depends(get_config)],
     query: Annotated[str, Query(description="The query from the internal tool")],
     take: Annotated[int, Query(description="The number of results to return")],
@@ -76,27 +123,83 @@ def get_files(
         Optional[str],
         Query(description="Comma separated list of file IDs to restrict the query. Can be ignored if empty"),
     ] = None,
+    ef_search: Annotated[
+        Optional[int], Query(description="Overrides ef_search of HNSW vector indexes", alias="efSearch", gt=0)
+    ] = None,
+    probes: Annotated[Optional[int], Query(description="Overrides probes of IVFFlat vector indexes", gt=0)] = None,
 ) -> FileResult:
     """
     Get the files matching the query.
     """
     file_ids = files.split(",") if files is not None else None
-    store_docs = store_service.search(config, query, bucket, take, file_ids, index_name)
+    tuning = SearchTuning(ef_search=ef_search, probes=probes)
+    store_docs = await store_service.search(config, query, bucket, take, file_ids, index_name, tuning)
 
     docs = [ResultDocument(content=doc.page_content, metadata=getattr(doc, "metadata", {})) for doc in store_docs]
 
     debug = store_service.get_file_sources_markdown(store_docs)
 
-    sources = store_service.get_file_sources(config, store_docs)
+    # the file store is only available with a sync client
+    sources = await to_thread(store_service.get_file_sources, config, store_docs)
     return FileResult(files=docs, debug=debug, sources=sources)
 
 
+@router.post(
+    "/files/search/batch",
+    tags=["files"],
+    operation_id="searchFilesBatch",
+    responses={
+        422: {
+            "description": "Validation error",
+        },
+    },
+)
+async def search_files_batch(
+    config: Annotated[Config, Depends(get_config)],
+    search_request: BatchSearchRequest,
+) -> BatchSearchResult:
+    """
+    Get the files matching each of the queries.
+
+    The queries are embedded concurrently and searched at once, the results are in the order of the queries.
+    """
+    try:
+        index_name = check_index_name(search_request.index_name) if search_request.index_name is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+    tuning = SearchTuning(ef_search=search_request.ef_search, probes=search_request.probes)
+    results = await store_service.search_batch(
+        config,
+        search_request.queries,
+        search_request.bucket,
+        search_request.take,
+        search_request.files,
+        index_name,
+        tuning,
+    )
+
+    # the download availability of documents found by several queries is only looked up once
+    exists = await to_thread(store_service.get_download_availability, config, [doc for docs in results for doc in docs])
+
+    return BatchSearchResult(
+        results=[
+            FileResult(
+                files=[ResultDocument(content=doc.page_content, metadata=getattr(doc, "metadata", {})) for doc in docs],
+                debug=store_service.get_file_sources_markdown(docs),
+                sources=store_service.get_file_sources(config, docs, exists),
+            )
+            for docs in results
+        ]
+    )
+
+
 @router.get(
     "/documents/content",
     tags=["files"],
     operation_id="getDocumentsContent",
 )
-def get_documents_content(
+async def get_documents_content(
     config: Annotated[Config, Depends(get_config)],
     chunk_ids: Annotated[List[str], Query(description="The IDs of the chunks to retrieve")],
     index_name: Annotated[
@@ -106,7 +209,7 @@ def get_documents_content(
     """
     Get the documents content by their IDs.
     """
-    content = store_service.get_documents_content(config, chunk_ids, index_name)
+    content = await store_service.get_documents_content(config, chunk_ids, index_name)
 
     return content
 
@@ -118,24 +221,94 @@ def get_documents_content(
     response_class=FileResponse,
     responses={
         200: {"content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}},
+        206: {
+            "description": "The requested range of the pdf",
+            "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+        },
+        304: {
+            "description": "Not Modified",
+        },
         404: {
             "description": "File Not Found",
         },
+        416: {
+            "description": "Range Not Satisfiable",
+        },
     },
 )
 def get_document_pdf(
     config: Annotated[Config, Depends(get_config)],
+    request: Request,
     doc_id: Annotated[str, Query(description="The ID of the document")],
 ) -> Response:
     """
     Get the document's pdf by its ID.
-    """
-    content = store_service.get_document_pdf(config, doc_id)
 
-    if content is None:
+    Supports a single `Range` (with `If-Range`) to get a part of the pdf and `If-None-Match` with the `ETag`
+    of a previous response.
+    """
+    try:
+        try:
+            return document_pdf_response(config, request, doc_id)
+        except DocumentChangedError:
+            # the pdf was replaced while it was opened, the headers need to describe the new one
+            return document_pdf_response(config, request, doc_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail="PDF not found") from e
+
+
+def document_pdf_response(config: Config, request: Request, doc_id: str) -> Response:
+    document = store_service.get_document_pdf(config, doc_id)
+    if document is None:
         raise HTTPException(status_code=404, detail="PDF not found")
 
-    return FileResponse(content.path, media_type="application/octet-stream")
+    try:
+        response = reader_response(request, document)
+    except BaseException:
+        document.close()
+        raise
+    # the reader is closed after the response was sent
+    response.background = BackgroundTask(document.close)
+    return response
+
+
+def reader_response(request: Request, document: DocumentReader) -> Response:
+    etag = f'"{document.content_hash}"'
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"etag": etag})
+
+    if document.path is not None:
+        # the file response handles the ranges itself
+        return FileResponse(document.path, media_type="application/octet-stream", headers={"etag": etag})
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    # with `If-Range`, a range is only sent if the pdf did not change, otherwise the whole pdf is sent
+    if range_header is not None and request.headers.get("if-range", etag) == etag:
+        byte_range = parse_range_header(range_header, document.size)
+
+    # the document is sent while it is downloaded from the store, without a copy in memory or on disk,
+    # but the download is started here, such that its errors are not hidden behind a successful status
+    headers = {"etag": etag, "accept-ranges": "bytes"}
+    if byte_range is None:
+        return StreamingResponse(
+            document.iter_chunks(),
+            media_type="application/octet-stream",
+            headers={**headers, "content-length": str(document.size)},
+        )
+
+    start, end = byte_range
+    return StreamingResponse(
+        document.iter_chunks(start, end),
+        status_code=206,
+        media_type="application/octet-stream",
+        headers={
+            **headers,
+            "content-length": str(end - start),
+            "content-range": f"bytes {start}-{end - 1}/{document.size}",
+        },
+    )
 
 
 @router.post(
@@ -185,8 +358,14 @@ async def post_files(
     try:
         files_added_to_queue.inc()
         await wrap_future(
-            request.app.state.executor.submit(
-                store_service.process_and_add_file, config, q, bucket, index_name=index_name
+            request.app.state.executor.schedule(
+                "interactive",
+                get_tenant(bucket, index_name),
+                store_service.process_and_add_file,
+                config,
+                q,
+                bucket,
+                index_name=index_name,
             )
         )
     except Exception as e:
@@ -196,6 +375,75 @@ async def post_files(
         q.delete()
 
 
+@router.post(
+    "/files/batch",
+    tags=["files"],
+    operation_id="uploadFiles",
+    responses={
+        422: {
+            "description": "Validation error",
+        },
+    },
+)
+async def post_files_batch(
+    config: Annotated[Config, Depends(get_config)],
+    request: Request,
+    files: Annotated[list[UploadFile], File(description="The files, with their file names and mime types")],
+    ids: Annotated[list[str], Form(description="The IDs of the files, in the order of the files")],
+    bucket: Annotated[str, Form()],
+    index_name: Annotated[
+        str | None, Form(description="The name of the index", alias="indexName"), AfterValidator(check_index_name)
+    ] = None,
+) -> BatchUploadResult:
+    """
+    Processes many files into chunks and stores them in the vector store.
+
+    The chunks of all files are embedded and written together, which is much faster than a request per file
+    for many small files. Files which can not be added do not fail the request, see the status of every file.
+    """
+    if len(ids) != len(files):
+        raise HTTPException(status_code=422, detail="Every file needs an ID")
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=422, detail="The IDs of the files must be unique")
+
+    source_files: list[SourceFile] = []
+    try:
+        for file_id, upload in zip(ids, files, strict=True):
+            dest_path = get_new_file_path(file_id)
+            async with aiofiles.open(dest_path, "wb") as temp_file:
+                while chunk := await upload.read(1024 * 1024):
+                    await temp_file.write(chunk)
+            source_files.append(
+                SourceFile(
+                    id=file_id,
+                    path=dest_path,
+                    file_name=unquote(upload.filename or file_id),
+                    mime_type=upload.content_type or "",
+                )
+            )
+
+        files_added_to_queue.inc(len(source_files))
+        statuses = await wrap_future(
+            request.app.state.executor.schedule(
+                "bulk",
+                get_tenant(bucket, index_name),
+                store_service.add_files,
+                config,
+                source_files,
+                bucket,
+                index_name=index_name,
+            )
+        )
+    except Exception as e:
+        logger.error(f"Error response from task: {e}")
+        raise
+    finally:
+        for source_file in source_files:
+            source_file.delete()
+
+    return BatchUploadResult(files=statuses)
+
+
 @router.post(
     "/files/process",
     tags=["files"],
@@ -252,7 +500,7 @@ async def post_files_only_processing(
 
 
 @router.delete("/files/{file_id}", tags=["files"], operation_id="deleteFile")
-def delete_files(
+async def delete_files(
     config: Annotated[Config, Depends(get_config)],
     file_id: str,
     index_name: Annotated[
@@ -262,4 +510,4 @@ def delete_files(
     """
     Deletes all chunks belonging to the specified file in the vector store.
     """
-    store_service.delete_file(config, file_id, index_name)
+    await store_service.delete_file(config, file_id, index_name)
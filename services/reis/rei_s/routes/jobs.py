@@ -0,0 +1,100 @@
+from asyncio import to_thread
+from typing import Annotated
+from urllib.parse import unquote
+
+import aiofiles
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from pydantic import AfterValidator
+
+from rei_s.config import Config, get_config
+from rei_s.metrics.metrics import files_added_to_queue
+from rei_s.routes.files import check_index_name
+from rei_s.services.job_queue import Job, JobQueue, get_job_queue
+from rei_s.types.dtos import JobDto
+from rei_s.types.source_file import SourceFile
+from rei_s.utils import get_new_file_path
+
+
+router = APIRouter()
+
+
+def job_queue(config: Annotated[Config, Depends(get_config)]) -> JobQueue:
+    queue = get_job_queue(config)
+    if queue is None:
+        raise HTTPException(status_code=501, detail="The job queue is not configured")
+    return queue
+
+
+def to_dto(job: Job) -> JobDto:
+    return JobDto.model_validate(job.model_dump())
+
+
+@router.post(
+    "/jobs",
+    tags=["jobs"],
+    operation_id="createJob",
+    status_code=202,
+    responses={
+        422: {
+            "description": "Validation error",
+        },
+        501: {
+            "description": "Job queue not configured",
+        },
+    },
+)
+async def post_job(
+    queue: Annotated[JobQueue, Depends(job_queue)],
+    request: Request,
+    file_name: Annotated[str, Header(alias="fileName")],
+    file_mime_type: Annotated[str, Header(alias="fileMimeType")],
+    bucket: Annotated[str, Header()],
+    file_id: Annotated[str, Header(description="The ID of the file", alias="id")],
+    index_name: Annotated[
+        str | None, Header(description="The name of the index", alias="indexName"), AfterValidator(check_index_name)
+    ] = None,
+) -> JobDto:
+    """
+    Queues the file to be processed into chunks and stored in the vector store, like the POST /files endpoint.
+
+    In contrast to the POST /files endpoint, this one returns as soon as the file is queued.
+    Use GET /jobs/{job_id} to follow the progress.
+    """
+    dest_path = get_new_file_path(file_id)
+    async with aiofiles.open(dest_path, "wb") as temp_file:
+        async for chunk in request.stream():
+            await temp_file.write(chunk)
+
+    q = SourceFile(id=file_id, path=dest_path, file_name=unquote(file_name), mime_type=file_mime_type)
+    try:
+        # the queue might be on another file system, so moving the file can take a while
+        job = await to_thread(queue.enqueue, q, bucket, index_name)
+    finally:
+        q.delete()
+    files_added_to_queue.inc()
+
+    return to_dto(job)
+
+
+@router.get(
+    "/jobs/{job_id}",
+    tags=["jobs"],
+    operation_id="getJob",
+    responses={
+        404: {
+            "description": "Job Not Found",
+        },
+        501: {
+            "description": "Job queue not configured",
+        },
+    },
+)
+def get_job(queue: Annotated[JobQueue, Depends(job_queue)], job_id: str) -> JobDto:
+    """
+    Get the status and the progress of the job.
+    """
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return to_dto(job)
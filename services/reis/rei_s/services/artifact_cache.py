@@ -0,0 +1,60 @@
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, TypeVar, cast
+
+from rei_s import logger
+from rei_s.services.ttl_cache import TtlLruCache
+from rei_s.types.source_file import SourceFile
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class _KeyLock:
+    lock: Lock = field(default_factory=Lock)
+    # the threads which hold or wait for the lock, it is removed when the last one is done
+    users: int = 0
+
+
+class ArtifactCache:
+    """Caches intermediate results of processing a file, keyed by the kind of the result and the hash of the content.
+
+    Some format providers need the same expensive intermediate result for chunking and for the pdf preview,
+    e.g., the transcript of a recording. With this cache it is only computed once per upload.
+    Concurrent requests for the same artifact wait for the first computation instead of starting their own.
+    """
+
+    def __init__(self, max_size: int = 32, ttl: float = 3600) -> None:
+        self.cache: TtlLruCache[str, Any] = TtlLruCache(max_size, ttl)
+        self._lock = Lock()
+        self._key_locks: dict[str, _KeyLock] = {}
+
+    def get_or_compute(self, kind: str, file: SourceFile, compute: Callable[[], T]) -> T:
+        key = f"{kind}:{file.content_hash}"
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, _KeyLock())
+            key_lock.users += 1
+
+        try:
+            with key_lock.lock:
+                value = self.cache.get(key)
+                if value is not None:
+                    logger.info(f"reuse {kind} of file {file.id}")
+                    return cast(T, value)
+
+                value = compute()
+                self.cache.set(key, value)
+                return value
+        finally:
+            with self._lock:
+                key_lock.users -= 1
+                if key_lock.users == 0:
+                    del self._key_locks[key]
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+artifact_cache = ArtifactCache()
@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+from threading import Condition
+from typing import Callable, Generator
+
+
+class AdaptiveConcurrencyLimiter:
+    """Limits the number of concurrent calls to a rate limited API.
+
+    The limit follows an AIMD policy like TCP congestion control: it is halved when the API signals a rate limit
+    and increased by one after `limit` successful calls in a row, but it never exceeds `max_limit`.
+    One instance is meant to be shared by all callers of the same API in the process.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, on_change: Callable[[int], None] | None = None) -> None:
+        if max_limit < min_limit or min_limit <= 0:
+            raise ValueError("0 < min_limit <= max_limit is required")
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.on_change = on_change
+        self.limit = max_limit
+        self._in_flight = 0
+        self._successes = 0
+        # increased on every decrease, to identify calls which were started before the last decrease
+        self._epoch = 0
+        self._condition = Condition()
+
+        if self.on_change is not None:
+            self.on_change(self.limit)
+
+    @contextmanager
+    def slot(self) -> Generator[int, None, None]:
+        """Waits until a call is allowed. Yields a token which needs to be passed to `on_rate_limit`."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+            epoch = self._epoch
+        try:
+            yield epoch
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self) -> None:
+        with self._condition:
+            if self.limit >= self.max_limit:
+                return
+            self._successes += 1
+            if self._successes < self.limit:
+                return
+            self._successes = 0
+            self.limit += 1
+            limit = self.limit
+            self._condition.notify_all()
+
+        if self.on_change is not None:
+            self.on_change(limit)
+
+    def on_rate_limit(self, epoch: int) -> None:
+        with self._condition:
+            # concurrent calls usually hit the rate limit together, we only back off once per burst
+            if epoch != self._epoch:
+                return
+            self._epoch += 1
+            self._successes = 0
+            self.limit = max(self.min_limit, self.limit // 2)
+            limit = self.limit
+
+        if self.on_change is not None:
+            self.on_change(limit)
@@ -0,0 +1,345 @@
+from abc import ABC, abstractmethod
+from array import array
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import hashlib
+import os
+import sqlite3
+from threading import Lock
+import unicodedata
+
+from langchain_core.embeddings import Embeddings
+
+from rei_s import logger
+from rei_s.config import Config
+from rei_s.metrics.metrics import (
+    chunk_embeddings_cache_hits,
+    chunk_embeddings_cache_misses,
+    query_embeddings_cache_evictions,
+    query_embeddings_cache_hits,
+    query_embeddings_cache_misses,
+)
+from rei_s.services.embeddings_provider import get_embeddings_model_name
+from rei_s.services.ttl_cache import TtlLruCache
+
+
+# upper bound for the requests which embed the queries of a single search
+MAX_CONCURRENT_QUERIES = 8
+
+
+def normalize_query(query: str) -> str:
+    # queries which only differ in unicode representation or whitespace get the same embedding
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+def serialize_vector(vector: list[float]) -> bytes:
+    return array("d", vector).tobytes()
+
+
+def deserialize_vector(buffer: bytes) -> list[float]:
+    return array("d", buffer).tolist()
+
+
+class QueryEmbeddingsCacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> list[float] | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, vector: list[float]) -> None:
+        raise NotImplementedError
+
+    async def aget(self, key: str) -> list[float] | None:
+        # network backends must not block the event loop
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, vector: list[float]) -> None:
+        await asyncio.to_thread(self.set, key, vector)
+        return None
+
+
+class InMemoryQueryEmbeddingsCacheBackend(QueryEmbeddingsCacheBackend):
+    def __init__(self, max_size: int, ttl: int) -> None:
+        self.cache: TtlLruCache[str, list[float]] = TtlLruCache(
+            max_size, ttl, on_evict=query_embeddings_cache_evictions.inc
+        )
+
+    def get(self, key: str) -> list[float] | None:
+        return self.cache.get(key)
+
+    def set(self, key: str, vector: list[float]) -> None:
+        self.cache.set(key, vector)
+
+    async def aget(self, key: str) -> list[float] | None:
+        return self.get(key)
+
+    async def aset(self, key: str, vector: list[float]) -> None:
+        self.set(key, vector)
+        return None
+
+
+class RedisQueryEmbeddingsCacheBackend(QueryEmbeddingsCacheBackend):
+    """Shares the cache between all REI-S instances. Size bounds and eviction are left to redis."""
+
+    key_prefix = "reis:query-embeddings:"
+
+    def __init__(self, url: str, ttl: int) -> None:
+        # redis is an optional dependency, only needed if this backend is configured
+        try:
+            import redis  # ty: ignore[unresolved-import]
+        except ImportError as e:
+            raise ValueError("QUERY_EMBEDDINGS_CACHE_TYPE=redis needs the `redis` package to be installed") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str) -> list[float] | None:
+        buffer = self.client.get(self.key_prefix + key)
+        if buffer is None:
+            return None
+        return deserialize_vector(buffer)
+
+    def set(self, key: str, vector: list[float]) -> None:
+        self.client.set(self.key_prefix + key, serialize_vector(vector), ex=self.ttl)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Wraps an embeddings client and caches the embeddings of queries.
+
+    Document embeddings are passed through, since they are hardly ever repeated.
+    """
+
+    def __init__(self, embeddings: Embeddings, backend: QueryEmbeddingsCacheBackend, model_name: str) -> None:
+        self.embeddings = embeddings
+        self.backend = backend
+        self.model_name = model_name
+
+    def cache_key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_query(text).encode()).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    def _get(self, key: str) -> list[float] | None:
+        # the cache is an optimization, it must never break the search
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read from the query embeddings cache: {e!r}")
+            return None
+
+    def _set(self, key: str, vector: list[float]) -> None:
+        try:
+            self.backend.set(key, vector)
+        except Exception as e:
+            logger.warning(f"Failed to write to the query embeddings cache: {e!r}")
+
+    async def _aget(self, key: str) -> list[float] | None:
+        try:
+            return await self.backend.aget(key)
+        except Exception as e:
+            logger.warning(f"Failed to read from the query embeddings cache: {e!r}")
+            return None
+
+    async def _aset(self, key: str, vector: list[float]) -> None:
+        try:
+            await self.backend.aset(key, vector)
+        except Exception as e:
+            logger.warning(f"Failed to write to the query embeddings cache: {e!r}")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def _lookup(self, keys: list[str], texts: list[str]) -> tuple[dict[str, list[float]], dict[str, str]]:
+        vectors: dict[str, list[float]] = {}
+        for key in set(keys):
+            vector = self._get(key)
+            if vector is not None:
+                vectors[key] = vector
+        return vectors, self._missing(keys, texts, vectors)
+
+    async def _alookup(self, keys: list[str], texts: list[str]) -> tuple[dict[str, list[float]], dict[str, str]]:
+        unique_keys = list(set(keys))
+        found = await asyncio.gather(*(self._aget(key) for key in unique_keys))
+        vectors = {key: vector for key, vector in zip(unique_keys, found, strict=True) if vector is not None}
+        return vectors, self._missing(keys, texts, vectors)
+
+    @staticmethod
+    def _missing(keys: list[str], texts: list[str], vectors: dict[str, list[float]]) -> dict[str, str]:
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts, strict=True):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        query_embeddings_cache_hits.inc(len(texts) - len(missing))
+        query_embeddings_cache_misses.inc(len(missing))
+        return missing
+
+    def _store(self, vectors: dict[str, list[float]], new_vectors: dict[str, list[float]]) -> None:
+        for key, vector in new_vectors.items():
+            self._set(key, vector)
+        vectors.update(new_vectors)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_queries([text])[0]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_queries([text]))[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Embeds several queries, the queries missing in the cache are embedded concurrently."""
+        keys = [self.cache_key(text) for text in texts]
+        vectors, missing = self._lookup(keys, texts)
+
+        if missing:
+            new_vectors = embed_each_query(self.embeddings, list(missing.values()))
+            self._store(vectors, dict(zip(missing.keys(), new_vectors, strict=True)))
+
+        return [vectors[key] for key in keys]
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        keys = [self.cache_key(text) for text in texts]
+        vectors, missing = await self._alookup(keys, texts)
+
+        if missing:
+            new_vectors = dict(
+                zip(missing.keys(), await aembed_each_query(self.embeddings, list(missing.values())), strict=True)
+            )
+            await asyncio.gather(*(self._aset(key, vector) for key, vector in new_vectors.items()))
+            vectors.update(new_vectors)
+
+        return [vectors[key] for key in keys]
+
+
+def embed_each_query(embeddings: Embeddings, texts: list[str]) -> list[list[float]]:
+    # `embed_documents` would need only a single request, but some models embed queries differently,
+    # e.g., NVIDIA with the `query` instead of the `passage` model type or Cohere with `search_query`
+    if len(texts) == 1:
+        return [embeddings.embed_query(texts[0])]
+    with ThreadPoolExecutor(max_workers=min(len(texts), MAX_CONCURRENT_QUERIES)) as executor:
+        return list(executor.map(embeddings.embed_query, texts))
+
+
+def embed_queries(embeddings: Embeddings, texts: list[str]) -> list[list[float]]:
+    if isinstance(embeddings, CachedQueryEmbeddings):
+        return embeddings.embed_queries(texts)
+    return embed_each_query(embeddings, texts)
+
+
+async def aembed_each_query(embeddings: Embeddings, texts: list[str]) -> list[list[float]]:
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+
+    async def embed(text: str) -> list[float]:
+        async with semaphore:
+            return await embeddings.aembed_query(text)
+
+    return list(await asyncio.gather(*(embed(text) for text in texts)))
+
+
+async def aembed_queries(embeddings: Embeddings, texts: list[str]) -> list[list[float]]:
+    if isinstance(embeddings, CachedQueryEmbeddings):
+        return await embeddings.aembed_queries(texts)
+    return await aembed_each_query(embeddings, texts)
+
+
+def get_query_embeddings_cache_backend(config: Config) -> QueryEmbeddingsCacheBackend | None:
+    if config.query_embeddings_cache_type == "redis":
+        # this is ensured by the config validation, the following lines are there to help the ty typechecker
+        if config.query_embeddings_cache_redis_url is None:
+            raise ValueError("The env variable `QUERY_EMBEDDINGS_CACHE_REDIS_URL` is missing.")
+        return RedisQueryEmbeddingsCacheBackend(
+            config.query_embeddings_cache_redis_url.get_secret_value(), config.query_embeddings_cache_ttl
+        )
+
+    if config.query_embeddings_cache_size == 0:
+        return None
+
+    return InMemoryQueryEmbeddingsCacheBackend(config.query_embeddings_cache_size, config.query_embeddings_cache_ttl)
+
+
+def with_query_cache(config: Config, embeddings: Embeddings) -> Embeddings:
+    backend = get_query_embeddings_cache_backend(config)
+    if backend is None:
+        return embeddings
+    return CachedQueryEmbeddings(embeddings, backend, get_embeddings_model_name(config))
+
+
+class ChunkEmbeddingsCache:
+    """Persistent cache for the embeddings of chunks, keyed by the model name and the hash of the content.
+
+    Documents are often deleted and uploaded again without changes, e.g., by nightly sync jobs.
+    With this cache unchanged chunks do not need to be embedded again.
+    The cache is a sqlite database, such that it can be shared by multiple processes on the same host.
+    """
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self.connection:
+            # WAL allows concurrent readers while another process writes
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_embeddings ("
+                "model TEXT NOT NULL, content_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, content_hash))"
+            )
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get_many(self, model: str, content_hashes: list[str]) -> dict[str, list[float]]:
+        result: dict[str, list[float]] = {}
+        # stay well below sqlite's limit of variables per statement
+        for i in range(0, len(content_hashes), 500):
+            part = content_hashes[i : i + 500]
+            placeholders = ", ".join("?" for _ in part)
+            with self._lock:
+                rows = self.connection.execute(
+                    "SELECT content_hash, vector FROM chunk_embeddings "
+                    f"WHERE model = ? AND content_hash IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+            result.update({content_hash: deserialize_vector(vector) for content_hash, vector in rows})
+
+        return result
+
+    def set_many(self, model: str, vectors: dict[str, list[float]]) -> None:
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings (model, content_hash, vector) VALUES (?, ?, ?)",
+                [(model, content_hash, serialize_vector(vector)) for content_hash, vector in vectors.items()],
+            )
+
+    def embed_documents(self, embeddings: Embeddings, model: str, texts: list[str]) -> list[list[float]]:
+        """Embeds the texts, but only calls the embeddings model for texts missing in the cache."""
+        hashes = [self.content_hash(text) for text in texts]
+        cached = self.get_many(model, list(set(hashes)))
+
+        missing: dict[str, str] = {}
+        for content_hash, text in zip(hashes, texts, strict=True):
+            if content_hash not in cached:
+                missing[content_hash] = text
+
+        chunk_embeddings_cache_hits.inc(len(texts) - len(missing))
+        chunk_embeddings_cache_misses.inc(len(missing))
+
+        if missing:
+            new_vectors = dict(zip(missing.keys(), embeddings.embed_documents(list(missing.values())), strict=True))
+            self.set_many(model, new_vectors)
+            cached.update(new_vectors)
+
+        return [cached[content_hash] for content_hash in hashes]
+
+
+@lru_cache
+def get_chunk_embeddings_cache(config: Config) -> ChunkEmbeddingsCache | None:
+    if config.chunk_embeddings_cache_path is None:
+        return None
+    return ChunkEmbeddingsCache(config.chunk_embeddings_cache_path)
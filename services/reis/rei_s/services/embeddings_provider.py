@@ -101,3 +101,18 @@ def get_embeddings(config: Config) -> Embeddings:
         return FakeEmbeddings(size=3072)
     else:
         raise ValueError(f"Unknown embedding type: {config.embeddings_type}")
+
+
+def get_embeddings_model_name(config: Config) -> str:
+    """A name identifying the embedding model, such that vectors of different models are never mixed up."""
+    embeddings_type = config.embeddings_type.lower()
+    model_names = {
+        "openai": config.embeddings_openai_model_name,
+        "openai-compatible": config.embeddings_openai_compatible_model_name,
+        "ollama": config.embeddings_ollama_model_name,
+        "azure-openai": config.embeddings_azure_openai_model_name,
+        "bedrock": config.embeddings_bedrock_model_id,
+        "nvidia": config.embeddings_nvidia_model,
+        "random-test-embeddings": "random",
+    }
+    return f"{embeddings_type}:{model_names.get(embeddings_type)}"
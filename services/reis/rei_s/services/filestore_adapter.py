@@ -1,8 +1,41 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
 
 from rei_s.types.source_file import SourceFile
 
 
+class DocumentChangedError(Exception):
+    """The document was replaced after it was opened."""
+
+
+class DocumentReader(ABC):
+    """An opened document of a file store, which is read in chunks instead of loading it into memory."""
+
+    size: int
+    # the hash of the content, which is stored with the document
+    content_hash: str
+
+    @property
+    def path(self) -> Path | None:
+        # set, if the document is a file on the local disk, which can be sent to the client directly
+        return None
+
+    @abstractmethod
+    def iter_chunks(self, start: int = 0, end: int | None = None, chunk_size: int = 2**20) -> Iterator[bytes]:
+        """Returns an iterator over the bytes from `start` up to, but excluding, `end`.
+
+        The document is opened when this is called, not when the iteration starts, such that errors are raised
+        before a response is sent.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        # releases the resources of the reader, after its chunks were read
+        return None
+
+
 class FileStoreAdapter(ABC):
     @abstractmethod
     def add_document(self, document: SourceFile) -> None:
@@ -16,6 +49,20 @@ class FileStoreAdapter(ABC):
     def get_document(self, doc_id: str) -> SourceFile:
         raise NotImplementedError
 
+    @abstractmethod
+    def open_document(self, doc_id: str) -> DocumentReader:
+        """Opens the document for reading, the caller needs to close the reader."""
+        raise NotImplementedError
+
     @abstractmethod
     def exists(self, doc_id: str) -> bool:
         raise NotImplementedError
+
+    def exists_many(self, doc_ids: Iterable[str]) -> dict[str, bool]:
+        """Checks whether the documents exist. By default, the checks run concurrently."""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        if len(doc_ids) <= 1:
+            return {doc_id: self.exists(doc_id) for doc_id in doc_ids}
+
+        with ThreadPoolExecutor(max_workers=min(len(doc_ids), 16), thread_name_prefix="exists") as executor:
+            return dict(zip(doc_ids, executor.map(self.exists, doc_ids), strict=True))
@@ -1,18 +1,36 @@
+from functools import lru_cache
+
 from rei_s.config import Config
 from rei_s.services.filestore_adapter import FileStoreAdapter
+from rei_s.services.filestores.cached import CachedFileStoreAdapter
+from rei_s.services.filestores.disk_cache import DiskCachedFileStoreAdapter
 from rei_s.services.filestores.filesystem import FSFileStoreAdapter
 from rei_s.services.filestores.s3 import S3FileStoreAdapter
 
 
+# the adapters are shared, such that the clients and the cache of existing documents are reused
+@lru_cache
 def get_filestore(
     config: Config,
 ) -> FileStoreAdapter | None:
+    file_store: FileStoreAdapter
     if config.file_store_type is None:
         # this is an optional feature
         return None
     elif config.file_store_type == "filesystem":
-        return FSFileStoreAdapter.create(config=config)
+        file_store = FSFileStoreAdapter.create(config=config)
     elif config.file_store_type == "s3":
-        return S3FileStoreAdapter.create(config=config)
+        file_store = S3FileStoreAdapter.create(config=config)
+        if config.file_store_cache_path is not None:
+            file_store = DiskCachedFileStoreAdapter(
+                file_store,
+                config.file_store_cache_path,
+                config.file_store_cache_size_mb * 2**20,
+                config.file_store_cache_max_age,
+            )
     else:
         raise ValueError(f"Store type {config.file_store_type} not supported")
+
+    if config.file_store_exists_cache_ttl == 0:
+        return file_store
+    return CachedFileStoreAdapter(file_store, config.file_store_exists_cache_ttl)
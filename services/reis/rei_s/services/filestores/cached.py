@@ -0,0 +1,57 @@
+from typing import Iterable
+
+from rei_s.services.filestore_adapter import DocumentReader, FileStoreAdapter
+from rei_s.services.ttl_cache import TtlLruCache
+from rei_s.types.source_file import SourceFile
+
+
+class CachedFileStoreAdapter(FileStoreAdapter):
+    """Remembers for `ttl` seconds that documents exist, since every search checks all its documents.
+
+    Missing documents are not remembered, since the chunks of a file are searchable before its preview is written.
+    The entries of a document are dropped when it is added or deleted through this process.
+    Deletions by other processes are only seen after the entries expired.
+    """
+
+    def __init__(self, file_store: FileStoreAdapter, ttl: float, max_size: int = 10000) -> None:
+        self.file_store = file_store
+        self.cache: TtlLruCache[str, bool] = TtlLruCache(max_size, ttl)
+
+    def add_document(self, document: SourceFile) -> None:
+        try:
+            self.file_store.add_document(document)
+        finally:
+            self.cache.delete(document.id)
+
+    def delete(self, doc_id: str) -> None:
+        try:
+            self.file_store.delete(doc_id)
+        finally:
+            self.cache.delete(doc_id)
+
+    def get_document(self, doc_id: str) -> SourceFile:
+        return self.file_store.get_document(doc_id)
+
+    def open_document(self, doc_id: str) -> DocumentReader:
+        return self.file_store.open_document(doc_id)
+
+    def exists(self, doc_id: str) -> bool:
+        return self.exists_many([doc_id])[doc_id]
+
+    def exists_many(self, doc_ids: Iterable[str]) -> dict[str, bool]:
+        result: dict[str, bool] = {}
+        missing: list[str] = []
+        for doc_id in doc_ids:
+            cached = self.cache.get(doc_id)
+            if cached is None:
+                missing.append(doc_id)
+            else:
+                result[doc_id] = cached
+
+        if missing:
+            checked = self.file_store.exists_many(missing)
+            for doc_id, exists in checked.items():
+                if exists:
+                    self.cache.set(doc_id, exists)
+            result.update(checked)
+        return result
@@ -1,5 +1,5 @@
 from rei_s.config import Config
-from rei_s.services.filestore_adapter import FileStoreAdapter
+from rei_s.services.filestore_adapter import DocumentReader, FileStoreAdapter
 from rei_s.types.source_file import SourceFile
 
 
@@ -13,6 +13,9 @@ class DevNullFileStoreAdapter(FileStoreAdapter):
     def get_document(self, doc_id: str) -> SourceFile:
         raise FileNotFoundError()
 
+    def open_document(self, doc_id: str) -> DocumentReader:
+        raise FileNotFoundError()
+
     def exists(self, doc_id: str) -> bool:
         return False
 
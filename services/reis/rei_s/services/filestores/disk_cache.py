@@ -0,0 +1,222 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import os
+from pathlib import Path
+import shutil
+from threading import Lock
+import time
+from typing import BinaryIO, Iterable, Iterator
+import uuid
+
+from rei_s import logger
+from rei_s.metrics.metrics import file_store_cache_evictions, file_store_cache_hits, file_store_cache_misses
+from rei_s.services.filestore_adapter import DocumentReader, FileStoreAdapter
+from rei_s.types.source_file import SourceFile
+
+
+@dataclass
+class _Entry:
+    path: Path
+    size: int
+    content_hash: str
+    created_at: float
+
+
+class _CachedDocumentReader(DocumentReader):
+    """Reads a copy through a file which is opened before the copy can be evicted.
+
+    The copy stays readable while the file is open, even if it is deleted in the meantime. It has no path,
+    such that it is not opened again by name.
+    """
+
+    def __init__(self, file: BinaryIO, size: int, content_hash: str) -> None:
+        self.file = file
+        self.size = size
+        self.content_hash = content_hash
+
+    def iter_chunks(self, start: int = 0, end: int | None = None, chunk_size: int = 2**20) -> Iterator[bytes]:
+        return self._iter_file(start, self.size if end is None else end, chunk_size)
+
+    def _iter_file(self, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        # reads at an offset, such that the ranges do not share a position
+        while start < end and (chunk := os.pread(self.file.fileno(), min(chunk_size, end - start), start)):
+            start += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        self.file.close()
+        return None
+
+
+class DiskCachedFileStoreAdapter(FileStoreAdapter):
+    """Keeps copies of the recently read documents of a remote file store on the local disk.
+
+    The previews are never modified after they are written, so a copy is valid until the document is deleted.
+    Deletions through this process drop the copy, deletions through other instances are only seen after
+    `max_age` seconds. The least recently used copies are deleted when the cache grows beyond `max_bytes`.
+    The copies in the directory are reused after a restart. A document which is not cached is read from the
+    remote file store, while it is copied in the background.
+    """
+
+    def __init__(self, file_store: FileStoreAdapter, directory: str, max_bytes: int, max_age: float) -> None:
+        self.file_store = file_store
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.size = 0
+        self._lock = Lock()
+        # ordered from the least to the most recently used
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # the documents which are copied at the moment, with the number of times they were deleted or replaced since
+        self._downloads: dict[str, int] = {}
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="file-store-cache")
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        # the files are named `<key>.<content hash>`, unfinished downloads end with `.tmp`
+        paths = sorted(self.directory.iterdir(), key=lambda path: path.stat().st_mtime)
+        for path in paths:
+            key, _, content_hash = path.name.partition(".")
+            if not content_hash or content_hash.endswith(".tmp"):
+                path.unlink(missing_ok=True)
+                continue
+            stat = path.stat()
+            self._entries[key] = _Entry(path, stat.st_size, content_hash, stat.st_mtime)
+            self.size += stat.st_size
+        self._evict()
+        logger.info(f"Loaded {len(self._entries)} cached documents ({self.size} bytes)")
+
+    @staticmethod
+    def _key(doc_id: str) -> str:
+        # the document ids are not necessarily valid file names
+        return hashlib.sha256(doc_id.encode()).hexdigest()
+
+    def _get(self, doc_id: str) -> _Entry | None:
+        with self._lock:
+            return self._get_locked(self._key(doc_id))
+
+    def _get_locked(self, key: str) -> _Entry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.created_at + self.max_age < time.time() or not entry.path.exists():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, doc_id: str, source: Path, content_hash: str, generation: int | None = None) -> None:
+        key = self._key(doc_id)
+        path = self.directory / f"{key}.{content_hash}"
+        with self._lock:
+            if generation is not None and self._downloads.get(doc_id) != generation:
+                # the document was deleted or replaced while it was downloaded
+                return None
+            # the file is moved into place when it is complete, such that readers never see a partial copy
+            os.replace(source, path)
+
+            entry = _Entry(path, os.path.getsize(path), content_hash, time.time())
+            if key in self._entries and self._entries[key].path != path:
+                self._remove(key)
+            elif key in self._entries:
+                self.size -= self._entries.pop(key).size
+            self._entries[key] = entry
+            self.size += entry.size
+            self._evict()
+        return None
+
+    def _invalidate_download(self, doc_id: str) -> None:
+        # a running download of the document must not overwrite the change, it is checked by `_put`
+        if doc_id in self._downloads:
+            self._downloads[doc_id] += 1
+        return None
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+            entry.path.unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            file_store_cache_evictions.inc()
+
+    def _temporary_path(self) -> Path:
+        return self.directory / f"{uuid.uuid4()}.download.tmp"
+
+    def add_document(self, document: SourceFile) -> None:
+        self.file_store.add_document(document)
+        with self._lock:
+            self._invalidate_download(document.id)
+
+        # the preview is usually requested soon after the upload
+        if os.path.getsize(document.path) > self.max_bytes:
+            return
+        path = self._temporary_path()
+        shutil.copyfile(document.path, path)
+        self._put(document.id, path, document.content_hash)
+
+    def delete(self, doc_id: str) -> None:
+        with self._lock:
+            self._invalidate_download(doc_id)
+            self._remove(self._key(doc_id))
+        self.file_store.delete(doc_id)
+
+    def get_document(self, doc_id: str) -> SourceFile:
+        return self.file_store.get_document(doc_id)
+
+    def open_document(self, doc_id: str) -> DocumentReader:
+        with self._lock:
+            entry = self._get_locked(self._key(doc_id))
+            if entry is not None:
+                file_store_cache_hits.inc()
+                # the copy is opened while the lock is held, such that it can not be evicted before
+                return _CachedDocumentReader(open(entry.path, "rb"), entry.size, entry.content_hash)
+
+        file_store_cache_misses.inc()
+        reader = self.file_store.open_document(doc_id)
+        if reader.size <= self.max_bytes:
+            # the requested range is sent from the remote store, instead of waiting for the whole copy
+            self._download_in_background(doc_id, reader)
+        return reader
+
+    def _download_in_background(self, doc_id: str, reader: DocumentReader) -> None:
+        with self._lock:
+            if doc_id in self._downloads:
+                return None
+            self._downloads[doc_id] = 0
+        self._executor.submit(self._download, doc_id, reader, 0)
+        return None
+
+    def _download(self, doc_id: str, reader: DocumentReader, generation: int) -> None:
+        path = self._temporary_path()
+        try:
+            with open(path, "wb") as f:
+                for chunk in reader.iter_chunks():
+                    f.write(chunk)
+            self._put(doc_id, path, reader.content_hash, generation)
+        except Exception:
+            logger.exception(f"Failed to copy the document {doc_id} into the cache")
+        finally:
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self._downloads.pop(doc_id, None)
+        return None
+
+    def exists(self, doc_id: str) -> bool:
+        if self._get(doc_id) is not None:
+            return True
+        return self.file_store.exists(doc_id)
+
+    def exists_many(self, doc_ids: Iterable[str]) -> dict[str, bool]:
+        doc_ids = list(doc_ids)
+        result = {doc_id: True for doc_id in doc_ids if self._get(doc_id) is not None}
+        missing = [doc_id for doc_id in doc_ids if doc_id not in result]
+        if missing:
+            result.update(self.file_store.exists_many(missing))
+        return result
@@ -1,7 +1,11 @@
 import os
 from pathlib import Path
+import shutil
+from typing import BinaryIO, Iterator
+import uuid
+
 from rei_s.config import Config
-from rei_s.services.filestore_adapter import FileStoreAdapter
+from rei_s.services.filestore_adapter import DocumentReader, FileStoreAdapter
 from rei_s.types.source_file import SourceFile
 
 
@@ -14,19 +18,57 @@ def normalized_path(path: Path, base_name: str) -> Path:
     return normalized_path
 
 
+class FileDocumentReader(DocumentReader):
+    def __init__(self, path: Path, content_hash: str) -> None:
+        self.file_path = path
+        self.size = os.path.getsize(path)
+        self.content_hash = content_hash
+
+    @property
+    def path(self) -> Path | None:
+        return self.file_path
+
+    def iter_chunks(self, start: int = 0, end: int | None = None, chunk_size: int = 2**20) -> Iterator[bytes]:
+        f = open(self.file_path, "rb")
+        return self._iter_file(f, start, (self.size if end is None else end) - start, chunk_size)
+
+    @staticmethod
+    def _iter_file(f: BinaryIO, start: int, remaining: int, chunk_size: int) -> Iterator[bytes]:
+        with f:
+            f.seek(start)
+            while remaining > 0 and (chunk := f.read(min(chunk_size, remaining))):
+                remaining -= len(chunk)
+                yield chunk
+
+
 class FSFileStoreAdapter(FileStoreAdapter):
     path: Path
 
+    @property
+    def hashes_path(self) -> Path:
+        # the hashes of the contents are stored in a sibling directory, such that they can not clash with documents
+        path = self.path.resolve()
+        return path.parent / f"{path.name}.sha256"
+
     def add_document(self, document: SourceFile) -> None:
         path = normalized_path(self.path, document.id)
-        with open(path, "wb") as f:
-            f.write(document.buffer)
+        # the hash is written first and the document is moved into place when it is complete,
+        # such that readers never see a partial document or a document without its hash
+        temporary_path = self.path / f".{uuid.uuid4()}.tmp"
+        try:
+            # copies in the kernel (with `sendfile`) where possible, the content is never loaded into memory
+            shutil.copyfile(document.path, temporary_path)
+            normalized_path(self.hashes_path, document.id).write_text(document.content_hash)
+            os.replace(temporary_path, path)
+        finally:
+            temporary_path.unlink(missing_ok=True)
 
     def delete(self, doc_id: str) -> None:
         path = normalized_path(self.path, doc_id)
         if not path.exists():
             raise FileNotFoundError()
         os.remove(path)
+        normalized_path(self.hashes_path, doc_id).unlink(missing_ok=True)
 
     def get_document(self, doc_id: str) -> SourceFile:
         path = normalized_path(self.path, doc_id)
@@ -34,6 +76,20 @@ class FSFileStoreAdapter(FileStoreAdapter):
             raise FileNotFoundError()
         return SourceFile(id=doc_id, path=path, mime_type="application/pdf", file_name=f"{doc_id}.pdf")
 
+    def open_document(self, doc_id: str) -> DocumentReader:
+        path = normalized_path(self.path, doc_id)
+        if not path.exists():
+            raise FileNotFoundError()
+
+        hash_path = normalized_path(self.hashes_path, doc_id)
+        if hash_path.exists():
+            content_hash = hash_path.read_text()
+        else:
+            # documents which were added before the hashes were stored
+            content_hash = SourceFile(path=path, mime_type="", file_name=doc_id).content_hash
+            hash_path.write_text(content_hash)
+        return FileDocumentReader(path, content_hash)
+
     def exists(self, doc_id: str) -> bool:
         path = normalized_path(self.path, doc_id)
         return path.exists()
@@ -47,4 +103,5 @@ class FSFileStoreAdapter(FileStoreAdapter):
 
         ret.path = Path(config.file_store_filesystem_basepath)
         os.makedirs(ret.path, exist_ok=True)
+        os.makedirs(ret.hashes_path, exist_ok=True)
         return ret
@@ -1,25 +1,67 @@
 from threading import Lock
+from typing import Iterator
 
 import boto3
 from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
 from fastapi import HTTPException
 from mypy_boto3_s3 import S3Client
+from mypy_boto3_s3.type_defs import HeadObjectOutputTypeDef
 
 from rei_s.config import Config
-from rei_s.services.filestore_adapter import FileStoreAdapter
+from rei_s.services.filestore_adapter import DocumentChangedError, DocumentReader, FileStoreAdapter
 from rei_s.types.source_file import SourceFile
 
 
 lock = Lock()
 
 
+class S3DocumentReader(DocumentReader):
+    def __init__(self, adapter: "S3FileStoreAdapter", doc_id: str, head: HeadObjectOutputTypeDef) -> None:
+        self.adapter = adapter
+        self.doc_id = doc_id
+        self.size = head["ContentLength"]
+        self.etag = head["ETag"]
+        # documents uploaded before the hash was stored fall back to the etag of s3, which depends on the content too
+        self.content_hash = head["Metadata"].get("sha256", self.etag.strip('"'))
+
+    def iter_chunks(self, start: int = 0, end: int | None = None, chunk_size: int = 2**20) -> Iterator[bytes]:
+        end = self.size if end is None else end
+        if start >= end:
+            return iter(())
+
+        # the object is only downloaded when it is read, and only if it did not change since it was opened
+        try:
+            response = self.adapter.client.get_object(
+                Bucket=self.adapter.bucket_name, Key=self.doc_id, Range=f"bytes={start}-{end - 1}", IfMatch=self.etag
+            )
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code in ("404", "NoSuchKey"):
+                raise FileNotFoundError(self.doc_id) from e
+            if code in ("412", "PreconditionFailed"):
+                raise DocumentChangedError(self.doc_id) from e
+            raise
+        return self._iter_body(response["Body"], chunk_size)
+
+    @staticmethod
+    def _iter_body(body: StreamingBody, chunk_size: int) -> Iterator[bytes]:
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+
 class S3FileStoreAdapter(FileStoreAdapter):
     client: S3Client
     bucket_name: str
 
     def add_document(self, document: SourceFile) -> None:
+        # large files are uploaded in parts, which are read from the file one after another
         with open(document.path, "rb") as f:
-            self.client.upload_fileobj(f, self.bucket_name, document.id)
+            self.client.upload_fileobj(
+                f, self.bucket_name, document.id, ExtraArgs={"Metadata": {"sha256": document.content_hash}}
+            )
 
     def delete(self, doc_id: str) -> None:
         if not self.exists(doc_id):
@@ -28,13 +70,21 @@ class S3FileStoreAdapter(FileStoreAdapter):
         self.client.delete_object(Bucket=self.bucket_name, Key=doc_id)
 
     def get_document(self, doc_id: str) -> SourceFile:
+        reader = self.open_document(doc_id)
+        file = SourceFile.new_temporary_file()
+        with open(file.path, "wb") as f:
+            for chunk in reader.iter_chunks():
+                f.write(chunk)
+        return file
+
+    def open_document(self, doc_id: str) -> DocumentReader:
         try:
-            response = self.client.get_object(Bucket=self.bucket_name, Key=doc_id)
+            head = self.client.head_object(Bucket=self.bucket_name, Key=doc_id)
         except ClientError as e:
-            if e.response["Error"]["Code"] == "NoSuchKey":
+            if e.response["Error"]["Code"] == "404":
                 raise HTTPException(status_code=404, detail="File not found") from e
             raise
-        return SourceFile.new_temporary_file(response["Body"].read())
+        return S3DocumentReader(self, doc_id, head)
 
     def exists(self, doc_id: str) -> bool:
         try:
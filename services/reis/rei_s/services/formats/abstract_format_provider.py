@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Iterator
 
 from langchain_core.documents import Document
 
@@ -17,6 +18,20 @@ class AbstractFormatProvider(ABC):
     def process_file(self, file: SourceFile, chunk_size: int | None = None) -> list[Document]:
         raise NotImplementedError
 
+    def iter_chunks(self, file: SourceFile, chunk_size: int | None = None) -> Iterator[Document]:
+        """Yields the chunks of the file. Providers which can parse a file piece by piece should override this,
+        such that large files never need to be held in memory as a whole."""
+        yield from self.process_file(file, chunk_size)
+
+    def page_ranges(self, file: SourceFile, pages_per_range: int) -> list[range] | None:
+        """Splits the file into ranges of pages, which can be chunked independently of each other, e.g., in parallel,
+        with `iter_page_chunks`. `None` means that this provider can not chunk the pages of a file separately."""
+        return None
+
+    def iter_page_chunks(self, file: SourceFile, pages: range, chunk_size: int | None = None) -> Iterator[Document]:
+        """Yields the chunks of the given pages, with the same metadata as the chunks of `iter_chunks`."""
+        raise NotImplementedError
+
     @abstractmethod
     def convert_file_to_pdf(self, file: SourceFile) -> SourceFile:
         raise NotImplementedError
@@ -24,7 +24,7 @@ class JsonProvider(AbstractFormatProvider):
         return RecursiveJsonSplitter(max_chunk_size=chunk_size)
 
     def process_file(self, file: SourceFile, chunk_size: int | None = None) -> list[Document]:
-        text = file.buffer.decode()
+        text = file.text()
 
         json_dict = json.loads(text)
         if not isinstance(json_dict, dict):
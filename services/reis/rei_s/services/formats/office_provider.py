@@ -1,11 +1,13 @@
-from typing import Any
+from typing import Any, Iterator
 
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from rei_s.config import Config
 from rei_s.services.formats.abstract_format_provider import AbstractFormatProvider
 from rei_s.services.formats.pdf_provider import PdfProvider
 from rei_s.services.formats.utils import convert_office_to_pdf, validate_chunk_overlap, validate_chunk_size
+from rei_s.services.libreoffice_pool import get_libreoffice_pool
 from rei_s.types.source_file import SourceFile
 
 
@@ -14,10 +16,14 @@ class OfficeProvider(AbstractFormatProvider):
 
     file_name_extensions = []
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, **_kwargs: Any) -> None:
+    def __init__(
+        self, chunk_size: int = 1000, chunk_overlap: int = 200, config: Config | None = None, **_kwargs: Any
+    ) -> None:
         super().__init__()
         self.default_chunk_size = chunk_size
         self.default_chunk_overlap = chunk_overlap
+        self.libreoffice_pool_size = config.libreoffice_pool_size if config else 2
+        self.libreoffice_timeout = config.libreoffice_timeout if config else 300
 
     def splitter(
         self, chunk_size: int | None = None, chunk_overlap: int | None = None
@@ -32,6 +38,17 @@ class OfficeProvider(AbstractFormatProvider):
         pdf = self.convert_file_to_pdf(file)
         return PdfProvider().process_file(pdf, chunk_size, chunk_overlap)
 
+    def iter_chunks(self, file: SourceFile, chunk_size: int | None = None) -> Iterator[Document]:
+        # reuses the preview, if it was converted before
+        converted_here = file.preview_pdf_cache is None or not file.preview_pdf_cache.exists
+        pdf = self.convert_file_to_pdf(file)
+        try:
+            yield from PdfProvider().iter_chunks(pdf, chunk_size)
+        finally:
+            # in a worker process nobody else would clean up the pdf
+            if converted_here:
+                pdf.delete()
+
     @property
     def may_start_separate_process_for_chunking(self) -> bool:
         # office files are converted to pdf and then processed with the pdf provider
@@ -44,4 +61,4 @@ class OfficeProvider(AbstractFormatProvider):
         return False
 
     def convert_file_to_pdf(self, file: SourceFile) -> SourceFile:
-        return convert_office_to_pdf(file)
+        return convert_office_to_pdf(file, get_libreoffice_pool(self.libreoffice_pool_size, self.libreoffice_timeout))
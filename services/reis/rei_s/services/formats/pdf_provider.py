@@ -1,7 +1,8 @@
-from io import BytesIO
+from itertools import islice
 import shutil
-from typing import Any, BinaryIO
+from typing import Any, BinaryIO, Iterator
 
+from langchain_core.document_loaders import BaseBlobParser
 from langchain_core.documents import Document
 from langchain_community.document_loaders.parsers.pdf import PDFMinerParser, PyPDFParser
 from langchain_community.document_loaders.generic import GenericLoader
@@ -11,7 +12,7 @@ import pypdf
 
 from rei_s import logger
 from rei_s.services.formats.abstract_format_provider import AbstractFormatProvider
-from rei_s.services.formats.utils import BytesLoader, validate_chunk_overlap, validate_chunk_size
+from rei_s.services.formats.utils import FileLoader, validate_chunk_overlap, validate_chunk_size
 from rei_s.types.source_file import SourceFile
 from rei_s.utils import get_new_file_path
 
@@ -57,25 +58,70 @@ class PdfProvider(AbstractFormatProvider):
     def process_file(
         self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
     ) -> list[Document]:
-        loader = GenericLoader(
-            blob_loader=BytesLoader(BytesIO(file.buffer)),
-            blob_parser=TolerantPDFMinerParser(extract_images=False, mode="page"),
-        )
+        return list(self.iter_chunks(file, chunk_size, chunk_overlap))
+
+    def iter_chunks(
+        self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
+    ) -> Iterator[Document]:
+        # pages are parsed and split one after the other, such that only a single page is held in memory
+        splitter = self.splitter(chunk_size, chunk_overlap)
+        pages_done = 0
 
         try:
-            documents = loader.load()
             parser_info = f"PDFMiner {pdfminer.__version__}"
+            for page in self._lazy_load(file, TolerantPDFMinerParser(extract_images=False, mode="page")):
+                yield from self._split_page(splitter, page, parser_info)
+                pages_done += 1
         except Exception as e:
             # Fallback to PyPDF if PDFMiner fails
             # sometimes PyPDF is more tolerant to malformed PDFs
             logger.warning(f"PDFMiner failed to load PDF {file.id}, falling back to PyPDF. Error: `{e}`")
-            loader = GenericLoader(
-                blob_loader=BytesLoader(BytesIO(file.buffer)),
-                blob_parser=PyPDFParser(extract_images=False, mode="page"),
-            )
-            documents = loader.load()
             parser_info = f"PyPDF {pypdf.__version__}"
+            pages = self._lazy_load(file, PyPDFParser(extract_images=False, mode="page"))
+            # the pages before the failure were already yielded
+            for page in islice(pages, pages_done, None):
+                yield from self._split_page(splitter, page, parser_info)
 
+    def page_ranges(self, file: SourceFile, pages_per_range: int) -> list[range] | None:
+        try:
+            with file.open() as f:
+                num_pages = len(pypdf.PdfReader(f).pages)
+        except Exception as e:
+            logger.warning(f"Failed to count the pages of PDF {file.id}, it is processed as a whole. Error: `{e}`")
+            return None
+        return [range(start, min(start + pages_per_range, num_pages)) for start in range(0, num_pages, pages_per_range)]
+
+    def iter_page_chunks(self, file: SourceFile, pages: range, chunk_size: int | None = None) -> Iterator[Document]:
+        # the pages are copied into a pdf of their own, such that the parsers do not process the other pages
+        part = SourceFile.new_temporary_file(extension="pdf")
+        part.id = file.id
+        try:
+            with file.open() as f:
+                reader = pypdf.PdfReader(f)
+                writer = pypdf.PdfWriter()
+                for page in pages:
+                    writer.add_page(reader.pages[page])
+                if reader.metadata:
+                    writer.add_metadata(reader.metadata)
+                writer.write(part.path)
+                total_pages = len(reader.pages)
+
+            for chunk in self.iter_chunks(part, chunk_size):
+                if "page" in chunk.metadata:
+                    chunk.metadata["page"] += pages.start
+                if "total_pages" in chunk.metadata:
+                    chunk.metadata["total_pages"] = total_pages
+                yield chunk
+        finally:
+            part.delete()
+
+    @staticmethod
+    def _lazy_load(file: SourceFile, parser: BaseBlobParser) -> Iterator[Document]:
+        loader = GenericLoader(blob_loader=FileLoader(file), blob_parser=parser)
+        return loader.lazy_load()
+
+    @staticmethod
+    def _split_page(splitter: RecursiveCharacterTextSplitter, page: Document, parser_info: str) -> list[Document]:
         uninteresting_metadata = [
             "producer",
             "creator",
@@ -84,17 +130,16 @@ class PdfProvider(AbstractFormatProvider):
             "ptex.fullbanner",
         ]
 
-        for doc in documents:
-            doc.metadata["pdf_parser"] = parser_info
-            if "page" in doc.metadata:
-                # this loader starts to count at 0
-                # since convention for pdfs (and books, ...) is to start at 1, we need to increase it here
-                doc.metadata["page"] += 1
-            for key in uninteresting_metadata:
-                if key in doc.metadata:
-                    del doc.metadata[key]
-
-        chunks = self.splitter(chunk_size, chunk_overlap).split_documents(documents)
+        page.metadata["pdf_parser"] = parser_info
+        if "page" in page.metadata:
+            # this loader starts to count at 0
+            # since convention for pdfs (and books, ...) is to start at 1, we need to increase it here
+            page.metadata["page"] += 1
+        for key in uninteresting_metadata:
+            if key in page.metadata:
+                del page.metadata[key]
+
+        chunks = splitter.split_documents([page])
 
         # apparently we can encounter 0x00 bytes, which can not be handled by pgvector
         for c in chunks:
@@ -1,12 +1,4 @@
-from io import BytesIO
-import os
-from pathlib import Path
-import shutil
-import subprocess
-import tempfile
-import time
 from typing import Generator
-from uuid import uuid4
 
 from langchain_core.documents.base import Blob
 from langchain_community.document_loaders.blob_loaders import BlobLoader
@@ -14,7 +6,7 @@ import markdown
 from pygments.formatters import HtmlFormatter  # type: ignore[import-untyped]  # ty: ignore[unresolved-import]
 from weasyprint import HTML
 
-from rei_s import logger
+from rei_s.services.libreoffice_pool import LibreOfficePool, get_libreoffice_pool
 from rei_s.types.source_file import SourceFile
 from rei_s.utils import get_new_file_path
 
@@ -41,12 +33,13 @@ def validate_chunk_overlap(chunk_overlap: int | None, default: int) -> int:
     return chunk_overlap
 
 
-class BytesLoader(BlobLoader):
-    def __init__(self, buffer: BytesIO) -> None:
-        self.buffer = buffer
+class FileLoader(BlobLoader):
+    def __init__(self, file: SourceFile) -> None:
+        self.file = file
 
     def yield_blobs(self) -> Generator[Blob, None, None]:
-        yield Blob.from_data(self.buffer.getvalue(), path="stream")
+        # the parsers open the file themselves and read only what they need, instead of a copy in memory
+        yield Blob.from_path(self.file.path, metadata={"source": "stream"})
 
 
 class ProcessingError(Exception):
@@ -55,9 +48,13 @@ class ProcessingError(Exception):
         self.status = status
         self.message = message
 
+    def __reduce__(self) -> tuple[type["ProcessingError"], tuple[str, int]]:
+        # needed to send the error from a worker process back to the app
+        return self.__class__, (self.message, self.status)
+
 
 def generate_pdf_from_md_file(file: SourceFile, format_: str | None = None) -> SourceFile:
-    markdown_text = file.buffer.decode()
+    markdown_text = file.text()
     if format_ in {"plain", "md", "markdown"}:
         markdown_text = markdown_text
     elif format_:
@@ -80,50 +77,14 @@ def generate_pdf_from_md(markdown_text: str, doc_id: str, file_name: str) -> Sou
     return SourceFile(id=doc_id, path=path, mime_type="application/pdf", file_name=file_name)
 
 
-def convert_office_to_pdf(file: SourceFile) -> SourceFile:
+def convert_office_to_pdf(file: SourceFile, pool: LibreOfficePool | None = None) -> SourceFile:
     # If we already have a preview PDF, use it
     if file.preview_pdf_cache is not None and file.preview_pdf_cache.exists:
         return file.preview_pdf_cache
 
-    output_dir = Path(tempfile.gettempdir()) / uuid4().hex
-    output_dir.mkdir(parents=True, exist_ok=True)
-    libreoffice_home = Path(tempfile.gettempdir()) / uuid4().hex
-
-    cmd = [
-        "soffice",
-        "--headless",
-        f"-env:UserInstallation=file://{libreoffice_home}",
-        "--convert-to",
-        "pdf",
-        str(file.path),
-        "--outdir",
-        str(output_dir),
-    ]
-    logger.info(f"Converting {file.id} with args: {' '.join(cmd)}")
-
-    # FIXME: this might fail due to a race (?) when starting multiple LibreOffice instances
-    #   we need to fix this properly later
-    retries = 3
-    for retry in range(retries):
-        libreoffice_home.mkdir(parents=True, exist_ok=True)
-        try:
-            subprocess.run(cmd, capture_output=True, check=True, env={"HOME": str(libreoffice_home)})
-        except subprocess.CalledProcessError as e:
-            logger.error(
-                f"Failed to convert {file.id} to pdf, retry {retry + 1}/{retries}, "
-                f"exit code {e.returncode}: {e.stdout} {e.stderr} {e!r}"
-            )
-            time.sleep(0.5)
-        else:
-            break
-        finally:
-            shutil.rmtree(libreoffice_home, ignore_errors=True)
-    else:
-        raise ValueError(f"Can not convert {file.id} to pdf, giving up")
-
-    base = os.path.basename(file.path)
-    pdf_name = os.path.splitext(base)[0] + ".pdf"
-    pdf_path = os.path.join(output_dir, pdf_name)
+    if pool is None:
+        pool = get_libreoffice_pool()
+    pdf_path = pool.convert(str(file.path), file.id)
 
     pdf = SourceFile(id=file.id, path=pdf_path, mime_type="application/pdf", file_name=file.file_name, delete_dir=True)
     file.preview_pdf_cache = pdf
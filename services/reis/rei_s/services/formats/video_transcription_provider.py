@@ -6,9 +6,9 @@ import ffmpeg
 
 from rei_s import logger
 from rei_s.config import Config
-from rei_s.services.formats.utils import ProcessingError, generate_pdf_from_md_file
+from rei_s.services.formats.utils import ProcessingError
 from rei_s.services.formats.voice_transcription_provider import VoiceTranscriptionProvider
-from rei_s.types.source_file import SourceFile, temp_file
+from rei_s.types.source_file import SourceFile
 
 
 class VideoTranscriptionProvider(VoiceTranscriptionProvider):
@@ -71,22 +71,7 @@ class VideoTranscriptionProvider(VoiceTranscriptionProvider):
         self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
     ) -> list[Document]:
         audio_file = self.extract_audio_to_file(file.path)
-        docs = super().parse_file(audio_file)
-        audio_file.delete()
-        return docs
-
-    def process_file(
-        self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
-    ) -> list[Document]:
-        audio_file = self.extract_audio_to_file(file.path)
-        chunks = super().process_file(audio_file, chunk_size, chunk_overlap)
-        audio_file.delete()
-        return chunks
-
-    def convert_file_to_pdf(self, file: SourceFile) -> SourceFile:
-        docs = self.parse_file(file)
-
-        plain = "\n".join([doc.page_content for doc in docs])
-
-        with temp_file(plain.encode()) as plain_file:
-            return generate_pdf_from_md_file(plain_file, "plain")
+        try:
+            return super().parse_file(audio_file)
+        finally:
+            audio_file.delete()
@@ -1,6 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
+import csv
 from dataclasses import dataclass
+import glob
+import os
 from pathlib import Path
 from typing import Any
+import uuid
 
 from langchain_core.documents import Document
 from langchain_core.documents.base import Blob
@@ -8,9 +13,11 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders.parsers.audio import AzureOpenAIWhisperParser
 import openai
 import ffmpeg
+from tenacity import RetryCallState, retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 
 from rei_s import logger
 from rei_s.config import Config
+from rei_s.services.artifact_cache import artifact_cache
 from rei_s.services.formats.abstract_format_provider import AbstractFormatProvider
 from rei_s.services.formats.utils import (
     ProcessingError,
@@ -19,6 +26,14 @@ from rei_s.services.formats.utils import (
     generate_pdf_from_md_file,
 )
 from rei_s.types.source_file import SourceFile, temp_file
+from rei_s.utils import get_new_file_path
+
+
+def _log_rate_limit_retry(retry_state: RetryCallState) -> None:
+    wait = retry_state.next_action.sleep if retry_state.next_action else 0  # type: ignore[union-attr]
+    logger.warning(
+        f"Rate limited while transcribing. Retry attempt {retry_state.attempt_number}, sleeping {wait:.1f}s."
+    )
 
 
 @dataclass
@@ -74,6 +89,7 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
         self.default_chunk_size = chunk_size
         self.default_chunk_overlap = chunk_overlap
         self.default_segment_duration = default_segment_duration
+        self.max_concurrency = config.stt_max_concurrency if config else 1
 
         if config and config.stt_type == "azure-openai-whisper":
             # this is ensured by the config validation, the following lines are there to help the ty typechecker
@@ -150,24 +166,48 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
             output_kwargs = {"audio_bitrate": output_bitrate}
             audio_codec = "vorbis"
 
-        segments_files: list[SourceFile] = []
-        segment_timestamps: list[int | float] = list(range(0, int(duration), segment_duration_seconds))
-        for n, start_time in enumerate(segment_timestamps):
-            logger.info(f"segment {n + 1} / {len(segment_timestamps)}")
-
-            segment_file = SourceFile.new_temporary_file(extension=self.audio_codecs_to_file_extension[audio_codec])
-            try:
-                _out, _err = (
-                    ffmpeg.input(input_path, ss=start_time, t=segment_duration_seconds)
-                    .output(segment_file.path, y=None, **output_kwargs)
-                    .run(capture_stdout=True, capture_stderr=True)
+        # all segments are written in a single pass, ffmpeg lists the actual start of every segment in a csv file
+        prefix = str(uuid.uuid4())
+        extension = self.audio_codecs_to_file_extension[audio_codec]
+        segment_list_path = get_new_file_path(prefix, "csv")
+        segmented = False
+        try:
+            _out, _err = (
+                ffmpeg.input(input_path)
+                .output(
+                    get_new_file_path(f"{prefix}-%05d", extension),
+                    f="segment",
+                    segment_time=segment_duration_seconds,
+                    segment_list=segment_list_path,
+                    segment_list_type="csv",
+                    reset_timestamps=1,
+                    y=None,
+                    **output_kwargs,
                 )
-            except ffmpeg.Error as e:  # pragma: no cover
-                message = self.build_ffmpeg_error_message(e)
-                logger.error(message)
-                raise ProcessingError(message, 400) from e
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+            with open(segment_list_path, newline="") as f:
+                segment_list = list(csv.reader(f))
+            segmented = True
+        except ffmpeg.Error as e:
+            message = self.build_ffmpeg_error_message(e)
+            logger.error(message)
+            raise ProcessingError(message, 400) from e
+        finally:
+            if os.path.exists(segment_list_path):
+                os.remove(segment_list_path)
+            if not segmented:
+                # the segments which were written before the failure are not listed anywhere else
+                for path in glob.glob(get_new_file_path(f"{prefix}-*")):
+                    os.remove(path)
 
-            segments_files.append(segment_file)
+        segments_files: list[SourceFile] = []
+        segment_timestamps: list[int | float] = []
+        for file_name, start_time, _end_time in segment_list:
+            path = get_new_file_path(os.path.basename(file_name))
+            segments_files.append(SourceFile(path=path, mime_type="", file_name=os.path.basename(path)))
+            segment_timestamps.append(float(start_time))
+        logger.info(f"split audio into {len(segments_files)} segments")
 
         segment_timestamps.append(duration)
 
@@ -184,6 +224,28 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
 
         return segments_files, segment_timestamps, audio_codec
 
+    # Rate limit (429) responses are retried with a backoff, the segments of a file share the same deployment.
+    # Other errors rely on the retries of the SDK.
+    @retry(
+        retry=retry_if_exception_type(openai.RateLimitError),
+        stop=stop_after_attempt(10),
+        wait=wait_exponential_jitter(max=60, jitter=2),
+        before_sleep=_log_rate_limit_retry,
+        reraise=True,
+    )
+    def transcribe_segment(self, segment: SourceFile) -> list[Document]:
+        if self.parser is None:
+            raise ValueError(f"calling disabled format provider: `{self.__class__.name}`")
+
+        blob = Blob.from_path(segment.path)
+        try:
+            return self.parser.parse(blob)
+        except openai.APIStatusError as e:  # pragma: no cover
+            if e.status_code == 413:
+                raise ProcessingError("File too large. The limit is 25 MiB.", e.status_code) from e
+            else:
+                raise
+
     def parse_file(self, file: SourceFile) -> list[Document]:
         if self.parser is None:
             raise ValueError(f"calling disabled format provider: `{self.__class__.name}`")
@@ -192,20 +254,19 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
         # If the file is larger than 25 MB, split it into multiple files and combine the output
         segments, segment_timestamps, _audio_codec = self.split_into_compatible_format(file.path)
 
-        results = []
-        for n, segment in enumerate(segments):
-            blob = Blob.from_path(segment.path)
-            logger.info(f"process {n + 1} / {len(segments)}")
-            try:
-                docs = self.parser.parse(blob)
-            except openai.APIStatusError as e:  # pragma: no cover
-                if e.status_code == 413:
-                    raise ProcessingError("File too large. The limit is 25 MiB.", e.status_code) from e
-                else:
-                    raise
-            finally:
+        logger.info(f"transcribe {len(segments)} segments with up to {self.max_concurrency} concurrent requests")
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="transcription")
+        try:
+            # map keeps the order of the segments, no matter in which order the transcriptions finish
+            transcripts = list(executor.map(self.transcribe_segment, segments))
+        finally:
+            # after an error, the segments which are still waiting are not transcribed anymore
+            executor.shutdown(cancel_futures=True)
+            for segment in segments:
                 segment.delete()
 
+        results = []
+        for n, docs in enumerate(transcripts):
             for doc in docs:
                 doc.metadata["segment_begin_seconds"] = segment_timestamps[n]
                 doc.metadata["segment_end_seconds"] = segment_timestamps[n + 1]
@@ -216,10 +277,16 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
 
         return results
 
+    def transcribe(self, file: SourceFile) -> list[Document]:
+        # the transcript is needed for chunking and for the preview, but transcribing is slow and costly
+        docs = artifact_cache.get_or_compute("transcript", file, lambda: self.parse_file(file))
+        # the chunking might modify the documents, so we hand out copies
+        return [doc.model_copy(deep=True) for doc in docs]
+
     def process_file(
         self, file: SourceFile, chunk_size: int | None = None, chunk_overlap: int | None = None
     ) -> list[Document]:
-        results = self.parse_file(file)
+        results = self.transcribe(file)
 
         chunks = self.splitter(chunk_size, chunk_overlap).split_documents(results)
         return chunks
@@ -229,8 +296,13 @@ class VoiceTranscriptionProvider(AbstractFormatProvider):
         # a plaintext audio transcription is not a sensible pdf preview
         return False
 
+    @property
+    def may_start_separate_process_for_converting(self) -> bool:
+        # the conversion reuses the transcript of the chunking, which is only cached in this process
+        return False
+
     def convert_file_to_pdf(self, file: SourceFile) -> SourceFile:
-        docs = self.parse_file(file)
+        docs = self.transcribe(file)
 
         plain = "\n".join([doc.page_content for doc in docs])
 
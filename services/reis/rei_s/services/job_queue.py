@@ -0,0 +1,315 @@
+from functools import lru_cache
+import os
+import shutil
+import sqlite3
+from threading import Event, Lock, Thread
+import time
+from typing import TYPE_CHECKING, Callable, Literal
+import uuid
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from rei_s import logger
+from rei_s.config import Config
+from rei_s.metrics.metrics import jobs_finished_counter
+
+if TYPE_CHECKING:
+    # the module is used by the lifespan in `rei_s.utils`, which is imported by `source_file`
+    from rei_s.types.source_file import SourceFile
+
+
+JobStatus = Literal["queued", "running", "completed", "failed"]
+
+
+class Job(BaseModel):
+    id: str
+    status: JobStatus
+    doc_id: str
+    bucket: str
+    index_name: str | None
+    file_name: str
+    mime_type: str
+    path: str
+    attempts: int
+    chunks_parsed: int
+    batches_embedded: int
+    status_code: int | None
+    error: str | None
+    created_at: float
+    updated_at: float
+
+
+class JobQueue:
+    """Durable queue of uploads, which are added to the vector store by workers in the background.
+
+    The jobs are stored in a sqlite database next to the uploaded files, such that they survive restarts.
+    The database can be shared by multiple processes on the same host, but not via a network file system,
+    since sqlite's WAL mode needs shared memory.
+    A worker leases a job and renews the lease while it is running. If the worker dies, the lease expires
+    and another worker retries the job, until it has been attempted `max_attempts` times. The number of the
+    attempt fences the updates of a worker, such that a worker whose job was taken over can not change it anymore.
+    Jobs which failed for a transient reason are retried with a backoff.
+    """
+
+    retry_backoff_seconds = 30
+
+    def __init__(self, directory: str, lease_seconds: int = 300, max_attempts: int = 3) -> None:
+        self.directory = directory
+        self.files_directory = os.path.join(directory, "files")
+        os.makedirs(self.files_directory, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self._lock = Lock()
+        self.connection = sqlite3.connect(
+            os.path.join(directory, "jobs.sqlite"), check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self.connection.row_factory = sqlite3.Row
+        with self._lock:
+            # WAL allows concurrent readers while another process writes
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, doc_id TEXT NOT NULL, bucket TEXT NOT NULL, "
+                "index_name TEXT, file_name TEXT NOT NULL, mime_type TEXT NOT NULL, path TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL, "
+                "chunks_parsed INTEGER NOT NULL DEFAULT 0, batches_embedded INTEGER NOT NULL DEFAULT 0, "
+                "status_code INTEGER, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status, created_at)")
+
+    def enqueue(self, file: "SourceFile", bucket: str, index_name: str | None = None) -> Job:
+        """Moves the file into the queue, the caller must not delete it afterwards."""
+        job_id = str(uuid.uuid4())
+        path = os.path.join(self.files_directory, job_id)
+        shutil.move(file.path, path)
+
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT INTO jobs (id, status, doc_id, bucket, index_name, file_name, mime_type, path, "
+                "created_at, updated_at) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, file.id, bucket, index_name, file.file_name, file.mime_type, path, now, now),
+            )
+        logger.info(f"queued job {job_id} for doc_id {file.id}")
+
+        job = self.get(job_id)
+        if job is None:
+            raise RuntimeError(f"Job {job_id} vanished")
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self.connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return Job(**{key: row[key] for key in Job.model_fields})
+
+    def claim(self) -> Job | None:
+        """Leases the oldest queued job, or a running job whose worker stopped renewing its lease."""
+        now = time.time()
+        with self._lock:
+            # the immediate transaction keeps other processes from claiming the same job
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.connection.execute(
+                    "UPDATE jobs SET status = 'failed', status_code = 500, error = 'Too many attempts', "
+                    "updated_at = ? WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+                row = self.connection.execute(
+                    "SELECT id FROM jobs WHERE status IN ('queued', 'running') AND coalesce(lease_until, 0) < ? "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self.connection.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, "
+                        "chunks_parsed = 0, batches_embedded = 0, updated_at = ? WHERE id = ?",
+                        (now + self.lease_seconds, now, row["id"]),
+                    )
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        return self.get(row["id"])
+
+    def renew(self, job: Job) -> None:
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (now + self.lease_seconds, job.id, job.attempts),
+            )
+
+    def report_progress(self, job: Job, chunks_parsed: int, batches_embedded: int) -> None:
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "UPDATE jobs SET chunks_parsed = ?, batches_embedded = ?, lease_until = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (chunks_parsed, batches_embedded, now + self.lease_seconds, now, job.id, job.attempts),
+            )
+
+    def complete(self, job: Job) -> None:
+        self._finish(job, "completed", 200, None)
+
+    def fail(self, job: Job, status_code: int, error: str, retry: bool) -> None:
+        if retry and job.attempts < self.max_attempts:
+            # queued jobs are not claimed before their lease ends, which is used for the backoff
+            backoff = self.retry_backoff_seconds * 2 ** (job.attempts - 1)
+            now = time.time()
+            with self._lock:
+                updated = self.connection.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, lease_until = ?, updated_at = ? "
+                    "WHERE id = ? AND status = 'running' AND attempts = ?",
+                    (error, now + backoff, now, job.id, job.attempts),
+                ).rowcount
+            if updated:
+                logger.warning(f"job {job.id} failed, retry in {backoff} s: {error}")
+            else:
+                logger.warning(f"job {job.id} failed, but it was taken over by another worker: {error}")
+            return
+        self._finish(job, "failed", status_code, error)
+
+    def _finish(self, job: Job, status: JobStatus, status_code: int, error: str | None) -> None:
+        with self._lock:
+            updated = self.connection.execute(
+                "UPDATE jobs SET status = ?, status_code = ?, error = ?, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (status, status_code, error, time.time(), job.id, job.attempts),
+            ).rowcount
+        if not updated:
+            # the lease expired meanwhile, the file belongs to the attempt which took over
+            logger.warning(f"job {job.id} {status}, but it was taken over by another worker")
+            return
+        # the file is not needed anymore, the job is kept for the status
+        if os.path.exists(job.path):
+            os.remove(job.path)
+        jobs_finished_counter.labels(status=status).inc()
+        logger.info(f"job {job.id} for doc_id {job.doc_id} {status}")
+
+    def purge(self, older_than_seconds: int) -> None:
+        """Deletes finished jobs, which have not been updated for `older_than_seconds`."""
+        with self._lock:
+            rows = self.connection.execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND updated_at < ? RETURNING path",
+                (time.time() - older_than_seconds,),
+            ).fetchall()
+        # jobs which failed because their workers died still have their files
+        for row in rows:
+            if os.path.exists(row["path"]):
+                os.remove(row["path"])
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+
+# runs a job and reports the number of parsed chunks and embedded batches with the callback
+JobHandler = Callable[[Job, Callable[[int, int], None]], None]
+
+
+class JobWorkers:
+    """Threads which take jobs from the queue and run them, until they are stopped."""
+
+    # finished jobs are kept for days, so it is enough to look for expired ones once in a while
+    purge_interval_seconds = 600
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: JobHandler,
+        size: int = 1,
+        poll_interval: float = 1.0,
+        retention_seconds: int = 7 * 24 * 3600,
+    ) -> None:
+        self.queue = queue
+        self.handler = handler
+        self.size = size
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._stop = Event()
+        self._threads: list[Thread] = []
+        self._purged_at = 0.0
+
+    def start(self) -> None:
+        self._stop.clear()
+        for i in range(self.size):
+            thread = Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.size} job workers")
+
+    def stop(self) -> None:
+        # running jobs are finished first, otherwise they would only be retried after their lease expired
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+        logger.info("Stopped job workers")
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim()
+            except Exception as e:
+                logger.error(f"Failed to claim a job: {e!r}")
+                job = None
+
+            if job is None:
+                self._purge()
+                self._stop.wait(self.poll_interval)
+                continue
+
+            try:
+                self.run(job)
+            except Exception as e:
+                # e.g., the database is locked, the lease of the job expires and it is retried
+                logger.error(f"Failed to update the job {job.id}: {e!r}")
+
+    def _purge(self) -> None:
+        if time.time() < self._purged_at + self.purge_interval_seconds:
+            return None
+        self._purged_at = time.time()
+        try:
+            self.queue.purge(self.retention_seconds)
+        except Exception as e:
+            # the worker keeps running, the jobs are purged again later
+            logger.error(f"Failed to purge the finished jobs: {e!r}")
+        return None
+
+    def run(self, job: Job) -> None:
+        # some steps, like a transcription, do not report progress for a long time, so the lease is renewed anyway
+        done = Event()
+
+        def renew() -> None:
+            while not done.wait(self.queue.lease_seconds / 3):
+                self.queue.renew(job)
+
+        renewer = Thread(target=renew, name=f"job-lease-{job.id}", daemon=True)
+        renewer.start()
+        logger.info(f"start job {job.id} for doc_id {job.doc_id}, attempt {job.attempts}")
+        try:
+            self.handler(job, lambda chunks, batches: self.queue.report_progress(job, chunks, batches))
+        except HTTPException as e:
+            # the file can not be processed, so a retry would fail the same way
+            self.queue.fail(job, e.status_code, str(e.detail), retry=False)
+        except Exception as e:
+            self.queue.fail(job, 500, repr(e), retry=True)
+        else:
+            self.queue.complete(job)
+        finally:
+            done.set()
+            renewer.join()
+
+
+@lru_cache
+def get_job_queue(config: Config) -> JobQueue | None:
+    if config.job_queue_path is None:
+        return None
+    return JobQueue(config.job_queue_path, config.job_queue_lease_seconds, config.job_queue_max_attempts)
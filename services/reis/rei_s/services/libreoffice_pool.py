@@ -0,0 +1,156 @@
+from functools import lru_cache
+import os
+from pathlib import Path
+from queue import Queue
+import shutil
+import signal
+import subprocess
+import tempfile
+from threading import Thread
+from uuid import uuid4
+
+from rei_s import logger
+
+
+def _run(cmd: list[str], env: dict[str, str], timeout: float) -> None:
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, start_new_session=True)
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # soffice starts soffice.bin as a child, so we kill the whole process group of the hanging instance
+        os.killpg(process.pid, signal.SIGKILL)
+        process.communicate()
+        raise
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+
+
+def _pid_is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LibreOfficeInstance:
+    """One slot of the pool with its own LibreOffice profile, which is kept between conversions.
+
+    Creating a fresh profile is the most expensive part of a LibreOffice cold start.
+    """
+
+    def __init__(self, profile: Path) -> None:
+        self.profile = profile
+        self.warm = False
+
+    @property
+    def env(self) -> dict[str, str]:
+        return {"HOME": str(self.profile)}
+
+    def args(self) -> list[str]:
+        return ["soffice", "--headless", f"-env:UserInstallation=file://{self.profile}"]
+
+    def healthy(self) -> bool:
+        # a lock file without a running instance is left behind by killed instances and blocks the next start
+        return self.profile.is_dir() and not (self.profile / ".lock").exists()
+
+    def reset(self) -> None:
+        shutil.rmtree(self.profile, ignore_errors=True)
+        self.warm = False
+
+    def warm_up(self, timeout: float) -> None:
+        if not self.healthy():
+            self.reset()
+        self.profile.mkdir(parents=True, exist_ok=True)
+        _run([*self.args(), "--terminate_after_init"], self.env, timeout)
+        self.warm = True
+
+    def convert(self, path: str, output_dir: Path, timeout: float) -> None:
+        if not self.warm or not self.healthy():
+            self.warm_up(timeout)
+        _run([*self.args(), "--convert-to", "pdf", path, "--outdir", str(output_dir)], self.env, timeout)
+
+
+class LibreOfficePool:
+    """Pool of LibreOffice instances with persistent profiles, which limits the number of concurrent conversions.
+
+    Conversions wait in a queue for a free instance, so no two conversions use the same profile at the same time.
+    An instance which fails or hangs for more than `timeout` seconds is killed and gets a fresh profile.
+    """
+
+    root = Path(tempfile.gettempdir()) / "reis-libreoffice"
+
+    def __init__(self, size: int = 2, timeout: float = 300, retries: int = 3) -> None:
+        self.size = size
+        self.timeout = timeout
+        self.retries = retries
+        self._clean_up_stale_profiles()
+        # profiles are separated per process, since every worker process has its own pool
+        self.directory = self.root / str(os.getpid()) / uuid4().hex
+        self._instances: Queue[LibreOfficeInstance] = Queue()
+        for i in range(size):
+            self._instances.put(LibreOfficeInstance(self.directory / f"profile-{i}"))
+
+    def _clean_up_stale_profiles(self) -> None:
+        # processes which were killed could not clean up their profiles
+        if not self.root.is_dir():
+            return
+        for directory in self.root.iterdir():
+            if directory.name.isdigit() and not _pid_is_alive(int(directory.name)):
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def start(self) -> None:
+        """Warms up all instances in the background, such that the first conversions do not pay for it."""
+
+        def warm_up() -> None:
+            instance = self._instances.get()
+            try:
+                instance.warm_up(self.timeout)
+            except Exception as e:
+                logger.warning(f"Failed to warm up LibreOffice: {e!r}")
+            finally:
+                self._instances.put(instance)
+
+        for _ in range(self.size):
+            Thread(target=warm_up, name="libreoffice-warm-up", daemon=True).start()
+
+    def close(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def convert(self, path: str, file_id: str) -> str:
+        """Converts the file at `path` to pdf and returns the path of the pdf in a new directory."""
+        output_dir = Path(tempfile.gettempdir()) / uuid4().hex
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        instance = self._instances.get()
+        try:
+            for retry in range(self.retries):
+                try:
+                    logger.info(f"Converting {file_id} with LibreOffice profile {instance.profile.name}")
+                    instance.convert(path, output_dir, self.timeout)
+                except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                    stdout = getattr(e, "stdout", None)
+                    stderr = getattr(e, "stderr", None)
+                    logger.error(
+                        f"Failed to convert {file_id} to pdf, retry {retry + 1}/{self.retries}: {stdout} {stderr} {e!r}"
+                    )
+                    # the profile might be broken, e.g., by a killed instance
+                    instance.reset()
+                else:
+                    break
+            else:
+                shutil.rmtree(output_dir, ignore_errors=True)
+                raise ValueError(f"Can not convert {file_id} to pdf, giving up")
+        finally:
+            self._instances.put(instance)
+
+        base = os.path.basename(path)
+        return os.path.join(output_dir, os.path.splitext(base)[0] + ".pdf")
+
+
+@lru_cache
+def get_libreoffice_pool(size: int = 2, timeout: int = 300) -> LibreOfficePool:
+    return LibreOfficePool(size, timeout)
@@ -1,5 +1,8 @@
+from itertools import islice
 import logging
-import multiprocessing as mp
+from typing import Iterator
+
+from langchain_core.documents import Document
 
 from rei_s.logger_formatter import JsonFormatter
 from rei_s.services.formats.abstract_format_provider import AbstractFormatProvider
@@ -20,26 +23,20 @@ def process_file_in_process(
     format_: AbstractFormatProvider,
     file: SourceFile,
     chunk_size: int | None,
-    queue: mp.Queue,
-) -> None:
-    try:
-        init_subprocess_logger()
-        chunks = format_.process_file(file, chunk_size)
-    except Exception as e:
-        queue.put(e)
+    batch_size: int,
+    pages: range | None = None,
+) -> Iterator[list[Document]]:
+    # the chunks are sent in batches as soon as they are ready, instead of pickling all chunks at once
+    if pages is None:
+        chunks = format_.iter_chunks(file, chunk_size)
     else:
-        queue.put(chunks)
+        chunks = format_.iter_page_chunks(file, pages, chunk_size)
+    while batch := list(islice(chunks, batch_size)):
+        yield batch
 
 
 def convert_file_in_process(
     format_: AbstractFormatProvider,
     file: SourceFile,
-    queue: mp.Queue,
-) -> None:
-    try:
-        init_subprocess_logger()
-        chunks = format_.convert_file_to_pdf(file)
-    except Exception as e:
-        queue.put(e)
-    else:
-        queue.put(chunks)
+) -> Iterator[SourceFile]:
+    yield format_.convert_file_to_pdf(file)
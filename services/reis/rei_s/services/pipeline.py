@@ -0,0 +1,126 @@
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Iterable, Sequence
+
+
+# marks the end of the stream in a channel
+_END = object()
+
+
+class _Channel:
+    """A bounded queue between two pipeline stages, which stops blocking as soon as the pipeline is stopped."""
+
+    def __init__(self, maxsize: int, stop: Event) -> None:
+        self.queue: Queue[Any] = Queue(maxsize=maxsize)
+        self.stop = stop
+
+    def put(self, item: Any) -> bool:
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+            except Full:
+                continue
+            else:
+                return True
+        return False
+
+    def get(self) -> Any:
+        while not self.stop.is_set():
+            try:
+                return self.queue.get(timeout=0.1)
+            except Empty:
+                continue
+        return _END
+
+
+def run_pipeline(
+    source: Iterable[Any],
+    stages: Sequence[Callable[[Any], Any]],
+    sink: Callable[[Any], None],
+    queue_size: int = 2,
+    name: str = "pipeline",
+    workers: Sequence[int] | None = None,
+) -> None:
+    """Runs `sink(stage_n(...stage_1(item)))` for every item of `source`, overlapping all steps.
+
+    The source and every stage run in their own thread, the sink runs in the calling thread.
+    Consecutive steps are connected by queues holding at most `queue_size` items, so a slow step
+    throttles the previous ones and the memory usage is bounded independently of the length of `source`.
+    The first exception raised in any step stops the whole pipeline and is re-raised here.
+
+    `workers` optionally gives the number of threads per stage, e.g., for stages waiting on remote calls.
+    Stages with more than one worker do not preserve the order of the items.
+    """
+    workers = workers or [1] * len(stages)
+    if len(workers) != len(stages) or any(n <= 0 for n in workers):
+        raise ValueError("workers needs a positive number for every stage")
+
+    stop = Event()
+    errors: list[BaseException] = []
+    channels = [_Channel(queue_size, stop) for _ in range(len(stages) + 1)]
+
+    def fail(e: BaseException) -> None:
+        errors.append(e)
+        stop.set()
+
+    def produce() -> None:
+        iterator = iter(source)
+        try:
+            for item in iterator:
+                if not channels[0].put(item):
+                    break
+        except BaseException as e:
+            fail(e)
+        finally:
+            # e.g. allows generators to clean up subprocesses, if we stop early
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            channels[0].put(_END)
+
+    def transform(stage: Callable[[Any], Any], inbox: _Channel, outbox: _Channel, running: list[int]) -> None:
+        try:
+            while (item := inbox.get()) is not _END:
+                if not outbox.put(stage(item)):
+                    break
+            else:
+                # let the other workers of this stage see the end as well
+                inbox.put(_END)
+        except BaseException as e:
+            fail(e)
+        finally:
+            # only the last worker of a stage signals the end to the next stage
+            with lock:
+                running[0] -= 1
+                last = running[0] == 0
+            if last:
+                outbox.put(_END)
+
+    lock = Lock()
+    threads = [Thread(target=produce, name=f"{name}-source", daemon=True)]
+    for n, (stage, num_workers) in enumerate(zip(stages, workers, strict=True)):
+        running = [num_workers]
+        for i in range(num_workers):
+            threads.append(
+                Thread(
+                    target=transform,
+                    args=(stage, channels[n], channels[n + 1], running),
+                    name=f"{name}-{n}-{i}",
+                    daemon=True,
+                )
+            )
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        while (item := channels[-1].get()) is not _END:
+            sink(item)
+    except BaseException as e:
+        fail(e)
+    finally:
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,114 @@
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from threading import Condition, Thread
+import time
+from typing import Any, Callable, Literal
+
+from rei_s.metrics.metrics import scheduler_queue_depth, scheduler_wait_seconds
+
+
+# interactive tasks are waited for by a user, e.g., a single upload or a preview,
+# bulk tasks ingest many files at once and may wait longer
+Priority = Literal["interactive", "bulk"]
+
+
+@dataclass
+class _Task:
+    future: Future
+    fn: Callable[[], Any]
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+class FairScheduler(Executor):
+    """Thread pool, which does not run the tasks in the order of their submission.
+
+    The priority classes share the workers by their weights, i.e., with the weights 8 and 1, eight interactive
+    tasks are started for every bulk task while both are waiting. An idle class does not save up its share.
+    Within a class, the tenants (e.g., buckets) take turns, such that a tenant which submits hundreds of
+    tasks does not delay the single task of another tenant. Running tasks are never interrupted.
+    """
+
+    def __init__(self, workers: int, weights: dict[Priority, int] | None = None) -> None:
+        self.weights: dict[Priority, int] = weights or {"interactive": 8, "bulk": 1}
+        # the waiting tasks by class and tenant, the tenants are served in the order of the dict
+        self._queues: dict[Priority, OrderedDict[str, deque[_Task]]] = {p: OrderedDict() for p in self.weights}
+        # stride scheduling: every task advances the pass of its class by 1 / weight,
+        # the class whose pass would be the lowest after its next task is served next
+        self._passes: dict[Priority, float] = {p: 0.0 for p in self.weights}
+        self._condition = Condition()
+        self._shutdown = False
+
+        self._threads = [Thread(target=self._work, name=f"worker-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        return self.schedule("interactive", "", fn, *args, **kwargs)
+
+    def schedule(self, priority: Priority, tenant: str, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        task = _Task(future, lambda: fn(*args, **kwargs))
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+
+            if not self._queues[priority]:
+                # a class which was idle continues at the pass of the busy classes
+                busy = [self._passes[p] for p, queue in self._queues.items() if queue]
+                self._passes[priority] = max(self._passes[priority], min(busy, default=0.0))
+            self._queues[priority].setdefault(tenant, deque()).append(task)
+            scheduler_queue_depth.labels(priority=priority).inc()
+            self._condition.notify()
+        return future
+
+    def _next(self) -> _Task:
+        priority = min(
+            (p for p, queue in self._queues.items() if queue), key=lambda p: self._passes[p] + 1 / self.weights[p]
+        )
+        self._passes[priority] += 1 / self.weights[priority]
+
+        queue = self._queues[priority]
+        tenant, tasks = next(iter(queue.items()))
+        task = tasks.popleft()
+        if tasks:
+            queue.move_to_end(tenant)
+        else:
+            del queue[tenant]
+
+        scheduler_queue_depth.labels(priority=priority).dec()
+        scheduler_wait_seconds.labels(priority=priority).observe(time.monotonic() - task.submitted_at)
+        return task
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._shutdown or any(self._queues.values()))
+                if not any(self._queues.values()):
+                    return
+                task = self._next()
+
+            if not task.future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = task.fn()
+            except BaseException as e:
+                task.future.set_exception(e)
+            else:
+                task.future.set_result(result)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._condition:
+            self._shutdown = True
+            if cancel_futures:
+                for priority, queue in self._queues.items():
+                    for tasks in queue.values():
+                        for task in tasks:
+                            task.future.cancel()
+                        scheduler_queue_depth.labels(priority=priority).dec(len(tasks))
+                    queue.clear()
+            self._condition.notify_all()
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
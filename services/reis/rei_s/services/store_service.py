@@ -1,31 +1,44 @@
-import multiprocessing as mp
-from typing import Any, Generator, List
-from math import ceil
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from threading import Lock
+from typing import Any, Callable, Iterable, Iterator, List
 
 from fastapi import HTTPException
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from openai import RateLimitError
 from tenacity import RetryCallState, retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 
 from rei_s import logger
-from rei_s.services.filestore_adapter import FileStoreAdapter
+from rei_s.services.filestore_adapter import DocumentReader, FileStoreAdapter
+from rei_s.services.job_queue import Job
 from rei_s.services.formats.utils import ProcessingError
 from rei_s.services.multiprocess_utils import convert_file_in_process, process_file_in_process
-from rei_s.services.embeddings_provider import get_embeddings
+from rei_s.services.pipeline import run_pipeline
+from rei_s.services.worker_pool import WorkerTimeoutError
+from rei_s.services.embeddings_provider import get_embeddings, get_embeddings_model_name
+from rei_s.services.embeddings_cache import aembed_queries, get_chunk_embeddings_cache, with_query_cache
 from rei_s.config import Config
-from rei_s.services.vectorstore_adapter import VectorStoreAdapter, VectorStoreFilter
+from rei_s.services.vectorstore_adapter import SearchTuning, VectorStoreAdapter, VectorStoreFilter
 from rei_s.services import filestore_provider
-from rei_s.services import vectorstore_provider
-from rei_s.types.dtos import SourceDto, ChunkDto, DocumentDto
+from rei_s.services import vectorstore_registry, worker_pool
+from rei_s.types.dtos import BatchFileStatus, SourceDto, ChunkDto, DocumentDto
 from rei_s.types.source_file import SourceFile
 from rei_s.services.formats.abstract_format_provider import AbstractFormatProvider
 from rei_s.services.formats import get_format_provider_mappings, get_format_providers
-from rei_s.metrics.metrics import files_processed_counter
+from rei_s.metrics.metrics import embeddings_rate_limited, files_processed_counter
 
 
-def batched(iterable: List[Document], n: int) -> Generator[List[Document], None, None]:
-    for i in range(0, len(iterable), n):
-        yield iterable[i : i + n]
+# called with the number of parsed chunks and the number of embedded batches
+ProgressCallback = Callable[[int, int], None]
+
+
+def batched(iterable: Iterable[Document], n: int) -> Iterator[List[Document]]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, n)):
+        yield batch
 
 
 def _log_rate_limit_retry(retry_state: RetryCallState) -> None:
@@ -44,6 +57,8 @@ def _log_rate_limit_retry(retry_state: RetryCallState) -> None:
 # extensively to support low-tier embedding API subscriptions.
 # Other retryable errors (500, timeouts) are not retried here, but
 # instead rely on the SDK's built-in retries with a low retry count.
+# Additionally, all uploads share an adaptive limit for concurrent requests,
+# which is lowered on rate limits and raised again on success.
 @retry(
     retry=retry_if_exception_type(RateLimitError),
     stop=stop_after_attempt(30),
@@ -51,18 +66,40 @@ def _log_rate_limit_retry(retry_state: RetryCallState) -> None:
     before_sleep=_log_rate_limit_retry,
     reraise=True,
 )
-def _add_documents_with_rate_limit_retry(
-    vector_store: VectorStoreAdapter, batch: list[Document], *, doc_id: str, batch_size: int
-) -> None:
-    vector_store.add_documents(batch)
+def _embed_documents_with_rate_limit_retry(
+    config: Config, batch: list[Document], *, doc_id: str, batch_size: int
+) -> list[list[float]]:
+    embeddings = vectorstore_registry.registry.get_embeddings(config, create_embeddings)
+    limiter = vectorstore_registry.registry.get_embeddings_limiter(config, create_embeddings)
+    texts = [doc.page_content for doc in batch]
+
+    # the slot is released before tenacity sleeps, so waiting retries do not block other requests
+    with limiter.slot() as token:
+        try:
+            chunk_embeddings_cache = get_chunk_embeddings_cache(config)
+            if chunk_embeddings_cache is None:
+                vectors = embeddings.embed_documents(texts)
+            else:
+                vectors = chunk_embeddings_cache.embed_documents(embeddings, get_embeddings_model_name(config), texts)
+        except RateLimitError:
+            embeddings_rate_limited.inc()
+            limiter.on_rate_limit(token)
+            raise
+
+    limiter.on_success()
+    return vectors
+
+
+def create_embeddings(config: Config) -> Embeddings:
+    return with_query_cache(config, get_embeddings(config))
 
 
 def get_vector_store(
     config: Config,
     index_name: str | None,
 ) -> VectorStoreAdapter:
-    embeddings = get_embeddings(config)
-    vector_store = vectorstore_provider.get_vectorstore(config=config, embeddings=embeddings, index_name=index_name)
+    # the registry reuses embeddings clients and vector store adapters across requests
+    vector_store = vectorstore_registry.registry.get_vector_store(config, index_name, create_embeddings)
 
     if vector_store is None:
         raise RuntimeError("Vector store service has not been configured")
@@ -70,6 +107,11 @@ def get_vector_store(
     return vector_store
 
 
+async def aget_vector_store(config: Config, index_name: str | None) -> VectorStoreAdapter:
+    # the first call creates the adapter, which connects to the store, so it must not run in the event loop
+    return await asyncio.to_thread(get_vector_store, config, index_name)
+
+
 def get_file_store(
     config: Config,
 ) -> FileStoreAdapter | None:
@@ -90,9 +132,9 @@ def get_file_name_extensions(config: Config) -> list[str]:
 def process_file(config: Config, file: SourceFile, chunk_size: int | None = None) -> List[Document]:
     logger.info(f"Processing file: {file.id}")
     format_ = find_format_provider(config, file)
-    chunks = process_file_into_chunks(config, file, format_, doc_id=file.id, chunk_size=chunk_size)
+    chunks = iter_file_chunks(config, file, format_, doc_id=file.id, chunk_size=chunk_size)
     chunks_with_metadata = [
-        chunk for batch, _, _ in generate_batches(config, file, chunks, format_, doc_id=file.id) for chunk in batch
+        chunk for batch, _ in generate_batches(config, file, chunks, format_, doc_id=file.id) for chunk in batch
     ]
     files_processed_counter.inc()
     logger.info(f"Completed file: {file.id}")
@@ -107,92 +149,114 @@ def process_and_add_file(config: Config, file: SourceFile, bucket: str, index_na
     return True
 
 
-def process_file_synchronously(
-    format_: AbstractFormatProvider, file: SourceFile, chunk_size: int | None, threshold: int = 10**5
-) -> List[Document]:
+def iter_chunks_synchronously(
+    config: Config, format_: AbstractFormatProvider, file: SourceFile, chunk_size: int | None
+) -> Iterator[Document]:
     # this function tries to optimize for performance,
     # since the process step is the single CPU intensive part
-    # * small files are processed in the same thread to avoid overhead of starting a new process,
-    #   pickling, copying and unpickling the file
-    # * large files will start a new process to avoid the GIL
-    #   this will also lead python to release the RAM used for the processing back to the operating system
-
-    if not format_.may_start_separate_process_for_chunking or file.size < threshold:
-        return format_.process_file(file, chunk_size)
-    else:
-        ctx = mp.get_context("spawn")
-        queue = ctx.Queue()
-        process = ctx.Process(target=process_file_in_process, args=(format_, file, chunk_size, queue))
-
-        process.start()
-        chunks_or_exception = queue.get()
-        process.join()
-
-        if isinstance(chunks_or_exception, Exception):
-            raise chunks_or_exception
-        else:
-            chunks: list[Document] = chunks_or_exception
-
-        return chunks
-
-
-def convert_file_synchronously(format_: AbstractFormatProvider, file: SourceFile, threshold: int = 10**5) -> SourceFile:
+    # * small files are processed in the same thread to avoid overhead of pickling, copying and unpickling the file
+    # * large files are processed in a pre-warmed worker process to avoid the GIL
+    #   workers are recycled regularly, this will also lead python to release the RAM used for the processing
+    #   back to the operating system
+    # * the pages of large documents (e.g. pdf) are processed in several worker processes at once, if there are
+    #   enough pages and workers
+    # the chunks are yielded as soon as they are ready, such that they can be embedded
+    # while the rest of the file is still being processed
+
+    if not format_.may_start_separate_process_for_chunking or file.size < config.filesize_threshold:
+        yield from format_.iter_chunks(file, chunk_size)
+        return
+
+    # usually started in the lifespan of the app already
+    worker_pool.pool.start(config)
+    batch_size = config.batch_size or 200
+
+    page_ranges = None
+    if config.worker_pages_per_task and worker_pool.pool.size > 1:
+        page_ranges = format_.page_ranges(file, config.worker_pages_per_task)
+    if page_ranges is not None and len(page_ranges) > 1:
+        yield from iter_page_chunks_in_parallel(format_, file, chunk_size, batch_size, page_ranges)
+        return
+
+    for batch in worker_pool.pool.run(process_file_in_process, format_, file, chunk_size, batch_size):
+        yield from batch
+
+
+def iter_page_chunks_in_parallel(
+    format_: AbstractFormatProvider,
+    file: SourceFile,
+    chunk_size: int | None,
+    batch_size: int,
+    page_ranges: list[range],
+) -> Iterator[Document]:
+    def process(pages: range) -> list[Document]:
+        batches = worker_pool.pool.run(process_file_in_process, format_, file, chunk_size, batch_size, pages)
+        return [chunk for batch in batches for chunk in batch]
+
+    logger.info(f"Processing {len(page_ranges)} page ranges of file {file.id} in parallel")
+    # every thread waits for a worker process of the pool, which does the actual work
+    executor = ThreadPoolExecutor(max_workers=min(len(page_ranges), worker_pool.pool.size))
+    remaining = iter(page_ranges)
+    try:
+        # at most one range per worker is processed ahead, such that a slow consumer does not hold the chunks
+        # of the whole file in memory, the next range is submitted when a finished one was consumed
+        futures = deque(executor.submit(process, pages) for pages in islice(remaining, worker_pool.pool.size))
+        while futures:
+            # the chunks are yielded in the order of the pages, regardless of which range is done first
+            yield from futures.popleft().result()
+            for pages in islice(remaining, 1):
+                futures.append(executor.submit(process, pages))
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def convert_file_synchronously(config: Config, format_: AbstractFormatProvider, file: SourceFile) -> SourceFile:
     # this function tries to optimize for performance,
     # since the process step is the single CPU intensive part
-    # * small files are processed in the same thread to avoid overhead of starting a new process,
-    #   pickling, copying and unpickling the file
-    # * large files will start a new process to avoid the GIL
-    #   this will also lead python to release the RAM used for the processing back to the operating system
+    # * small files are processed in the same thread to avoid overhead of pickling, copying and unpickling the file
+    # * large files are converted in a pre-warmed worker process to avoid the GIL
 
-    if not format_.may_start_separate_process_for_converting or file.size < threshold:
+    if not format_.may_start_separate_process_for_converting or file.size < config.filesize_threshold:
         return format_.convert_file_to_pdf(file)
-    else:
-        ctx = mp.get_context("spawn")
-        queue = ctx.Queue()
-        process = ctx.Process(target=convert_file_in_process, args=(format_, file, queue))
-
-        process.start()
-        file_or_exception = queue.get()
-        process.join()
 
-        if isinstance(file_or_exception, Exception):
-            raise file_or_exception
-        else:
-            pdf: SourceFile = file_or_exception
-
-        return pdf
+    worker_pool.pool.start(config)
+    (pdf,) = worker_pool.pool.run(convert_file_in_process, format_, file)
+    return pdf
 
 
 def generate_batches(
     config: Config,
     file: SourceFile,
-    chunks: list[Document],
+    chunks: Iterable[Document],
     format_: AbstractFormatProvider,
     bucket: str | None = None,
     doc_id: str | None = None,
-) -> Generator[tuple[List[Document], int, int], None, None]:
-    if len(chunks) > 0:
-        batch_size = config.batch_size if config.batch_size else len(chunks)
-        num_batches = ceil(len(chunks) / batch_size)
-        for index, chunk_batch in enumerate(batched(chunks, batch_size)):
-            with_metadata = [
-                Document(
-                    page_content=x.page_content,
-                    metadata={
-                        **x.metadata,
-                        "format": format_.name,
-                        "mime_type": file.mime_type,
-                        "doc_id": doc_id,
-                        "bucket": bucket,
-                        "source": file.file_name,
-                    },
-                )
-                for x in chunk_batch
-            ]
-
-            yield with_metadata, index, num_batches
-
-    return
+) -> Iterator[tuple[List[Document], int]]:
+    # a batch size of 0 means no batching
+    batches = batched(chunks, config.batch_size) if config.batch_size else [list(chunks)]
+    for index, batch in enumerate(batches):
+        if not batch:
+            continue
+
+        # the chunks are owned by this pipeline, so the metadata can be updated in place instead of copying
+        for chunk in batch:
+            set_chunk_metadata(chunk, file, format_, bucket, doc_id)
+
+        yield batch, index
+
+
+def set_chunk_metadata(
+    chunk: Document, file: SourceFile, format_: AbstractFormatProvider, bucket: str | None, doc_id: str | None
+) -> None:
+    chunk.metadata.update(
+        {
+            "format": format_.name,
+            "mime_type": file.mime_type,
+            "doc_id": doc_id,
+            "bucket": bucket,
+            "source": file.file_name,
+        }
+    )
 
 
 def find_format_provider(config: Config, file: SourceFile) -> AbstractFormatProvider:
@@ -202,15 +266,18 @@ def find_format_provider(config: Config, file: SourceFile) -> AbstractFormatProv
     raise HTTPException(status_code=415, detail="File format not supported.")
 
 
-def process_file_into_chunks(
+def iter_file_chunks(
     config: Config,
     file: SourceFile,
     format_: AbstractFormatProvider,
     doc_id: str | None = None,
     chunk_size: int | None = None,
-) -> list[Document]:
+) -> Iterator[Document]:
     try:
-        chunks = process_file_synchronously(format_, file, chunk_size, config.filesize_threshold)
+        yield from iter_chunks_synchronously(config, format_, file, chunk_size)
+    except WorkerTimeoutError as e:
+        logger.warning(f"Timeout processing file `{doc_id}`: {e}")
+        raise HTTPException(status_code=504, detail="Processing timed out") from e
     except ProcessingError as e:
         logger.warning(f"Failed processing file `{doc_id}`: {e.message}")
         raise HTTPException(status_code=e.status, detail=f"Processing failed: {e.message}") from e
@@ -219,7 +286,6 @@ def process_file_into_chunks(
         # yield individual errors from special exception classes to ValueError
         logger.warning(f"Failed processing file `{doc_id}`: {e!r}")
         raise HTTPException(status_code=400, detail="Processing failed") from e
-    return chunks
 
 
 def convert_file_to_pdf(
@@ -229,7 +295,10 @@ def convert_file_to_pdf(
     doc_id: str | None = None,
 ) -> SourceFile:
     try:
-        pdf = convert_file_synchronously(format_, file, config.filesize_threshold)
+        pdf = convert_file_synchronously(config, format_, file)
+    except WorkerTimeoutError as e:
+        logger.warning(f"Timeout converting file `{doc_id}`: {e}")
+        raise HTTPException(status_code=504, detail="Conversion timed out") from e
     except ProcessingError as e:
         logger.warning(f"Failed converting file `{doc_id}`: {e.message}")
         raise HTTPException(status_code=e.status, detail=f"Conversion failed: {e.message}") from e
@@ -241,68 +310,295 @@ def convert_file_to_pdf(
     return pdf
 
 
-def add_file(config: Config, file: SourceFile, bucket: str, doc_id: str, index_name: str | None = None) -> None:
-    file_store = get_file_store(config=config)
+def add_chunks(
+    config: Config,
+    file: SourceFile,
+    format_: AbstractFormatProvider,
+    vector_store: VectorStoreAdapter,
+    bucket: str,
+    doc_id: str,
+    on_progress: ProgressCallback | None = None,
+) -> None:
+    chunks = iter_file_chunks(config, file, format_, doc_id)
+    batches = generate_batches(config, file, chunks, format_, bucket, doc_id)
+    num_chunks = 0
+    num_parsed = 0
+    num_embedded = 0
+    progress_lock = Lock()
+
+    def parsed(batches: Iterable[tuple[List[Document], int]]) -> Iterator[tuple[List[Document], int]]:
+        nonlocal num_parsed
+        for batch, index in batches:
+            with progress_lock:
+                num_parsed += len(batch)
+                if on_progress:
+                    on_progress(num_parsed, num_embedded)
+            yield batch, index
+
+    # parsing, embedding and writing run concurrently, connected by bounded queues
+    # therefore only a few batches are in memory at the same time, independent of the size of the file
+    # multiple batches are embedded concurrently, limited by the shared embeddings limiter
+    def embed(item: tuple[List[Document], int]) -> tuple[List[Document], int, list[list[float]] | None]:
+        nonlocal num_embedded
+        batch, index = item
+        if not vector_store.needs_embeddings:
+            return batch, index, None
+
+        logger.info(f"embed {len(batch)} chunks for doc_id {doc_id}: (batch {index + 1})")
+        vectors = _embed_documents_with_rate_limit_retry(config, batch, doc_id=doc_id, batch_size=len(batch))
+
+        with progress_lock:
+            num_embedded += 1
+            if on_progress:
+                on_progress(num_parsed, num_embedded)
+        return batch, index, vectors
+
+    def write(item: tuple[List[Document], int, list[list[float]] | None]) -> None:
+        nonlocal num_chunks
+        batch, index, vectors = item
+        vector_store.add_documents(batch, vectors)
+        num_chunks += len(batch)
+        logger.info(f"ready with {len(batch)} chunks for doc_id {doc_id}: (batch {index + 1})")
+
+    run_pipeline(
+        parsed(batches) if on_progress else batches,
+        [embed],
+        write,
+        queue_size=max(config.ingestion_queue_size, config.embeddings_max_concurrency),
+        name=f"add-{doc_id}",
+        workers=[config.embeddings_max_concurrency],
+    )
+    logger.info(f"added {num_chunks} chunks for doc_id {doc_id}")
+
 
+def add_file(
+    config: Config,
+    file: SourceFile,
+    bucket: str,
+    doc_id: str,
+    index_name: str | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> None:
     format_ = find_format_provider(config, file)
     logger.info(f"start adding doc_id {doc_id} with format {format_.name}")
 
-    chunks = process_file_into_chunks(config, file, format_, doc_id)
-    logger.info(f"chunked doc_id {doc_id} into {len(chunks)} chunks")
-
+    vector_store = get_vector_store(config=config, index_name=index_name)
     file_store = get_file_store(config=config)
-    if file_store:
-        pdf_preview = convert_file_to_pdf(config, file, format_, doc_id)
+
+    # the preview is converted before chunking, since office files are chunked via the very same pdf:
+    # it is kept in `file.preview_pdf_cache`, which is passed along even if the chunking runs in a worker process
+    pdf_preview = convert_file_to_pdf(config, file, format_, doc_id) if file_store else None
+    if pdf_preview:
         logger.info(f"converted doc_id {doc_id} to pdf")
-        try:
-            file_store.add_document(pdf_preview)
-            logger.info(f"saved pdf for doc_id {doc_id}")
-        finally:
+
+    try:
+        add_chunks(config, file, format_, vector_store, bucket, doc_id, on_progress)
+
+        if file_store and pdf_preview:
+            try:
+                file_store.add_document(pdf_preview)
+                logger.info(f"saved pdf for doc_id {doc_id}")
+            except Exception:
+                # do not keep a half added file, the upload will be retried as a whole
+                vector_store.delete(doc_id)
+                raise
+    finally:
+        if pdf_preview:
             pdf_preview.delete()
 
+
+def run_job(config: Config, job: Job, on_progress: ProgressCallback) -> None:
+    """Adds the file of a job of the job queue, like `POST /files` does."""
+    file = SourceFile(id=job.doc_id, path=job.path, file_name=job.file_name, mime_type=job.mime_type)
+
+    if job.attempts > 1:
+        # a previous attempt might have added some of the chunks
+        get_vector_store(config=config, index_name=job.index_name).delete(job.doc_id)
+
+    try:
+        add_file(config, file, job.bucket, job.doc_id, job.index_name, on_progress)
+    finally:
+        # the file itself is kept by the queue for retries
+        if file.preview_pdf_cache:
+            file.preview_pdf_cache.delete()
+    files_processed_counter.inc()
+
+
+def add_files(
+    config: Config, files: List[SourceFile], bucket: str, index_name: str | None = None
+) -> List[BatchFileStatus]:
+    """Adds several files like `add_file`, but embeds and writes the chunks of all files together.
+
+    The chunks of small files are packed into shared batches, which saves most of the embedding requests
+    for many small documents. A file which fails does not fail the others, its status tells what went wrong.
+    """
     vector_store = get_vector_store(config=config, index_name=index_name)
-    for batch, index, num_batches in generate_batches(config, file, chunks, format_, bucket, doc_id):
-        logger.info(f"add {len(batch)} chunks for doc_id {doc_id}: ({index + 1}/{num_batches})")
-        _add_documents_with_rate_limit_retry(vector_store, batch, doc_id=doc_id, batch_size=len(batch))
-        logger.info(f"ready with {len(batch)} chunks for doc_id {doc_id}: ({index + 1}/{num_batches})")
+    file_store = get_file_store(config=config)
 
+    statuses = {file.id: BatchFileStatus(id=file.id, success=True, status_code=200) for file in files}
+    previews: dict[str, SourceFile] = {}
+
+    def fail(doc_id: str, status_code: int, detail: str) -> None:
+        logger.warning(f"Failed adding doc_id {doc_id}: {detail}")
+        statuses[doc_id] = BatchFileStatus(id=doc_id, success=False, status_code=status_code, detail=detail)
+
+    def iter_chunks() -> Iterator[Document]:
+        for file in files:
+            try:
+                format_ = find_format_provider(config, file)
+                logger.info(f"start adding doc_id {file.id} with format {format_.name}")
+                if file_store:
+                    previews[file.id] = convert_file_to_pdf(config, file, format_, file.id)
+                for chunk in iter_file_chunks(config, file, format_, file.id):
+                    set_chunk_metadata(chunk, file, format_, bucket, file.id)
+                    yield chunk
+            except HTTPException as e:
+                # the chunks which were already yielded are deleted, once the pipeline is done
+                fail(file.id, e.status_code, str(e.detail))
+
+    batches = batched(iter_chunks(), config.batch_size) if config.batch_size else [list(iter_chunks())]
+
+    def embed(batch: List[Document]) -> tuple[List[Document], list[list[float]] | None]:
+        if not vector_store.needs_embeddings:
+            return batch, None
+
+        doc_ids = ", ".join(dict.fromkeys(chunk.metadata["doc_id"] for chunk in batch))
+        logger.info(f"embed {len(batch)} chunks for doc_ids {doc_ids}")
+        vectors = _embed_documents_with_rate_limit_retry(config, batch, doc_id=doc_ids, batch_size=len(batch))
+        return batch, vectors
+
+    def write(item: tuple[List[Document], list[list[float]] | None]) -> None:
+        batch, vectors = item
+        vector_store.add_documents(batch, vectors)
+        for chunk in batch:
+            statuses[chunk.metadata["doc_id"]].chunks += 1
 
-def search(
+    try:
+        run_pipeline(
+            (batch for batch in batches if batch),
+            [embed],
+            write,
+            queue_size=max(config.ingestion_queue_size, config.embeddings_max_concurrency),
+            name="add-files",
+            workers=[config.embeddings_max_concurrency],
+        )
+    except Exception as e:
+        # the batches are shared, so we can not tell which files are complete
+        for file in files:
+            if statuses[file.id].success:
+                fail(file.id, 500, f"Adding failed: {e!r}")
+
+    try:
+        for file in files:
+            preview = previews.get(file.id)
+            if file_store and preview and statuses[file.id].success:
+                try:
+                    file_store.add_document(preview)
+                    logger.info(f"saved pdf for doc_id {file.id}")
+                except Exception as e:
+                    fail(file.id, 500, f"Saving the pdf failed: {e!r}")
+
+            # do not keep half added files, the upload will be retried
+            if not statuses[file.id].success:
+                vector_store.delete(file.id)
+            else:
+                files_processed_counter.inc()
+                logger.info(f"added {statuses[file.id].chunks} chunks for doc_id {file.id}")
+    finally:
+        for preview in previews.values():
+            preview.delete()
+
+    return [statuses[file.id] for file in files]
+
+
+def clean_up_search_result(config: Config, doc: Document) -> Document:
+    # remove bucket before passing it back
+    # also call possibly existing cleanup methods for the format
+    provider = get_format_provider_mappings(config).get(doc.metadata["format"])
+
+    cleaned = provider.clean_up(doc) if provider is not None else doc
+    try:
+        del cleaned.metadata["bucket"]
+    except KeyError:
+        pass
+
+    return cleaned
+
+
+async def search(
     config: Config,
     query: str,
     bucket: str | None,
     take: int,
     doc_ids: List[str] | None = None,
     index_name: str | None = None,
+    tuning: SearchTuning | None = None,
 ) -> List[Document]:
-    vector_store = get_vector_store(config=config, index_name=index_name)
+    vector_store = await aget_vector_store(config, index_name)
     store_filter = VectorStoreFilter(bucket=bucket, doc_ids=doc_ids)
 
     logger.info("start similarity search")
 
-    docs = vector_store.similarity_search(query, take, store_filter)
+    docs = await vector_store.asimilarity_search(query, take, store_filter, tuning)
 
-    # remove bucket before passing it back
-    # also call possibly existing cleanup methods for the format
-    result: List[Document] = []
-    for doc in docs:
-        provider = get_format_provider_mappings(config).get(doc.metadata["format"])
+    return [clean_up_search_result(config, doc) for doc in docs]
 
-        if provider is not None:
-            cleaned = provider.clean_up(doc)
-        try:
-            del cleaned.metadata["bucket"]
-        except KeyError:
-            pass
 
-        result.append(cleaned)
+async def search_batch(
+    config: Config,
+    queries: List[str],
+    bucket: str | None,
+    take: int,
+    doc_ids: List[str] | None = None,
+    index_name: str | None = None,
+    tuning: SearchTuning | None = None,
+) -> List[List[Document]]:
+    """Searches for several queries at once and returns the results in the order of the queries."""
+    vector_store = await aget_vector_store(config, index_name)
+    store_filter = VectorStoreFilter(bucket=bucket, doc_ids=doc_ids)
+
+    logger.info(f"start similarity search for {len(queries)} queries")
+
+    if vector_store.needs_embeddings:
+        embeddings = vectorstore_registry.registry.get_embeddings(config, create_embeddings)
+        vectors = await aembed_queries(embeddings, queries)
+    else:
+        vectors = [[] for _ in queries]
+
+    results = await vector_store.asimilarity_search_batch(queries, vectors, take, store_filter, tuning)
+
+    return clean_up_search_results(config, results)
+
+
+def clean_up_search_results(config: Config, results: List[List[Document]]) -> List[List[Document]]:
+    # the results of reformulated queries overlap a lot, so every chunk is only cleaned up once
+    cleaned: dict[str, Document] = {}
+
+    def clean_up(doc: Document) -> Document:
+        if doc.id is None:
+            return clean_up_search_result(config, doc)
+        if doc.id not in cleaned:
+            cleaned[doc.id] = clean_up_search_result(config, doc)
+        return cleaned[doc.id]
 
-    return result
+    return [[clean_up(doc) for doc in docs] for docs in results]
 
 
-def get_documents_content(config: Config, ids: List[str], index_name: str | None = None) -> List[str]:
+def rebuild_index(config: Config, index_name: str | None = None, recreate: bool = False) -> None:
     vector_store = get_vector_store(config=config, index_name=index_name)
-    docs = vector_store.get_documents(ids)
+    logger.info(f"rebuild indexes of index `{index_name}`")
+    try:
+        vector_store.rebuild_index(recreate)
+    except Exception as e:
+        # this runs in the background, so nobody else would notice
+        logger.error(f"Failed to rebuild indexes of index `{index_name}`: {e!r}")
+        raise
+    logger.info(f"rebuilt indexes of index `{index_name}`")
+
+
+async def get_documents_content(config: Config, ids: List[str], index_name: str | None = None) -> List[str]:
+    vector_store = await aget_vector_store(config, index_name)
+    docs = await vector_store.aget_documents(ids)
 
     logger.info(f"get {len(ids)} chunks")
 
@@ -317,24 +613,24 @@ def get_documents_content(config: Config, ids: List[str], index_name: str | None
     return content
 
 
-def get_document_pdf(config: Config, doc_id: str) -> SourceFile | None:
+def get_document_pdf(config: Config, doc_id: str) -> DocumentReader | None:
     file_store = get_file_store(config=config)
     logger.info(f"get file: {doc_id}")
     if file_store is None:
         return None
 
-    return file_store.get_document(doc_id)
+    return file_store.open_document(doc_id)
 
 
-def delete_file(config: Config, doc_id: str, index_name: str | None = None) -> None:
-    vector_store = get_vector_store(config=config, index_name=index_name)
+async def delete_file(config: Config, doc_id: str, index_name: str | None = None) -> None:
+    vector_store = await aget_vector_store(config, index_name)
     logger.info(f"delete chunks with doc_id '{doc_id}'")
-    vector_store.delete(doc_id)
+    await vector_store.adelete(doc_id)
 
     file_store = get_file_store(config=config)
     if file_store:
         logger.info(f"delete pdf for doc_id '{doc_id}'")
-        file_store.delete(doc_id)
+        await asyncio.to_thread(file_store.delete, doc_id)
 
 
 def get_file_sources_markdown(results: List[Document]) -> str:
@@ -370,18 +666,23 @@ def parse_int_array(s: Any) -> List[int] | None:
         return None
 
 
-def get_file_sources(config: Config, results: List[Document]) -> List[SourceDto]:
+def get_download_availability(config: Config, results: List[Document]) -> dict[str, bool]:
+    file_store = get_file_store(config=config)
+    if not file_store:
+        return {}
+
+    doc_ids = {doc.metadata["doc_id"] for doc in results if "doc_id" in doc.metadata}
+    return file_store.exists_many(doc_ids)
+
+
+def get_file_sources(config: Config, results: List[Document], exists: dict[str, bool] | None = None) -> List[SourceDto]:
     if not results:
         return []
 
     length = len(results)
 
-    file_store = get_file_store(config=config)
-    if file_store:
-        doc_ids = {doc.metadata["doc_id"] for doc in results if "doc_id" in doc.metadata}
-        exists = {doc_id: file_store.exists(doc_id) for doc_id in doc_ids}
-    else:
-        exists = {}
+    if exists is None:
+        exists = get_download_availability(config, results)
 
     return [
         SourceDto(
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from threading import Lock
+import time
+from typing import Callable, Generic, Hashable, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TtlLruCache(Generic[K, V]):
+    """A thread-safe, size bounded LRU cache whose entries expire after `ttl` seconds.
+
+    `on_evict` is called whenever an entry is dropped to make room for a new one (not on expiry).
+    """
+
+    def __init__(self, max_size: int, ttl: float, on_evict: Callable[[], None] | None = None) -> None:
+        if max_size <= 0:
+            raise ValueError("max_size needs to be >0")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._lock = Lock()
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: K, value: V) -> None:
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+
+        if self.on_evict is not None:
+            for _ in range(evicted):
+                self.on_evict()
+
+    def delete(self, key: K) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from langchain_core.documents import Document
@@ -10,9 +12,19 @@ class VectorStoreFilter(BaseModel):
     doc_ids: List[str] | None = None
 
 
+class SearchTuning(BaseModel):
+    """Per query tuning of approximate nearest neighbour indexes, stores without such indexes ignore it."""
+
+    # size of the candidate list of HNSW indexes, higher values find better results but are slower
+    ef_search: int | None = None
+    # number of lists of IVFFlat indexes which are searched, higher values find better results but are slower
+    probes: int | None = None
+
+
 class VectorStoreAdapter(ABC):
     @abstractmethod
-    def add_documents(self, documents: list[Document]) -> None:
+    def add_documents(self, documents: list[Document], embeddings: list[list[float]] | None = None) -> None:
+        """Adds the documents. If no precomputed `embeddings` are given, the documents are embedded by the store."""
         raise NotImplementedError
 
     @abstractmethod
@@ -21,10 +33,91 @@ class VectorStoreAdapter(ABC):
 
     @abstractmethod
     def similarity_search(
-        self, query: str, k: int = 4, search_filter: VectorStoreFilter | None = None
+        self,
+        query: str,
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
+    ) -> List[Document]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def similarity_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
     ) -> List[Document]:
         raise NotImplementedError
 
+    def similarity_search_batch(
+        self,
+        queries: list[str],
+        embeddings: list[list[float]],
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
+    ) -> List[List[Document]]:
+        """Searches for all `queries` with their `embeddings` and returns the results in the order of the queries.
+
+        By default, the searches only use the embeddings and run concurrently.
+        Stores which can answer all queries with a single request should override this.
+        """
+        if len(embeddings) <= 1:
+            return [self.similarity_search_by_vector(embedding, k, search_filter, tuning) for embedding in embeddings]
+
+        with ThreadPoolExecutor(max_workers=min(len(embeddings), 8), thread_name_prefix="search") as executor:
+            return list(
+                executor.map(
+                    lambda embedding: self.similarity_search_by_vector(embedding, k, search_filter, tuning), embeddings
+                )
+            )
+
     @abstractmethod
     def get_documents(self, ids: List[str]) -> List[Document]:
         raise NotImplementedError
+
+    # The async variants are used by the request handlers, such that waiting for the store does not block a thread.
+    # By default, they run the sync methods in a thread. Stores with async clients should override them.
+
+    async def adelete(self, doc_id: str) -> None:
+        await asyncio.to_thread(self.delete, doc_id)
+
+    async def asimilarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
+    ) -> List[Document]:
+        return await asyncio.to_thread(self.similarity_search, query, k, search_filter, tuning)
+
+    async def asimilarity_search_batch(
+        self,
+        queries: list[str],
+        embeddings: list[list[float]],
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
+    ) -> List[List[Document]]:
+        return await asyncio.to_thread(self.similarity_search_batch, queries, embeddings, k, search_filter, tuning)
+
+    async def aget_documents(self, ids: List[str]) -> List[Document]:
+        return await asyncio.to_thread(self.get_documents, ids)
+
+    def rebuild_index(self, recreate: bool = False) -> None:
+        """Rebuilds the search indexes of the store, with `recreate` using the current index parameters.
+
+        This is a no-op for stores which maintain their indexes themselves.
+        """
+        return None
+
+    @property
+    def needs_embeddings(self) -> bool:
+        """Whether the documents need to be embedded before they are added."""
+        return True
+
+    def close(self) -> None:
+        """Release held resources like connection pools. Called when the adapter is discarded."""
+        return None
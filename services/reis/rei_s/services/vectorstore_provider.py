@@ -11,11 +11,16 @@ def get_vectorstore(
     config: Config,
     embeddings: Embeddings,
     index_name: str | None,
+    vector_dimension: int | None = None,
 ) -> VectorStoreAdapter:
     if config.store_type == "pgvector":
-        return PGVectorStoreAdapter.create(config=config, embeddings=embeddings, index_name=index_name)
+        return PGVectorStoreAdapter.create(
+            config=config, embeddings=embeddings, index_name=index_name, vector_dimension=vector_dimension
+        )
     elif config.store_type == "azure-ai-search":
-        return AzureAISearchStoreAdapter.create(config=config, embeddings=embeddings, index_name=index_name)
+        return AzureAISearchStoreAdapter.create(
+            config=config, embeddings=embeddings, index_name=index_name, vector_dimension=vector_dimension
+        )
     elif config.store_type == "dev-null":
         return DevNullVectorStoreAdapter.create(config=config, embeddings=embeddings, index_name=index_name)
     else:
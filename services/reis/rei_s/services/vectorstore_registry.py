@@ -0,0 +1,131 @@
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Hashable
+
+from langchain_core.embeddings import Embeddings
+
+from rei_s import logger
+from rei_s.config import Config
+from rei_s.metrics.metrics import embeddings_concurrency_limit
+from rei_s.services import vectorstore_provider
+from rei_s.services.concurrency_limiter import AdaptiveConcurrencyLimiter
+from rei_s.services.vectorstore_adapter import VectorStoreAdapter
+
+
+EmbeddingsFactory = Callable[[Config], Embeddings]
+
+
+@dataclass
+class EmbeddingsEntry:
+    embeddings: Embeddings
+    limiter: AdaptiveConcurrencyLimiter
+    vector_dimension: int | None = None
+    lock: Lock = field(default_factory=Lock)
+
+
+class VectorStoreRegistry:
+    """Process wide registry of long-lived embeddings clients and vector store adapters.
+
+    Creating an embeddings client builds a new HTTP client (and connection pool) and some vector stores
+    need to embed a probe text to learn the vector dimension. Both are expensive, so we do it once per
+    configuration and index instead of once per request.
+    The registry lock only guards the dictionaries, the clients and adapters are created under a lock per key,
+    such that a slow creation only blocks the requests which wait for the same client or adapter.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._embeddings: dict[Config, EmbeddingsEntry] = {}
+        self._vector_stores: dict[tuple[Config, str | None], VectorStoreAdapter] = {}
+        self._creation_locks: dict[Hashable, Lock] = {}
+
+    def _creation_lock(self, key: Hashable) -> Lock:
+        with self._lock:
+            return self._creation_locks.setdefault(key, Lock())
+
+    def _get_embeddings_entry(self, config: Config, factory: EmbeddingsFactory) -> EmbeddingsEntry:
+        with self._lock:
+            entry = self._embeddings.get(config)
+        if entry is not None:
+            return entry
+
+        with self._creation_lock(config):
+            with self._lock:
+                entry = self._embeddings.get(config)
+            if entry is None:
+                entry = EmbeddingsEntry(
+                    embeddings=factory(config),
+                    limiter=AdaptiveConcurrencyLimiter(
+                        config.embeddings_max_concurrency, on_change=embeddings_concurrency_limit.set
+                    ),
+                )
+                with self._lock:
+                    self._embeddings[config] = entry
+            return entry
+
+    def get_embeddings(self, config: Config, factory: EmbeddingsFactory) -> Embeddings:
+        return self._get_embeddings_entry(config, factory).embeddings
+
+    def get_embeddings_limiter(self, config: Config, factory: EmbeddingsFactory) -> AdaptiveConcurrencyLimiter:
+        # shared by all uploads, such that parallel uploads do not exceed the rate limit independently
+        return self._get_embeddings_entry(config, factory).limiter
+
+    def get_vector_dimension(self, config: Config, factory: EmbeddingsFactory) -> int:
+        entry = self._get_embeddings_entry(config, factory)
+        # use a lock per entry, such that the probe does not block other configurations
+        with entry.lock:
+            if entry.vector_dimension is None:
+                entry.vector_dimension = len(entry.embeddings.embed_query("Text"))
+            return entry.vector_dimension
+
+    def get_vector_store(
+        self, config: Config, index_name: str | None, factory: EmbeddingsFactory
+    ) -> VectorStoreAdapter:
+        key = (config, index_name)
+
+        with self._lock:
+            vector_store = self._vector_stores.get(key)
+        if vector_store is not None:
+            return vector_store
+
+        embeddings = self.get_embeddings(config, factory)
+        # only Azure AI Search and the vector indexes of pgvector need to know the dimension up front
+        needs_vector_dimension = config.store_type == "azure-ai-search" or (
+            config.store_type == "pgvector" and config.store_pgvector_ann_index != "none"
+        )
+        vector_dimension = self.get_vector_dimension(config, factory) if needs_vector_dimension else None
+
+        # creating a vector store might create an index or collection, so we do this under the lock of the key
+        # to avoid that two requests race to create the same one
+        with self._creation_lock(key):
+            with self._lock:
+                vector_store = self._vector_stores.get(key)
+            if vector_store is None:
+                logger.info(f"create vector store adapter for index `{index_name}`")
+                vector_store = vectorstore_provider.get_vectorstore(
+                    config=config, embeddings=embeddings, index_name=index_name, vector_dimension=vector_dimension
+                )
+                with self._lock:
+                    self._vector_stores[key] = vector_store
+            return vector_store
+
+    def start(self) -> None:
+        logger.info("Started vector store registry")
+
+    def close(self) -> None:
+        with self._lock:
+            vector_stores = list(self._vector_stores.values())
+            self._vector_stores.clear()
+            self._embeddings.clear()
+            self._creation_locks.clear()
+
+        for vector_store in vector_stores:
+            try:
+                vector_store.close()
+            except Exception as e:
+                logger.warning(f"Failed to close vector store: {e!r}")
+
+        logger.info("Closed vector store registry")
+
+
+registry = VectorStoreRegistry()
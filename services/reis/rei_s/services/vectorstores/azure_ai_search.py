@@ -3,7 +3,7 @@ from typing import Awaitable, List
 
 from langchain_core.documents import Document
 from langchain_core.embeddings.embeddings import Embeddings
-from langchain_community.vectorstores.azuresearch import AzureSearch
+from langchain_community.vectorstores.azuresearch import AzureSearch, _results_to_documents
 from azure.search.documents.indexes.models import (
     SearchableField,
     SearchField,
@@ -12,7 +12,7 @@ from azure.search.documents.indexes.models import (
 )
 
 from rei_s.config import Config
-from rei_s.services.vectorstore_adapter import VectorStoreAdapter, VectorStoreFilter
+from rei_s.services.vectorstore_adapter import SearchTuning, VectorStoreAdapter, VectorStoreFilter
 
 
 lock = Lock()
@@ -22,7 +22,9 @@ class AzureAISearchStoreAdapter(VectorStoreAdapter):
     vector_store: AzureSearch
 
     @classmethod
-    def create(cls, config: Config, embeddings: Embeddings, index_name: str | None) -> "AzureAISearchStoreAdapter":
+    def create(
+        cls, config: Config, embeddings: Embeddings, index_name: str | None, vector_dimension: int | None = None
+    ) -> "AzureAISearchStoreAdapter":
         if index_name is None:
             index_name = config.store_azure_ai_search_service_index_name
         if index_name is None:
@@ -34,6 +36,10 @@ class AzureAISearchStoreAdapter(VectorStoreAdapter):
         if config.store_azure_ai_search_service_api_key is None:
             raise ValueError("The env variable `STORE_AZURE_AI_SEARCH_SERVICE_API_KEY` is missing.")
 
+        # learning the dimension costs an embedding call, so callers should pass it if they know it
+        if vector_dimension is None:
+            vector_dimension = len(embeddings.embed_query("Text"))
+
         # Apparently, we can not filter on metadata in the Python version of langchain
         # https://github.com/langchain-ai/langchain/issues/9261
         # so we have to configure new fields in the azure index, on which we want to filter.
@@ -53,7 +59,7 @@ class AzureAISearchStoreAdapter(VectorStoreAdapter):
                 name="content_vector",
                 type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
                 searchable=True,
-                vector_search_dimensions=len(embeddings.embed_query("Text")),
+                vector_search_dimensions=vector_dimension,
                 vector_search_profile_name="myHnswProfile",
             ),
             SearchableField(
@@ -86,6 +92,7 @@ class AzureAISearchStoreAdapter(VectorStoreAdapter):
                 embedding_function=embeddings,
                 azure_ad_access_token=None,
                 fields=fields,
+                vector_search_dimensions=vector_dimension,
             )
 
         instance = cls()
@@ -94,13 +101,20 @@ class AzureAISearchStoreAdapter(VectorStoreAdapter):
 
         return instance
 
-    def add_documents(self, documents: list[Document]) -> None:
+    def add_documents(self, documents: list[Document], embeddings: list[list[float]] | None = None) -> None:
         # langchain's abstraction of Azure AI seems to forget the ids and replaces them with the kwarg "key"
         # and langchains interface needs us to provide either no keys or keys for every document
         keys = [doc.id for doc in documents if doc.id is not None]
         if len(keys) > 0 and len(keys) != len(documents):
             raise ValueError("If you give an `id` for any document, you need to give an id for every document")
-        self.vector_store.add_documents(documents, keys=keys)
+        if embeddings is None:
+            self.vector_store.add_documents(documents, keys=keys)
+        else:
+            self.vector_store.add_embeddings(
+                zip([doc.page_content for doc in documents], embeddings, strict=True),
+                [doc.metadata for doc in documents],
+                keys=keys,
+            )
 
     def delete(self, doc_id: str) -> None:
         # The `delete` method can only delete by the "key", which is unique, i.e., the chunk id.
@@ -130,7 +144,11 @@ class AzureAISearchStoreAdapter(VectorStoreAdapter):
         return filter_expression
 
     def similarity_search(
-        self, query: str, k: int = 4, search_filter: VectorStoreFilter | None = None
+        self,
+        query: str,
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
     ) -> List[Document]:
         # We catch the special case of an empty file list. While None means that all files may be searched
         # an empty file list means that no files may be searched, such that the result will always be empty.
@@ -142,6 +160,24 @@ class AzureAISearchStoreAdapter(VectorStoreAdapter):
 
         return self.vector_store.similarity_search(query, k, filters=filter_expression)
 
+    def similarity_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
+    ) -> List[Document]:
+        # see `similarity_search`
+        if search_filter is not None and search_filter.doc_ids is not None and len(search_filter.doc_ids) == 0:
+            return []
+
+        filter_expression = self.convert_filter(search_filter)
+
+        # langchain's `similarity_search_by_vector` is not implemented for Azure AI Search,
+        # so we use the search which langchain runs after embedding the query
+        results = self.vector_store._simple_search(embedding, "", k, filters=filter_expression)
+        return [doc for doc, _score in _results_to_documents(results)]
+
     def get_documents(self, ids: List[str]) -> List[Document]:
         filter_query = f"search.in(id, '{', '.join(ids)}')"
         docs = self.vector_store.similarity_search("", len(ids), filters=filter_query)
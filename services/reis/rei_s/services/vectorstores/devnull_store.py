@@ -3,7 +3,7 @@ from langchain_core.documents import Document
 from langchain_core.embeddings.embeddings import Embeddings
 
 from rei_s.config import Config
-from rei_s.services.vectorstore_adapter import VectorStoreAdapter, VectorStoreFilter
+from rei_s.services.vectorstore_adapter import SearchTuning, VectorStoreAdapter, VectorStoreFilter
 
 
 class DevNullVectorStoreAdapter(VectorStoreAdapter):
@@ -15,14 +15,32 @@ class DevNullVectorStoreAdapter(VectorStoreAdapter):
     ) -> "DevNullVectorStoreAdapter":
         return cls()
 
-    def add_documents(self, documents: list[Document]) -> None:
+    @property
+    def needs_embeddings(self) -> bool:
+        # the documents are discarded anyway
+        return False
+
+    def add_documents(self, documents: list[Document], embeddings: list[list[float]] | None = None) -> None:
         pass
 
     def delete(self, doc_id: str) -> None:
         pass
 
     def similarity_search(
-        self, query: str, k: int = 4, search_filter: VectorStoreFilter | None = None
+        self,
+        query: str,
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
+    ) -> List[Document]:
+        return []
+
+    def similarity_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
     ) -> List[Document]:
         return []
 
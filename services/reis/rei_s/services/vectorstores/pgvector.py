@@ -1,27 +1,186 @@
-from threading import Lock
-from typing import Any, Dict, List
+import struct
+from threading import Lock, Thread
+from typing import Any, Dict, List, Literal, Sequence
+import uuid
 
 from langchain_core.documents import Document
 from langchain_postgres import PGVector
 from langchain_core.embeddings.embeddings import Embeddings
-from sqlalchemy import create_engine
+from pgvector.sqlalchemy import HALFVEC, VECTOR
+import psycopg
+from sqlalchemy import (
+    Connection,
+    Engine,
+    Row,
+    Select,
+    String,
+    cast,
+    create_engine,
+    delete,
+    func,
+    literal,
+    literal_column,
+    select,
+    text,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.sql import Executable
 
 from rei_s import logger
 from rei_s.config import Config
-from rei_s.services.vectorstore_adapter import VectorStoreAdapter, VectorStoreFilter
+from rei_s.services.vectorstore_adapter import SearchTuning, VectorStoreAdapter, VectorStoreFilter
 
 
 lock = Lock()
 
-# Cache for vector store instances to prevent creating multiple connections
-_vector_store_cache: Dict[str, PGVector] = {}
+
+DOCUMENT_TSV_COLUMN = "document_tsv"
+BUCKET_COLUMN = "bucket"
+DOC_ID_COLUMN = "doc_id"
+
+# pgvector can index `vector` columns with up to 2000 dimensions, but `halfvec` columns with up to 4000
+MAX_VECTOR_INDEX_DIMENSION = 2000
+
+
+def metadata_columns_exist(connection: Connection, table: str) -> bool:
+    # the trigger is created after the columns
+    return bool(
+        connection.execute(
+            text("SELECT 1 FROM pg_trigger WHERE tgname = :name AND tgrelid = CAST(:table AS regclass)"),
+            {"name": f"{table}_metadata_columns", "table": table},
+        ).scalar()
+    )
+
+
+def metadata_indexes_exist(connection: Connection, table: str) -> bool:
+    names = [f"ix_embedding_{column}" for column in (BUCKET_COLUMN, DOC_ID_COLUMN)]
+    valid = connection.execute(
+        text(
+            "SELECT count(*) FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = ANY(:names) AND i.indrelid = CAST(:table AS regclass) AND i.indisvalid"
+        ),
+        {"names": names, "table": table},
+    ).scalar()
+    return valid == len(names)
+
+
+def create_metadata_columns(connection: Connection, table: str) -> None:
+    """Adds the indexable `bucket` and `doc_id` columns, which a trigger copies from the JSONB metadata.
+
+    Thanks to the trigger, all ways to insert chunks fill the columns, including the inserts of langchain.
+    Adding nullable columns only changes the catalog, so this is fast also for large tables.
+    """
+    connection.execute(
+        text(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {BUCKET_COLUMN} varchar, "
+            f"ADD COLUMN IF NOT EXISTS {DOC_ID_COLUMN} varchar"
+        )
+    )
+    connection.execute(
+        text(
+            f"CREATE OR REPLACE FUNCTION {table}_metadata_columns() RETURNS trigger AS $$ "
+            f"BEGIN "
+            f"NEW.{BUCKET_COLUMN} := NEW.cmetadata ->> '{BUCKET_COLUMN}'; "
+            f"NEW.{DOC_ID_COLUMN} := NEW.cmetadata ->> '{DOC_ID_COLUMN}'; "
+            f"RETURN NEW; "
+            f"END $$ LANGUAGE plpgsql"
+        )
+    )
+    # creating a trigger locks the table, so we only do it if it is missing
+    if not metadata_columns_exist(connection, table):
+        connection.execute(
+            text(
+                f"CREATE TRIGGER {table}_metadata_columns BEFORE INSERT OR UPDATE OF cmetadata ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION {table}_metadata_columns()"
+            )
+        )
+
+
+def create_metadata_indexes(connection: Connection, table: str) -> None:
+    # concurrently, such that writes are not blocked, which is why it can not run inside a transaction
+    for column in (BUCKET_COLUMN, DOC_ID_COLUMN):
+        connection.execute(
+            text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_embedding_{column} ON {table} (collection_id, {column})")
+        )
+
+
+def text_search_column_exists(connection: Connection, table: str) -> bool:
+    return bool(
+        connection.execute(
+            text("SELECT 1 FROM pg_trigger WHERE tgname = :name AND tgrelid = CAST(:table AS regclass)"),
+            {"name": f"{table}_{DOCUMENT_TSV_COLUMN}", "table": table},
+        ).scalar()
+    )
+
+
+def create_text_search_column(connection: Connection, table: str, text_search_config: str) -> None:
+    """Adds the `tsvector` column of the hybrid search, which a trigger computes from the document.
+
+    Like the metadata columns, the column is nullable, so adding it only changes the catalog. A generated column
+    would rewrite the whole table, which is shared by all collections, under an exclusive lock.
+    The function of the trigger is replaced, such that new chunks use the current text search config.
+    """
+    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {DOCUMENT_TSV_COLUMN} tsvector"))
+    connection.execute(
+        text(
+            f"CREATE OR REPLACE FUNCTION {table}_{DOCUMENT_TSV_COLUMN}() RETURNS trigger AS $$ "
+            f"BEGIN "
+            f"NEW.{DOCUMENT_TSV_COLUMN} := to_tsvector('{text_search_config}', coalesce(NEW.document, '')); "
+            f"RETURN NEW; "
+            f"END $$ LANGUAGE plpgsql"
+        )
+    )
+    if not text_search_column_exists(connection, table):
+        connection.execute(
+            text(
+                f"CREATE TRIGGER {table}_{DOCUMENT_TSV_COLUMN} BEFORE INSERT OR UPDATE OF document ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION {table}_{DOCUMENT_TSV_COLUMN}()"
+            )
+        )
+
+
+def create_text_search_index(connection: Connection, table: str) -> None:
+    # concurrently, such that writes are not blocked, which is why it can not run inside a transaction
+    connection.execute(
+        text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{DOCUMENT_TSV_COLUMN} "
+            f"ON {table} USING gin ({DOCUMENT_TSV_COLUMN})"
+        )
+    )
+
+
+def vector_to_binary(embedding: list[float]) -> bytes:
+    # the binary format of pgvector: the dimension, an unused int16 and the big-endian float4 values
+    return struct.pack(f">HH{len(embedding)}f", len(embedding), 0, *embedding)
 
 
 class PGVectorStoreAdapter(VectorStoreAdapter):
     vector_store: PGVector
+    engine: Engine
+    # langchain's store is either sync or async, so the async search path has a store of its own
+    async_vector_store: PGVector
+    async_engine: AsyncEngine
+    search_mode: Literal["vector", "hybrid"] = "vector"
+    text_search_config: str = "simple"
+    hybrid_candidates: int = 50
+    metadata_columns: bool = False
+    ann_index: Literal["none", "hnsw", "ivfflat"] = "none"
+    vector_dimension: int | None = None
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int = 40
+    ivfflat_lists: int = 100
+    ivfflat_probes: int = 1
+
+    # the constant of the reciprocal rank fusion, 60 is the value of the original paper
+    rrf_k = 60
 
     @classmethod
-    def create(cls, config: Config, embeddings: Embeddings, index_name: str | None = None) -> "PGVectorStoreAdapter":
+    def create(
+        cls, config: Config, embeddings: Embeddings, index_name: str | None = None, vector_dimension: int | None = None
+    ) -> "PGVectorStoreAdapter":
         if config.store_pgvector_url is None:
             raise ValueError("The env variable `STORE_PGVECTOR_URL` is missing.")
 
@@ -31,62 +190,298 @@ class PGVectorStoreAdapter(VectorStoreAdapter):
         if collection_name is None:
             collection_name = "index"
 
-        # Create a cache key based on connection URL and collection name
-        cache_key = f"{config.store_pgvector_url}:{collection_name}"
-
         # In the python version the table name is hardcoded in langchain to `langchain_pg_collection`
         # https://github.com/langchain-ai/langchain/discussions/17223
         # We need to handle this via the collection name.
 
+        # Note that the adapter owns a connection pool, so it should be reused, see `vectorstore_registry`.
+        engine = create_engine(
+            config.store_pgvector_url.get_secret_value(),
+            pool_size=5,
+            max_overflow=10,
+            pool_recycle=3600,
+        )
+
+        async_engine = create_async_engine(
+            config.store_pgvector_url.get_secret_value(),
+            pool_size=5,
+            max_overflow=10,
+            pool_recycle=3600,
+        )
+
         # We need to lock this, otherwise it two processes might race to create the same collection
         with lock:
-            # Check if we already have a vector store instance for this configuration
-            if cache_key not in _vector_store_cache:
-                engine = create_engine(
-                    config.store_pgvector_url.get_secret_value(),
-                    pool_size=5,
-                    max_overflow=10,
-                    pool_recycle=3600,
-                )
-
-                pg_vector_store = PGVector(
-                    embeddings,
-                    connection=engine,
-                    collection_name=collection_name,
-                    use_jsonb=True,
-                )
-                _vector_store_cache[cache_key] = pg_vector_store
-            else:
-                pg_vector_store = _vector_store_cache[cache_key]
+            pg_vector_store = PGVector(
+                embeddings,
+                connection=engine,
+                collection_name=collection_name,
+                use_jsonb=True,
+            )
+        # the extension, the tables and the collection have been created by the sync store already
+        async_pg_vector_store = PGVector(
+            embeddings,
+            connection=async_engine,
+            collection_name=collection_name,
+            use_jsonb=True,
+            create_extension=False,
+        )
 
         instance = cls()
 
         instance.vector_store = pg_vector_store
+        instance.engine = engine
+        instance.async_vector_store = async_pg_vector_store
+        instance.async_engine = async_engine
+        instance.search_mode = config.store_pgvector_search_mode
+        instance.text_search_config = config.store_pgvector_text_search_config
+        instance.hybrid_candidates = config.store_pgvector_hybrid_candidates
+
+        if instance.search_mode == "hybrid":
+            instance.create_text_search_column()
+
+        instance.metadata_columns = config.store_pgvector_metadata_columns
+        if instance.metadata_columns:
+            instance.create_metadata_columns()
+
+        instance.ann_index = config.store_pgvector_ann_index
+        instance.hnsw_m = config.store_pgvector_hnsw_m
+        instance.hnsw_ef_construction = config.store_pgvector_hnsw_ef_construction
+        instance.hnsw_ef_search = config.store_pgvector_hnsw_ef_search
+        instance.ivfflat_lists = config.store_pgvector_ivfflat_lists
+        instance.ivfflat_probes = config.store_pgvector_ivfflat_probes
+
+        if instance.ann_index != "none":
+            # the index is built on a fixed number of dimensions, learning it costs an embedding call
+            if vector_dimension is None:
+                vector_dimension = len(embeddings.embed_query("Text"))
+            instance.vector_dimension = vector_dimension
+
+            # building the index of a large collection takes a while, but searches and writes are not blocked meanwhile
+            Thread(target=instance.create_ann_index, name="pgvector-index", daemon=True).start()
 
         return instance
 
-    def add_documents(self, documents: list[Document]) -> None:
-        self.vector_store.add_documents(documents)
+    def create_text_search_column(self) -> None:
+        """Adds the full text search column and its trigger to the embeddings table, if they are missing.
 
-    def delete(self, doc_id: str) -> None:
-        # The vector store does not offer a method to delete chunks by metadata (only chunk id), thus
-        # we do it ourselves by calling SQLAlchemy directly using the protected `_make_sync_session` method.
-        from sqlalchemy import delete
+        Thanks to the trigger, the inserts of langchain do not need to know about the column. The existing chunks
+        and the GIN index are left to `migrate-pgvector-text-search`, since both take a while on large tables.
+        """
+        table = self.vector_store.EmbeddingStore.__tablename__
+        with self.engine.begin() as connection:
+            # altering the table locks it, so we only do it if the column is missing
+            if text_search_column_exists(connection, table):
+                return
+            # the thread lock does not help against other processes, which create the same column at startup
+            connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": f"{table}_schema"})
+            create_text_search_column(connection, table, self.text_search_config)
+        logger.warning(
+            "Added the full text search column, run `migrate-pgvector-text-search` to index the existing chunks"
+        )
+
+    def create_metadata_columns(self) -> None:
+        """Adds the `bucket` and `doc_id` columns and their trigger to the embeddings table, if they are missing.
+
+        The indexes are left to `migrate-pgvector-metadata-columns`, which builds them without blocking writes.
+        """
+        table = self.vector_store.EmbeddingStore.__tablename__
+        with self.engine.begin() as connection:
+            # altering the table locks it, so we only do it if the columns are missing
+            if metadata_columns_exist(connection, table):
+                if not metadata_indexes_exist(connection, table):
+                    logger.warning("The metadata columns are not indexed, run `migrate-pgvector-metadata-columns`")
+                return
+            connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": f"{table}_schema"})
+            create_metadata_columns(connection, table)
+        logger.warning("Added the metadata columns, run `migrate-pgvector-metadata-columns` to index them")
+
+    def _index_vector_type(self) -> tuple[str, Any]:
+        if self.vector_dimension is None:
+            raise ValueError("The vector dimension is needed for the index")
+        if self.vector_dimension <= MAX_VECTOR_INDEX_DIMENSION:
+            return "vector", VECTOR(self.vector_dimension)
+        return "halfvec", HALFVEC(self.vector_dimension)
+
+    def _ann_index_name(self, collection_uuid: uuid.UUID) -> str:
+        return f"ix_embedding_{self.ann_index}_{collection_uuid.hex}"
 
+    def _create_ann_index_statement(self, name: str, collection_uuid: uuid.UUID) -> str:
+        # All collections share one table, so every collection gets a partial index.
+        # langchain does not give the column a fixed dimension, which is needed for an index, so we index a cast.
+        # We only use langchain's default distance strategy, the cosine distance.
+        vector_type, _ = self._index_vector_type()
+        if self.ann_index == "hnsw":
+            method, parameters = "hnsw", f"m = {self.hnsw_m}, ef_construction = {self.hnsw_ef_construction}"
+        else:
+            method, parameters = "ivfflat", f"lists = {self.ivfflat_lists}"
+
+        return (
+            f"CREATE INDEX CONCURRENTLY {name} ON {self.vector_store.EmbeddingStore.__tablename__} "
+            f"USING {method} ((embedding::{vector_type}({self.vector_dimension})) {vector_type}_cosine_ops) "
+            f"WITH ({parameters}) WHERE collection_id = '{collection_uuid}'"
+        )
+
+    def maintain_ann_index(self, rebuild: bool = False, recreate: bool = False) -> None:
+        """Creates the approximate nearest neighbour index of the collection if it is missing.
+
+        With `rebuild` an existing index is rebuilt, e.g., after many deletes. With `recreate` it is replaced
+        by a new index with the current parameters. Neither blocks searches or writes.
+        """
+        embedding_store = self.vector_store.EmbeddingStore
         with self.vector_store._make_sync_session() as session:
-            stmt = delete(self.vector_store.EmbeddingStore)
+            collection = self.vector_store.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            collection_uuid = collection.uuid
+            is_empty = (
+                session.query(embedding_store.id).filter(embedding_store.collection_id == collection_uuid).first()
+                is None
+            )
+
+        name = self._ann_index_name(collection_uuid)
+        # concurrent index builds can not run inside a transaction
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            # only one process maintains the index of a collection at a time
+            locked = connection.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": name}).scalar()
+            if not locked:
+                logger.info(f"index `{name}` is maintained by another process")
+                return
+
+            try:
+                valid = connection.execute(
+                    text(
+                        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                        "WHERE c.relname = :name"
+                    ),
+                    {"name": name},
+                ).scalar()
+
+                if valid is False:
+                    # a concurrent build which failed leaves an invalid index behind
+                    logger.warning(f"drop invalid index `{name}`")
+                    connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                    valid = None
+
+                if valid is None:
+                    if self.ann_index == "ivfflat" and is_empty:
+                        # the lists of ivfflat are computed from the existing rows
+                        logger.info(f"skip index `{name}` of the empty collection")
+                        return
+                    logger.info(f"create index `{name}`")
+                    connection.execute(text(self._create_ann_index_statement(name, collection_uuid)))
+                elif recreate:
+                    # the new index is built next to the old one, which is used by searches meanwhile
+                    logger.info(f"recreate index `{name}`")
+                    new_name = f"{name}_new"
+                    connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {new_name}"))
+                    connection.execute(text(self._create_ann_index_statement(new_name, collection_uuid)))
+                    with self.engine.begin() as transaction:
+                        transaction.execute(text(f"DROP INDEX {name}"))
+                        transaction.execute(text(f"ALTER INDEX {new_name} RENAME TO {name}"))
+                elif rebuild:
+                    logger.info(f"rebuild index `{name}`")
+                    connection.execute(text(f"REINDEX INDEX CONCURRENTLY {name}"))
+
+                logger.info(f"index `{name}` is up to date")
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": name})
+
+    def create_ann_index(self) -> None:
+        try:
+            self.maintain_ann_index()
+        except Exception as e:
+            logger.error(f"Failed to create the vector index: {e!r}")
 
+    def rebuild_index(self, recreate: bool = False) -> None:
+        if self.ann_index == "none":
+            logger.info("no vector index is configured")
+            return
+        self.maintain_ann_index(rebuild=True, recreate=recreate)
+
+    def add_documents(self, documents: list[Document], embeddings: list[list[float]] | None = None) -> None:
+        if embeddings is None:
+            self.vector_store.add_documents(documents)
+        else:
+            self.copy_embeddings(documents, embeddings)
+
+    def copy_embeddings(self, documents: list[Document], embeddings: list[list[float]]) -> None:
+        """Upserts the documents with their embeddings like langchain's `add_embeddings`, but with a binary COPY.
+
+        The rows are streamed into a temporary table in one round trip and upserted from there with a single
+        statement, all in one transaction. Compared to a multi-row INSERT, this saves the statement parsing and
+        the text encoding of the vectors. The upsert into the embeddings table is written to the WAL as usual.
+        """
+        with self.vector_store._make_sync_session() as session:
+            collection = self.vector_store.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            collection_uuid = collection.uuid
+
+        table = self.vector_store.EmbeddingStore.__tablename__
+        staging = f"{table}_staging"
+        columns = "id, collection_id, embedding, document, cmetadata"
+        with self.engine.begin() as connection:
+            # SQLAlchemy has no API for COPY, so we use the connection of psycopg
+            driver_connection = connection.connection.driver_connection
+            if not isinstance(driver_connection, psycopg.Connection):
+                raise TypeError("COPY needs a psycopg connection, use a `postgresql+psycopg://` url")
+            with driver_connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA"
+                )
+                with cursor.copy(f"COPY {staging} ({columns}) FROM STDIN (FORMAT BINARY)") as copy:
+                    # psycopg does not know the vector type, so the vectors are written as raw bytes
+                    copy.set_types(["varchar", "uuid", "bytea", "varchar", "jsonb"])
+                    for doc, embedding in zip(documents, embeddings, strict=True):
+                        copy.write_row(
+                            (
+                                doc.id if doc.id is not None else str(uuid.uuid4()),
+                                collection_uuid,
+                                vector_to_binary(embedding),
+                                doc.page_content,
+                                doc.metadata,
+                            )
+                        )
+                # the triggers of the table fill the full text search and metadata columns on the insert
+                cursor.execute(
+                    f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+                    "ON CONFLICT (id) DO UPDATE SET embedding = EXCLUDED.embedding, "
+                    "document = EXCLUDED.document, cmetadata = EXCLUDED.cmetadata"
+                )
+
+    def _delete_statement(self, collection_uuid: uuid.UUID, doc_id: str) -> Executable:
+        # The vector store does not offer a method to delete chunks by metadata (only chunk id), thus
+        # we do it ourselves by calling SQLAlchemy directly.
+        embedding_store = self.vector_store.EmbeddingStore
+        stmt = delete(embedding_store).where(embedding_store.collection_id == collection_uuid)
+        if self.metadata_columns:
+            return stmt.filter(self._metadata_column(DOC_ID_COLUMN) == doc_id)
+        return stmt.filter(embedding_store.cmetadata["doc_id"].astext == doc_id)
+
+    def delete(self, doc_id: str) -> None:
+        with self.vector_store._make_sync_session() as session:
             collection = self.vector_store.get_collection(session)
             if not collection:
                 logger.warning("Collection not found")
                 return
 
-            stmt = stmt.where(self.vector_store.EmbeddingStore.collection_id == collection.uuid)
-
-            stmt = stmt.filter(self.vector_store.EmbeddingStore.cmetadata["doc_id"].astext == doc_id)
-            session.execute(stmt)
+            session.execute(self._delete_statement(collection.uuid, doc_id))
             session.commit()
 
+    async def adelete(self, doc_id: str) -> None:
+        async with self.async_vector_store._make_async_session() as session:
+            collection = await self.async_vector_store.aget_collection(session)
+            if not collection:
+                logger.warning("Collection not found")
+                return
+
+            await session.execute(self._delete_statement(collection.uuid, doc_id))
+            await session.commit()
+
+    def _metadata_column(self, name: str) -> Any:
+        # the columns are not part of langchain's model
+        return literal_column(f"{self.vector_store.EmbeddingStore.__tablename__}.{name}", String)
+
     @staticmethod
     def convert_filter(search_filter: VectorStoreFilter | None) -> Dict[str, Any] | None:
         filter_dict: Dict[str, Any] | None
@@ -102,11 +497,225 @@ class PGVectorStoreAdapter(VectorStoreAdapter):
         return filter_dict
 
     def similarity_search(
-        self, query: str, k: int = 4, search_filter: VectorStoreFilter | None = None
+        self,
+        query: str,
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
+    ) -> List[Document]:
+        # we use our own queries instead of langchain's, such that the vector index and the tuning are used
+        embedding = self.vector_store.embeddings.embed_query(query)
+        return self.similarity_search_batch([query], [embedding], k, search_filter, tuning)[0]
+
+    async def asimilarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
+    ) -> List[Document]:
+        embedding = await self.vector_store.embeddings.aembed_query(query)
+        return (await self.asimilarity_search_batch([query], [embedding], k, search_filter, tuning))[0]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
     ) -> List[Document]:
+        # without a query text, the hybrid search falls back to the vector search
+        return self.similarity_search_batch([""], [embedding], k, search_filter, tuning)[0]
+
+    def _filter_clauses(self, collection_uuid: uuid.UUID, search_filter: VectorStoreFilter | None) -> list[Any]:
+        embedding_store = self.vector_store.EmbeddingStore
+        # the collection id is inlined, otherwise postgres might not use the partial index of the collection
+        filter_by = [
+            embedding_store.collection_id
+            == literal(collection_uuid, embedding_store.collection_id.type, literal_execute=True)
+        ]
+        if self.metadata_columns:
+            if search_filter is not None and search_filter.bucket is not None:
+                filter_by.append(self._metadata_column(BUCKET_COLUMN) == search_filter.bucket)
+            if search_filter is not None and search_filter.doc_ids is not None:
+                filter_by.append(self._metadata_column(DOC_ID_COLUMN).in_(search_filter.doc_ids))
+            return filter_by
+
         filter_dict = self.convert_filter(search_filter)
+        if filter_dict:
+            filter_clause = self.vector_store._create_filter_clause(filter_dict)
+            if filter_clause is not None:
+                filter_by.append(filter_clause)
+        return filter_by
+
+    def _distance(self, embedding: list[float]) -> Any:
+        if self.ann_index == "none":
+            return self.vector_store.distance_strategy(embedding)
+        # the expression needs to be the one of the index, otherwise postgres does not use it
+        _, vector_type = self._index_vector_type()
+        return cast(self.vector_store.EmbeddingStore.embedding, vector_type).cosine_distance(embedding)
+
+    def _tuning_statement(self, tuning: SearchTuning | None, limit: int) -> Executable | None:
+        # the settings are local to the transaction of the search
+        if self.ann_index == "hnsw":
+            ef_search = tuning.ef_search if tuning and tuning.ef_search else self.hnsw_ef_search
+            # hnsw does not find more than `ef_search` rows
+            return text("SELECT set_config('hnsw.ef_search', :value, true)").bindparams(
+                value=str(max(ef_search, limit))
+            )
+        if self.ann_index == "ivfflat":
+            probes = tuning.probes if tuning and tuning.probes else self.ivfflat_probes
+            return text("SELECT set_config('ivfflat.probes', :value, true)").bindparams(value=str(probes))
+        return None
+
+    def _vector_search_query(self, n: int, embedding: list[float], k: int, filter_by: list[Any]) -> Select:
+        # This is the query of langchain's `similarity_search_by_vector`, the order is reversed by the caller.
+        embedding_store = self.vector_store.EmbeddingStore
+        distance = self._distance(embedding)
+        return (
+            select(
+                literal(n).label("query"),
+                embedding_store.id,
+                embedding_store.document,
+                embedding_store.cmetadata,
+                (-distance).label("score"),
+            )
+            .where(*filter_by)
+            .order_by(distance)
+            .limit(k)
+        )
+
+    def _hybrid_search_query(self, n: int, query: str, embedding: list[float], k: int, filter_by: list[Any]) -> Select:
+        # Both the nearest neighbours and the best keyword matches are ranked and fused with reciprocal rank fusion,
+        # which only needs the ranks, so the distances and the keyword scores do not need to be comparable.
+        embedding_store = self.vector_store.EmbeddingStore
+        candidates = max(k, self.hybrid_candidates)
+
+        distance = self._distance(embedding)
+        vector_ranks = (
+            select(embedding_store.id, func.row_number().over(order_by=distance).label("rank"))
+            .where(*filter_by)
+            .order_by(distance)
+            .limit(candidates)
+            .subquery()
+        )
+
+        document_tsv = literal_column(DOCUMENT_TSV_COLUMN, TSVECTOR)
+        ts_query = func.websearch_to_tsquery(cast(self.text_search_config, REGCONFIG), query)
+        keyword_score = func.ts_rank_cd(document_tsv, ts_query)
+        keyword_ranks = (
+            select(embedding_store.id, func.row_number().over(order_by=keyword_score.desc()).label("rank"))
+            .where(*filter_by, document_tsv.bool_op("@@")(ts_query))
+            .order_by(keyword_score.desc())
+            .limit(candidates)
+            .subquery()
+        )
+
+        score = func.coalesce(1.0 / (self.rrf_k + vector_ranks.c.rank), 0.0) + func.coalesce(
+            1.0 / (self.rrf_k + keyword_ranks.c.rank), 0.0
+        )
+        fused = (
+            select(func.coalesce(vector_ranks.c.id, keyword_ranks.c.id).label("id"), score.label("score"))
+            .select_from(vector_ranks.join(keyword_ranks, vector_ranks.c.id == keyword_ranks.c.id, full=True))
+            .order_by(score.desc())
+            .limit(k)
+            .subquery()
+        )
+
+        return select(
+            literal(n).label("query"),
+            embedding_store.id,
+            embedding_store.document,
+            embedding_store.cmetadata,
+            fused.c.score,
+        ).join(fused, embedding_store.id == fused.c.id)
+
+    def _search_statements(
+        self,
+        collection_uuid: uuid.UUID,
+        queries: list[str],
+        embeddings: list[list[float]],
+        k: int,
+        search_filter: VectorStoreFilter | None,
+        tuning: SearchTuning | None,
+    ) -> tuple[Executable | None, Executable]:
+        # One subquery per query, which are combined, such that all searches need a single round trip.
+        filter_by = self._filter_clauses(collection_uuid, search_filter)
+        hybrid = self.search_mode == "hybrid"
+        tuning_statement = self._tuning_statement(tuning, max(k, self.hybrid_candidates) if hybrid else k)
+        subqueries = [
+            self._hybrid_search_query(n, query, embedding, k, filter_by)
+            if hybrid and query
+            else self._vector_search_query(n, embedding, k, filter_by)
+            for n, (query, embedding) in enumerate(zip(queries, embeddings, strict=True))
+        ]
+        return tuning_statement, union_all(*subqueries)
+
+    @staticmethod
+    def _search_results(num_queries: int, rows: Sequence[Row[Any]]) -> List[List[Document]]:
+        # the order of the rows of a union is not guaranteed
+        results: List[List[Document]] = [[] for _ in range(num_queries)]
+        for row in sorted(rows, key=lambda row: (row.query, -row.score)):
+            results[row.query].append(Document(id=str(row.id), page_content=row.document, metadata=row.cmetadata))
+        return results
 
-        return self.vector_store.similarity_search(query, k, filter_dict)
+    def similarity_search_batch(
+        self,
+        queries: list[str],
+        embeddings: list[list[float]],
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
+    ) -> List[List[Document]]:
+        if len(embeddings) == 0:
+            return []
+
+        with self.vector_store._make_sync_session() as session:
+            collection = self.vector_store.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+
+            tuning_statement, statement = self._search_statements(
+                collection.uuid, queries, embeddings, k, search_filter, tuning
+            )
+            if tuning_statement is not None:
+                session.execute(tuning_statement)
+            rows = session.execute(statement).all()
+
+        return self._search_results(len(embeddings), rows)
+
+    async def asimilarity_search_batch(
+        self,
+        queries: list[str],
+        embeddings: list[list[float]],
+        k: int = 4,
+        search_filter: VectorStoreFilter | None = None,
+        tuning: SearchTuning | None = None,
+    ) -> List[List[Document]]:
+        if len(embeddings) == 0:
+            return []
+
+        async with self.async_vector_store._make_async_session() as session:
+            collection = await self.async_vector_store.aget_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+
+            tuning_statement, statement = self._search_statements(
+                collection.uuid, queries, embeddings, k, search_filter, tuning
+            )
+            if tuning_statement is not None:
+                await session.execute(tuning_statement)
+            rows = (await session.execute(statement)).all()
+
+        return self._search_results(len(embeddings), rows)
 
     def get_documents(self, ids: List[str]) -> List[Document]:
         return self.vector_store.get_by_ids(ids)
+
+    async def aget_documents(self, ids: List[str]) -> List[Document]:
+        return await self.async_vector_store.aget_by_ids(ids)
+
+    def close(self) -> None:
+        self.engine.dispose()
+        # disposing the async pool needs an event loop, so its connections are just dropped and closed by postgres
+        self.async_engine.sync_engine.dispose(close=False)
@@ -0,0 +1,145 @@
+"""Migrates an existing pgvector table to the indexed `bucket` and `doc_id` columns and the full text search column.
+
+Run `migrate-pgvector-metadata-columns` once before setting `STORE_PGVECTOR_METADATA_COLUMNS=true` and
+`migrate-pgvector-text-search` before or after setting `STORE_PGVECTOR_SEARCH_MODE=hybrid`.
+They can be run while REI-S is running, since the rows are updated in small batches and the indexes are built
+concurrently. It is safe to run them again, e.g., after they were interrupted.
+"""
+
+import argparse
+import logging
+from typing import Callable
+
+from sqlalchemy import Engine, create_engine, text
+
+from rei_s import logger
+from rei_s.config import Config, get_config
+from rei_s.services.vectorstores.pgvector import (
+    BUCKET_COLUMN,
+    DOC_ID_COLUMN,
+    DOCUMENT_TSV_COLUMN,
+    create_metadata_columns,
+    create_metadata_indexes,
+    create_text_search_column,
+    create_text_search_index,
+)
+
+# the table name is hardcoded in langchain
+EMBEDDING_TABLE = "langchain_pg_embedding"
+
+
+def backfill(engine: Engine, table: str, batch_size: int, update: str) -> int:
+    """Runs the `update` statement for all existing rows in batches and returns the number of updated rows.
+
+    `update` gets the ids of a batch as `:ids`.
+    """
+    updated = 0
+    last_id = ""
+    while True:
+        # every batch is its own short transaction, such that concurrent writes are not blocked for long
+        with engine.begin() as connection:
+            ids = (
+                connection.execute(
+                    text(f"SELECT id FROM {table} WHERE id > :last_id ORDER BY id LIMIT :batch_size"),
+                    {"last_id": last_id, "batch_size": batch_size},
+                )
+                .scalars()
+                .all()
+            )
+            if not ids:
+                return updated
+
+            result = connection.execute(text(update), {"ids": list(ids)})
+
+        updated += result.rowcount
+        last_id = ids[-1]
+        logger.info(f"backfilled {updated} rows")
+
+
+def backfill_metadata_columns(engine: Engine, table: str, batch_size: int) -> int:
+    """Copies the metadata of all existing rows into the columns and returns the number of updated rows."""
+    return backfill(
+        engine,
+        table,
+        batch_size,
+        f"UPDATE {table} SET {BUCKET_COLUMN} = cmetadata ->> '{BUCKET_COLUMN}', "
+        f"{DOC_ID_COLUMN} = cmetadata ->> '{DOC_ID_COLUMN}' "
+        f"WHERE id = ANY(:ids) "
+        f"AND ({BUCKET_COLUMN} IS DISTINCT FROM cmetadata ->> '{BUCKET_COLUMN}' "
+        f"OR {DOC_ID_COLUMN} IS DISTINCT FROM cmetadata ->> '{DOC_ID_COLUMN}')",
+    )
+
+
+def backfill_text_search_column(engine: Engine, table: str, text_search_config: str, batch_size: int) -> int:
+    """Computes the full text search column of all rows, which are missing it or use another text search config."""
+    tsv = f"to_tsvector('{text_search_config}', coalesce(document, ''))"
+    return backfill(
+        engine,
+        table,
+        batch_size,
+        f"UPDATE {table} SET {DOCUMENT_TSV_COLUMN} = {tsv} "
+        f"WHERE id = ANY(:ids) AND {DOCUMENT_TSV_COLUMN} IS DISTINCT FROM {tsv}",
+    )
+
+
+def migrate_metadata_columns(engine: Engine, table: str = EMBEDDING_TABLE, batch_size: int = 10000) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        # the trigger is created before the backfill, such that rows added meanwhile are not missed
+        create_metadata_columns(connection, table)
+
+    updated = backfill_metadata_columns(engine, table, batch_size)
+    logger.info(f"backfilled the metadata columns of {updated} rows")
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        create_metadata_indexes(connection, table)
+    logger.info("created the indexes of the metadata columns")
+
+
+def migrate_text_search(
+    engine: Engine, text_search_config: str, table: str = EMBEDDING_TABLE, batch_size: int = 10000
+) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        # the trigger is created before the backfill, such that rows added meanwhile are not missed
+        create_text_search_column(connection, table, text_search_config)
+
+    updated = backfill_text_search_column(engine, table, text_search_config, batch_size)
+    logger.info(f"backfilled the full text search column of {updated} rows")
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        create_text_search_index(connection, table)
+    logger.info("created the index of the full text search column")
+
+
+def _run(description: str, migrate: Callable[[Engine, Config, int], None]) -> None:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--batch-size", type=int, default=10000, help="number of rows updated per transaction")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.setLevel(logging.INFO)
+
+    config = get_config()
+    if config.store_pgvector_url is None:
+        raise SystemExit("The env variable `STORE_PGVECTOR_URL` is missing.")
+
+    engine = create_engine(config.store_pgvector_url.get_secret_value())
+    try:
+        migrate(engine, config, args.batch_size)
+    finally:
+        engine.dispose()
+
+
+def main() -> None:
+    _run(
+        "Migrate the pgvector table to indexed bucket and doc_id columns.",
+        lambda engine, _config, batch_size: migrate_metadata_columns(engine, batch_size=batch_size),
+    )
+
+
+def main_text_search() -> None:
+    _run(
+        "Add and index the full text search column of the hybrid search in the pgvector table.",
+        lambda engine, config, batch_size: migrate_text_search(
+            engine, config.store_pgvector_text_search_config, batch_size=batch_size
+        ),
+    )
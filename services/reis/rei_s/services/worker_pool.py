@@ -0,0 +1,188 @@
+import multiprocessing as mp
+from multiprocessing.context import SpawnProcess
+import pickle
+import queue
+from threading import Condition
+import time
+from typing import Any, Callable, Generator, Iterator
+
+from rei_s import logger
+from rei_s.config import Config
+
+
+class WorkerTimeoutError(Exception):
+    pass
+
+
+class WorkerCrashedError(Exception):
+    pass
+
+
+def _sendable(e: Exception) -> Exception:
+    # exceptions with custom constructors can not always be unpickled in the parent, which would hang the caller
+    try:
+        pickle.loads(pickle.dumps(e))
+    except Exception:
+        return RuntimeError(repr(e))
+    return e
+
+
+def _worker_main(tasks: mp.SimpleQueue, results: mp.Queue) -> None:
+    # imported here, since the format providers import the app utils, which import this module
+    from rei_s.services.multiprocess_utils import init_subprocess_logger
+
+    init_subprocess_logger()
+    # import the heavy dependencies of the format providers up front, such that the worker is warm for its first task
+    import rei_s.services.formats  # noqa: F401
+
+    results.put(("ready", None))
+    while (task := tasks.get()) is not None:
+        function, args = task
+        try:
+            for item in function(*args):
+                results.put(("item", item))
+        except Exception as e:
+            results.put(("error", _sendable(e)))
+        else:
+            results.put(("end", None))
+
+
+class _Worker:
+    def __init__(self, ctx: mp.context.SpawnContext, queue_size: int) -> None:
+        self.tasks: mp.SimpleQueue = ctx.SimpleQueue()
+        # bounded, such that a worker pauses if the consumer of its results can not keep up
+        self.results: mp.Queue = ctx.Queue(maxsize=queue_size)
+        self.process: SpawnProcess = ctx.Process(target=_worker_main, args=(self.tasks, self.results), daemon=True)
+        self.process.start()
+        self.tasks_done = 0
+        self.ready = False
+
+    def wait_ready(self) -> None:
+        # the first message of a worker signals that it is warm, the task timeout should not include the start
+        if not self.ready:
+            self.get(None)
+            self.ready = True
+
+    def get(self, timeout: float | None) -> tuple[str, Any]:
+        deadline = time.monotonic() + timeout if timeout is not None else float("inf")
+        while True:
+            try:
+                return self.results.get(timeout=min(1.0, max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+
+            if not self.process.is_alive():
+                raise WorkerCrashedError(f"worker process exited with code {self.process.exitcode}")
+            if time.monotonic() >= deadline:
+                raise WorkerTimeoutError("worker process did not finish its task in time")
+
+    def stop(self) -> None:
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.results.close()
+
+
+class WorkerPool:
+    """Process wide pool of pre-warmed worker processes for the CPU intensive processing of large files.
+
+    Spawning a process per file means paying the interpreter startup and the imports of all format providers
+    every time. The workers of this pool are started once and reused, but a worker is replaced after
+    `worker_max_tasks_per_process` tasks, such that the memory used for processing is returned to the operating system.
+    A worker which crashes or does not finish a task within `worker_task_timeout` seconds is killed and replaced,
+    without affecting the tasks of other workers.
+    """
+
+    def __init__(self) -> None:
+        self._ctx = mp.get_context("spawn")
+        self._condition = Condition()
+        self._idle: list[_Worker] = []
+        self._size = 0
+        self._max_tasks = 1
+        self._timeout = 0.0
+        self._queue_size = 1
+
+    @property
+    def started(self) -> bool:
+        return self._size > 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def start(self, config: Config) -> None:
+        with self._condition:
+            if self.started:
+                return
+            self._size = config.worker_pool_size or config.workers
+            self._max_tasks = config.worker_max_tasks_per_process
+            self._timeout = config.worker_task_timeout
+            self._queue_size = config.ingestion_queue_size
+            self._idle = [_Worker(self._ctx, self._queue_size) for _ in range(self._size)]
+
+        logger.info(f"Started {self._size} worker processes")
+
+    def close(self) -> None:
+        with self._condition:
+            workers = self._idle
+            self._idle = []
+            self._size = 0
+            self._condition.notify_all()
+
+        # idle workers do not hold any state, so they can be terminated right away
+        for worker in workers:
+            worker.stop()
+
+        if workers:
+            logger.info("Stopped all worker processes")
+
+    def _acquire(self) -> _Worker:
+        with self._condition:
+            self._condition.wait_for(lambda: self._idle or not self.started)
+            if not self.started:
+                raise RuntimeError("The worker pool has been closed")
+            return self._idle.pop()
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        worker.tasks_done += 1
+        recycle = not healthy or worker.tasks_done >= self._max_tasks
+        if recycle:
+            # a worker which is still busy with an abandoned task can not be reused
+            worker.stop()
+
+        with self._condition:
+            if self.started:
+                self._idle.append(_Worker(self._ctx, self._queue_size) if recycle else worker)
+            elif not recycle:
+                worker.stop()
+            self._condition.notify()
+
+    def run(self, function: Callable[..., Iterator[Any]], *args: Any) -> Generator[Any, None, None]:
+        """Runs the generator `function(*args)` in a worker process and yields its items as soon as they are ready.
+
+        `function` and `args` need to be picklable. Exceptions raised by `function` are re-raised here.
+        The timeout applies to the whole task, but the time the caller spends with the yielded items is not counted,
+        since the worker pauses when its results are not consumed.
+        """
+        worker = self._acquire()
+        healthy = False
+        remaining = self._timeout
+        try:
+            worker.wait_ready()
+            worker.tasks.put((function, args))
+            while True:
+                started = time.monotonic()
+                kind, value = worker.get(remaining)
+                remaining -= time.monotonic() - started
+                if kind == "end":
+                    healthy = True
+                    return
+                if kind == "error":
+                    healthy = True
+                    raise value
+                yield value
+        finally:
+            self._release(worker, healthy)
+
+
+pool = WorkerPool()
@@ -1,4 +1,4 @@
-from typing import Any, List, Optional, Dict, Tuple
+from typing import Any, List, Literal, Optional, Dict, Tuple
 from pydantic import BaseModel, Field, ConfigDict
 from pydantic.alias_generators import to_camel
 
@@ -54,10 +54,56 @@ class FileResult(BaseModel):
     sources: list[SourceDto] = Field(description="Additional information about the sources.")
 
 
+class BatchSearchRequest(BaseModel):
+    queries: list[str] = Field(description="The queries from the internal tool", min_length=1)
+    take: int = Field(description="The number of results to return per query")
+    bucket: Optional[str] = Field(None, description="The ID of the bucket")
+    index_name: Optional[str] = Field(None, description="The name of the index", alias="indexName")
+    files: Optional[list[str]] = Field(
+        None, description="List of file IDs to restrict the queries. Can be ignored if not given"
+    )
+    ef_search: Optional[int] = Field(
+        None, description="Overrides ef_search of HNSW vector indexes", alias="efSearch", gt=0
+    )
+    probes: Optional[int] = Field(None, description="Overrides probes of IVFFlat vector indexes", gt=0)
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class BatchSearchResult(BaseModel):
+    results: list[FileResult] = Field(description="The results in the order of the queries")
+
+
 class FileProcessResult(BaseModel):
     chunks: list[ResultDocument] = Field(description="The chunks which constitute the processed file")
 
 
+class BatchFileStatus(BaseModel):
+    id: str = Field(description="The ID of the file")
+    success: bool = Field(description="Whether the file was added")
+    status_code: int = Field(description="The status code `POST /files` would have returned for the file")
+    detail: Optional[str] = Field(None, description="Why the file could not be added")
+    chunks: int = Field(0, description="The number of chunks which were added for the file")
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
+class BatchUploadResult(BaseModel):
+    files: list[BatchFileStatus] = Field(description="The status of every file, in the order of the upload")
+
+
+class JobDto(BaseModel):
+    id: str = Field(description="The ID of the job")
+    status: Literal["queued", "running", "completed", "failed"] = Field(description="The status of the job")
+    doc_id: str = Field(description="The ID of the file")
+    attempts: int = Field(description="The number of times the job has been started")
+    chunks_parsed: int = Field(description="The number of chunks parsed by the current attempt")
+    batches_embedded: int = Field(description="The number of batches embedded by the current attempt")
+    status_code: Optional[int] = Field(None, description="The status code `POST /files` would have returned")
+    error: Optional[str] = Field(None, description="Why the last attempt failed")
+    created_at: float = Field(description="The time the job was queued, in seconds since the epoch")
+    updated_at: float = Field(description="The time of the last change of the job, in seconds since the epoch")
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
 class UploadRequest(BaseModel):
     bucket: str = Field(description="The bucket where the file belongs too")
     index_name: str = Field(description="The index name")
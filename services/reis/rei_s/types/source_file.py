@@ -1,8 +1,10 @@
 from contextlib import contextmanager
+import hashlib
+import mmap
 import os
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from typing import Generator, Optional
+from typing import BinaryIO, Generator, Optional
 import uuid
 
 from pydantic import BaseModel, Field
@@ -30,11 +32,40 @@ class SourceFile(BaseModel):
     def exists(self) -> bool:
         return os.path.exists(self.path)
 
+    @property
+    def content_hash(self) -> str:
+        with self.mapped() as data:
+            return hashlib.sha256(data).hexdigest()
+
     @property
     def buffer(self) -> bytes:
+        """The content as a copy in memory, prefer `mapped`, `open` or `text` for large files."""
         with open(self.path, "rb") as f:
             return f.read()
 
+    def open(self) -> BinaryIO:
+        return open(self.path, "rb")
+
+    @contextmanager
+    def mapped(self) -> Generator[mmap.mmap | bytes, None, None]:
+        """Maps the file into memory, such that it can be read repeatedly without copies.
+
+        The operating system loads the pages when they are accessed and can drop them again under memory pressure.
+        The mapping is closed on leaving the context, so no views into it may be kept.
+        """
+        with open(self.path, "rb") as f:
+            # empty files can not be mapped
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+
+    def text(self, encoding: str = "utf-8") -> str:
+        # decodes directly from the mapping, without a copy of the content as bytes
+        with self.mapped() as data:
+            return str(data, encoding)
+
     @staticmethod
     def new_temporary_file(buffer: bytes | None = None, extension: str | None = None) -> "SourceFile":
         id_ = str(uuid.uuid4())
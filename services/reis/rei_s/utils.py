@@ -1,5 +1,6 @@
-from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import os
+import shutil
 import tempfile
 from typing import Any
 import uuid
@@ -8,8 +9,13 @@ from fastapi import FastAPI
 from fastapi.concurrency import asynccontextmanager
 
 from rei_s.logger import logger
-from rei_s.config import get_config
+from rei_s.config import Config, get_config
 from rei_s.prometheus_server import PrometheusHttpServer
+from rei_s.services.job_queue import JobWorkers, get_job_queue
+from rei_s.services.libreoffice_pool import get_libreoffice_pool
+from rei_s.services.scheduler import FairScheduler
+from rei_s.services.vectorstore_registry import registry as vector_store_registry
+from rei_s.services.worker_pool import pool as worker_pool
 
 
 def get_new_file_path(base_name: str | None = None, extension: str | None = None) -> str:
@@ -26,8 +32,8 @@ def get_new_file_path(base_name: str | None = None, extension: str | None = None
     return normalized_path
 
 
-async def startup_workers(app: FastAPI, workers: int) -> None:
-    app.state.executor = ThreadPoolExecutor(max_workers=workers)
+async def startup_workers(app: FastAPI, workers: int, interactive_weight: int) -> None:
+    app.state.executor = FairScheduler(workers, {"interactive": interactive_weight, "bulk": 1})
     logger.info(f"Started {workers} workers")
 
 
@@ -36,6 +42,68 @@ async def shutdown_workers(app: FastAPI) -> None:
     app.state.executor.shutdown()
 
 
+async def startup_worker_pool(app: FastAPI, config: Config) -> None:
+    # the worker processes start in the background, such that they are warm when the first large file arrives
+    worker_pool.start(config)
+
+
+async def shutdown_worker_pool(app: FastAPI) -> None:
+    worker_pool.close()
+
+
+async def startup_libreoffice(app: FastAPI, config: Config) -> None:
+    app.state.libreoffice_pool = None
+    # imported here, since the format providers depend on this module
+    from rei_s.services.formats import get_format_providers
+    from rei_s.services.formats.office_provider import OfficeProvider
+
+    if not any(isinstance(format_, OfficeProvider) for format_ in get_format_providers(config)):
+        return
+    if shutil.which("soffice") is None:
+        logger.warning("LibreOffice is not installed, office files can not be converted")
+        return
+
+    app.state.libreoffice_pool = get_libreoffice_pool(config.libreoffice_pool_size, config.libreoffice_timeout)
+    app.state.libreoffice_pool.start()
+
+
+async def shutdown_libreoffice(app: FastAPI) -> None:
+    if app.state.libreoffice_pool is not None:
+        app.state.libreoffice_pool.close()
+
+
+async def startup_job_workers(app: FastAPI, config: Config) -> None:
+    app.state.job_workers = None
+    queue = get_job_queue(config)
+    if queue is None or config.job_queue_workers == 0:
+        return
+
+    # imported here, since the store service depends on this module
+    from rei_s.services import store_service
+
+    app.state.job_workers = JobWorkers(
+        queue,
+        partial(store_service.run_job, config),
+        config.job_queue_workers,
+        retention_seconds=config.job_queue_retention_seconds,
+    )
+    app.state.job_workers.start()
+
+
+async def shutdown_job_workers(app: FastAPI) -> None:
+    if app.state.job_workers is not None:
+        app.state.job_workers.stop()
+
+
+async def startup_vector_stores(app: FastAPI) -> None:
+    vector_store_registry.start()
+
+
+async def shutdown_vector_stores(app: FastAPI) -> None:
+    # the executor is shut down at this point, so no request uses the clients anymore
+    vector_store_registry.close()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> Any:
     config = app.dependency_overrides.get(get_config, get_config)()
@@ -45,11 +113,19 @@ async def lifespan(app: FastAPI) -> Any:
         logger.info(f"Starting Prometheus server on port {config.metrics_port}")
         metrics_server.start()
 
-    await startup_workers(app, config.workers)
+    await startup_workers(app, config.workers, config.workers_interactive_weight)
+    await startup_worker_pool(app, config)
+    await startup_libreoffice(app, config)
+    await startup_vector_stores(app)
+    await startup_job_workers(app, config)
 
     yield
 
+    await shutdown_job_workers(app)
     await shutdown_workers(app)
+    await shutdown_worker_pool(app)
+    await shutdown_libreoffice(app)
+    await shutdown_vector_stores(app)
 
     if config.metrics_port:
         metrics_server.stop()
@@ -1,10 +1,13 @@
 from typing import Any, Generator
 from fastapi import FastAPI
 import pytest
-from concurrent.futures import ThreadPoolExecutor
 
 from rei_s import app_factory
 from rei_s.config import Config, get_config
+from rei_s.services.artifact_cache import artifact_cache
+from rei_s.services.scheduler import FairScheduler
+from rei_s.services.vectorstore_registry import registry
+from rei_s.services.worker_pool import pool as worker_pool
 
 
 def get_test_config(settings: dict[str, Any] | None = None) -> Config:
@@ -36,11 +39,34 @@ def app() -> Generator[FastAPI, None, None]:
     # this is good, because, we do not want to start the metrics endpoint for tests
     # but this means that we need to start the executor manually here.
     # For tests using the lifespan context, it will be overwritten.
-    app.state.executor = ThreadPoolExecutor(max_workers=1)
+    app.state.executor = FairScheduler(1)
 
     yield app
 
 
+# The registry caches embeddings and vector stores process wide.
+# We reset it after each test, such that mocks of one test do not leak into others.
+@pytest.fixture(autouse=True)
+def reset_vector_store_registry() -> Generator[None, None, None]:
+    yield
+    registry.close()
+
+
+# Intermediate artifacts like transcripts are cached process wide by the content of the file.
+# We clear them after each test, such that mocked results of one test do not leak into others.
+@pytest.fixture(autouse=True)
+def clear_artifact_cache() -> Generator[None, None, None]:
+    yield
+    artifact_cache.clear()
+
+
+# The worker pool is started lazily for large files, if a test does not use the lifespan context.
+@pytest.fixture(autouse=True)
+def close_worker_pool() -> Generator[None, None, None]:
+    yield
+    worker_pool.close()
+
+
 def pytest_addoption(parser: Any) -> None:
     parser.addoption("--stress", action="store_true", default=False, help="run stress tests")
 
@@ -7,6 +7,8 @@ from langchain_community.embeddings import FakeEmbeddings
 from pydantic import ValidationError
 import pytest
 from pytest_mock import MockerFixture
+from rei_s.services.filestore_adapter import DocumentChangedError
+from rei_s.services.filestore_provider import get_filestore
 from rei_s.services.filestores.s3 import S3FileStoreAdapter
 from mypy_boto3_s3.type_defs import ObjectIdentifierTypeDef
 
@@ -42,6 +44,8 @@ def get_config_override() -> Config:
 @pytest.fixture(scope="function", autouse=True)
 def clean_bucket(app: FastAPI) -> None:
     app.dependency_overrides[get_config] = get_config_override
+    # the shared adapter would neither recreate the bucket nor forget the deleted documents
+    get_filestore.cache_clear()
 
     try:
         s3 = S3FileStoreAdapter.create(get_config_override())
@@ -123,3 +127,31 @@ def test_get_document_pdf(file_uploader: FileUploaderFixture, client: TestClient
     pdf_content = PdfProvider().process_file(pdf_file, chunk_overlap=0)
     text = "".join(i.page_content for i in pdf_content)
     assert input_content[:20] in text
+
+
+def test_get_document_pdf_range(file_uploader: FileUploaderFixture, client: TestClient) -> None:
+    file_uploader(bucket=1, file_id=1, index_name=INDEX_NAME)
+
+    response = client.get("/documents/pdf", params={"doc_id": "1"}, headers={"range": "bytes=0-3"})
+    assert response.status_code == 206
+    assert response.content == b"%PDF"
+    etag = response.headers["etag"]
+
+    response = client.get("/documents/pdf", params={"doc_id": "1"}, headers={"if-none-match": etag})
+    assert response.status_code == 304
+
+
+def test_changed_documents_are_not_read() -> None:
+    s3 = S3FileStoreAdapter.create(get_config_override())
+    file = SourceFile.new_temporary_file(b"old content", "pdf")
+    file.id = "1"
+    s3.add_document(file)
+    reader = s3.open_document("1")
+
+    file = SourceFile.new_temporary_file(b"new content", "pdf")
+    file.id = "1"
+    s3.add_document(file)
+
+    # the error is raised before any byte is sent
+    with pytest.raises(DocumentChangedError):
+        reader.iter_chunks()
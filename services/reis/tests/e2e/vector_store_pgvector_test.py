@@ -1,9 +1,11 @@
+import asyncio
 from io import BytesIO
 from typing import Any, Protocol
 from faker import Faker
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from langchain_community.embeddings import FakeEmbeddings
+from langchain_core.documents import Document
 from pydantic import ValidationError
 import pytest
 from pytest_mock import MockerFixture
@@ -12,8 +14,9 @@ import sqlalchemy
 import sqlalchemy.exc
 
 from rei_s.config import Config, get_config
-from rei_s.services.vectorstore_adapter import VectorStoreFilter
-from rei_s.services.vectorstores.pgvector import PGVectorStoreAdapter
+from rei_s.services.vectorstore_adapter import SearchTuning, VectorStoreFilter
+from rei_s.services.vectorstores.pgvector import PGVectorStoreAdapter, metadata_indexes_exist
+from rei_s.services.vectorstores.pgvector_migration import migrate_metadata_columns, migrate_text_search
 from tests.conftest import get_test_config
 
 # Here we test the pgvector store.
@@ -229,6 +232,140 @@ def test_get_files_filtered_by_file_ids(file_uploader: FileUploaderFixture, clie
     assert len(content["files"]) == 0
 
 
+def test_hybrid_search_finds_exact_terms(mocker: MockerFixture, faker: Faker) -> None:
+    config = get_test_config(
+        dict(store_type="pgvector", store_pgvector_index_name=INDEX_NAME, store_pgvector_search_mode="hybrid")
+    )
+    vector_store = PGVectorStoreAdapter.create(config, FakeEmbeddings(size=1352))
+
+    documents = [
+        Document(id=str(i), page_content=faker.text(), metadata={"bucket": "1", "doc_id": str(i)}) for i in range(10)
+    ]
+    vector_store.add_documents(documents[:5])
+    # the trigger fills the column of new chunks, the migration the column of the existing chunks and the index
+    migrate_text_search(vector_store.engine, "simple", batch_size=3)
+    documents.append(Document(id="ticket", page_content="Printer broken, see TICKET-4711", metadata={"bucket": "1"}))
+    vector_store.add_documents(documents[5:])
+
+    # the fake embeddings are random, so only the keyword search can find the ticket
+    result = vector_store.similarity_search("TICKET-4711", 1, VectorStoreFilter(bucket="1"))
+    assert [doc.id for doc in result] == ["ticket"]
+
+    results = vector_store.similarity_search_batch(
+        ["TICKET-4711", "printer"], [[0.0] * 1352, [0.0] * 1352], 1, VectorStoreFilter(bucket="1")
+    )
+    assert [[doc.id for doc in docs] for docs in results] == [["ticket"], ["ticket"]]
+
+    assert vector_store.similarity_search("TICKET-4711", 1, VectorStoreFilter(bucket="2")) == []
+
+
+def test_hnsw_index(faker: Faker) -> None:
+    config = get_test_config(
+        dict(store_type="pgvector", store_pgvector_index_name=INDEX_NAME, store_pgvector_ann_index="hnsw")
+    )
+    vector_store = PGVectorStoreAdapter.create(config, FakeEmbeddings(size=1352), vector_dimension=1352)
+    vector_store.add_documents(
+        [Document(id=str(i), page_content=faker.text(), metadata={"bucket": "1"}) for i in range(10)]
+    )
+
+    vector_store.rebuild_index(recreate=True)
+
+    with vector_store.engine.connect() as connection:
+        indexes = connection.execute(
+            sqlalchemy.text("SELECT indexname FROM pg_indexes WHERE indexname LIKE 'ix_embedding_hnsw_%'")
+        ).all()
+    assert len(indexes) >= 1
+
+    result = vector_store.similarity_search("test", 3, VectorStoreFilter(bucket="1"), SearchTuning(ef_search=100))
+    assert len(result) == 3
+
+
+def test_metadata_columns(faker: Faker) -> None:
+    config = get_test_config(dict(store_type="pgvector", store_pgvector_index_name=INDEX_NAME))
+    vector_store = PGVectorStoreAdapter.create(config, FakeEmbeddings(size=1352))
+    vector_store.add_documents(
+        [
+            Document(id=f"chunk-{i}", page_content=faker.text(), metadata={"bucket": str(i % 2), "doc_id": str(i)})
+            for i in range(4)
+        ]
+    )
+
+    migrate_metadata_columns(vector_store.engine, batch_size=3)
+    with vector_store.engine.connect() as connection:
+        assert metadata_indexes_exist(connection, "langchain_pg_embedding")
+
+    config = get_test_config(
+        dict(store_type="pgvector", store_pgvector_index_name=INDEX_NAME, store_pgvector_metadata_columns=True)
+    )
+    vector_store = PGVectorStoreAdapter.create(config, FakeEmbeddings(size=1352))
+    # added after the migration, so the trigger fills the columns
+    vector_store.add_documents(
+        [Document(id="chunk-4", page_content=faker.text(), metadata={"bucket": "0", "doc_id": "4"})]
+    )
+
+    result = vector_store.similarity_search("test", 10, VectorStoreFilter(bucket="0"))
+    assert sorted(doc.metadata["doc_id"] for doc in result) == ["0", "2", "4"]
+    result = vector_store.similarity_search("test", 10, VectorStoreFilter(bucket="0", doc_ids=["2", "3"]))
+    assert [doc.metadata["doc_id"] for doc in result] == ["2"]
+
+    vector_store.delete("2")
+    result = vector_store.similarity_search("test", 10, VectorStoreFilter(bucket="0"))
+    assert sorted(doc.metadata["doc_id"] for doc in result) == ["0", "4"]
+
+
+def test_copy_embeddings(faker: Faker) -> None:
+    config = get_test_config(
+        dict(store_type="pgvector", store_pgvector_index_name=INDEX_NAME, store_pgvector_metadata_columns=True)
+    )
+    embeddings = FakeEmbeddings(size=1352)
+    vector_store = PGVectorStoreAdapter.create(config, embeddings)
+    documents = [
+        Document(id=f"chunk-{i}", page_content=faker.text(), metadata={"bucket": "1", "doc_id": str(i)})
+        for i in range(3)
+    ]
+    vector_store.add_documents(documents, embeddings.embed_documents([doc.page_content for doc in documents]))
+
+    # the rows are upserted, like the inserts of langchain
+    updated = Document(id="chunk-0", page_content="updated", metadata={"bucket": "2", "doc_id": "0"})
+    vector_store.add_documents([updated], embeddings.embed_documents(["updated"]))
+
+    result = vector_store.similarity_search("test", 10, VectorStoreFilter(bucket="1"))
+    assert sorted(doc.metadata["doc_id"] for doc in result) == ["1", "2"]
+    # the columns are filled by the trigger
+    result = vector_store.similarity_search("test", 10, VectorStoreFilter(bucket="2"))
+    assert [doc.page_content for doc in result] == ["updated"]
+
+    stored = vector_store.get_documents(["chunk-1"])
+    assert stored[0].page_content == documents[1].page_content
+
+
+def test_async_search(faker: Faker) -> None:
+    config = get_test_config(dict(store_type="pgvector", store_pgvector_index_name=INDEX_NAME))
+    vector_store = PGVectorStoreAdapter.create(config, FakeEmbeddings(size=1352))
+    vector_store.add_documents(
+        [
+            Document(id=f"chunk-{i}", page_content=faker.text(), metadata={"bucket": "1", "doc_id": str(i % 2)})
+            for i in range(4)
+        ]
+    )
+    embedding = vector_store.vector_store.embeddings.embed_query("test")
+
+    async def search_and_delete() -> None:
+        result = await vector_store.asimilarity_search_batch(["test"], [embedding], 10, VectorStoreFilter(bucket="1"))
+        assert result == vector_store.similarity_search_batch(["test"], [embedding], 10, VectorStoreFilter(bucket="1"))
+
+        docs = await vector_store.aget_documents(["chunk-0", "chunk-1"])
+        assert sorted(str(doc.id) for doc in docs) == ["chunk-0", "chunk-1"]
+
+        await vector_store.adelete("0")
+        result = await vector_store.asimilarity_search("test", 10, VectorStoreFilter(bucket="1"))
+        assert sorted(doc.metadata["doc_id"] for doc in result) == ["1", "1"]
+
+    # the connections of the async pool belong to the event loop which opened them
+    asyncio.run(search_and_delete())
+    vector_store.close()
+
+
 @pytest.mark.parametrize(
     "test_input,expected",
     [
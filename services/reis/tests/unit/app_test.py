@@ -201,6 +201,53 @@ def test_get_files_no_files(mocker: MockerFixture, client: TestClient) -> None:
     assert content["debug"] == ""
 
 
+def test_search_files_batch(mocker: MockerFixture, client: TestClient) -> None:
+    shared = Document(
+        id="1",
+        page_content="test string",
+        metadata={"source": "testfile.pdf", "format": "pdf", "mime_type": "application/pdf", "bucket": "1"},
+    )
+    other = Document(
+        id="2",
+        page_content="test string 2",
+        metadata={"source": "testfile2.pdf", "format": "pdf", "mime_type": "application/pdf", "bucket": "1"},
+    )
+    mocked_store = DevNullVectorStoreAdapter()
+    search = mocker.patch.object(
+        mocked_store, "similarity_search_batch", autospec=True, return_value=[[shared, other], [shared]]
+    )
+    mocker.patch("rei_s.services.store_service.get_vector_store", return_value=mocked_store)
+
+    response = client.post(
+        "/files/search/batch", json={"queries": ["test", "another test"], "take": 3, "bucket": "1", "indexName": ""}
+    )
+    assert response.status_code == 200
+    assert search.call_count == 1
+
+    results = response.json()["results"]
+    assert len(results) == 2
+    assert [doc["content"] for doc in results[0]["files"]] == ["test string", "test string 2"]
+    assert [doc["content"] for doc in results[1]["files"]] == ["test string"]
+    assert "bucket" not in results[1]["files"][0]["metadata"]
+    assert results[1]["debug"] == "## Sources\n\n* testfile.pdf"
+
+
+def test_search_files_batch_bad_request(client: TestClient) -> None:
+    response = client.post("/files/search/batch", json={"queries": [], "take": 3})
+    assert response.status_code == 422
+    response = client.post("/files/search/batch", json={"queries": ["test"], "take": 3, "indexName": "i"})
+    assert response.status_code == 422
+
+
+def test_rebuild_indexes(mocker: MockerFixture, client: TestClient) -> None:
+    rebuild_index = mocker.patch("rei_s.services.store_service.rebuild_index")
+
+    response = client.post("/admin/indexes/rebuild", params={"indexName": "my-index", "recreate": "true"})
+
+    assert response.status_code == 202
+    assert rebuild_index.call_args.args[1:] == ("my-index", True)
+
+
 def test_add_files_fail(client: TestClient) -> None:
     response = client.post("/files")
     # missing required args
@@ -259,6 +306,45 @@ def test_add_files_with_filestore(mocker: MockerFixture, client: TestClient) ->
     assert args[0].file_name == "test.yaml"
 
 
+def test_add_files_batch(mocker: MockerFixture, client: TestClient) -> None:
+    mocker.patch("rei_s.services.embeddings_provider.get_embeddings", return_value=FakeEmbeddings(size=1352))
+    vector_store_mock = mocker.Mock(spec=DevNullVectorStoreAdapter)
+    mocker.patch("rei_s.services.store_service.get_vector_store", return_value=vector_store_mock)
+    mocker.patch("rei_s.services.store_service.get_file_store", return_value=None)
+
+    with open("tests/data/birthdays.pdf", "rb") as f:
+        content = f.read()
+    response = client.post(
+        "/files/batch",
+        files=[
+            ("files", ("a.pdf", content, "application/pdf")),
+            ("files", ("b.pdf", content, "application/pdf")),
+            ("files", ("c.xyz", content, "application/xyz")),
+        ],
+        data={"ids": ["1", "2", "3"], "bucket": "15"},
+    )
+    assert response.status_code == 200
+
+    statuses = response.json()["files"]
+    assert [status["id"] for status in statuses] == ["1", "2", "3"]
+    assert [status["success"] for status in statuses] == [True, True, False]
+    assert statuses[0]["chunks"] > 0
+    assert statuses[2]["statusCode"] == 415
+
+    # the chunks of the small files are embedded and written together
+    vector_store_mock.add_documents.assert_called_once()
+    args, _kwargs = vector_store_mock.add_documents.call_args
+    assert {chunk.metadata["doc_id"] for chunk in args[0]} == {"1", "2"}
+    vector_store_mock.delete.assert_called_once_with("3")
+
+
+def test_add_files_batch_bad_request(client: TestClient) -> None:
+    response = client.post(
+        "/files/batch", files=[("files", ("a.txt", b"a", "text/plain"))], data={"ids": ["1", "2"], "bucket": "15"}
+    )
+    assert response.status_code == 422
+
+
 def test_process_files(mocker: MockerFixture, client: TestClient) -> None:
     # mock embeddings to assure that they are not generated
     mocker.patch(
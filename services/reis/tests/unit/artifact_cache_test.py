@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event
+
+import pytest
+from pytest_mock import MockerFixture
+
+from rei_s.services.artifact_cache import ArtifactCache
+from rei_s.types.source_file import SourceFile
+
+
+def test_artifacts_are_computed_once_per_content(mocker: MockerFixture, tmp_path: Path) -> None:
+    (tmp_path / "a.mp3").write_bytes(b"recording")
+    (tmp_path / "copy.mp3").write_bytes(b"recording")
+    (tmp_path / "b.mp3").write_bytes(b"other recording")
+    a, copy, b = (
+        SourceFile(path=tmp_path / name, mime_type="", file_name=name) for name in ["a.mp3", "copy.mp3", "b.mp3"]
+    )
+    compute = mocker.Mock(side_effect=lambda: ["transcript"])
+    cache = ArtifactCache()
+
+    assert cache.get_or_compute("transcript", a, compute) == ["transcript"]
+    assert cache.get_or_compute("transcript", copy, compute) == ["transcript"]
+    assert compute.call_count == 1
+
+    cache.get_or_compute("transcript", b, compute)
+    cache.get_or_compute("summary", a, compute)
+    assert compute.call_count == 3
+
+
+def test_concurrent_requests_wait_for_the_first_computation(tmp_path: Path) -> None:
+    (tmp_path / "a.mp3").write_bytes(b"recording")
+    file = SourceFile(path=tmp_path / "a.mp3", mime_type="", file_name="a.mp3")
+    cache = ArtifactCache()
+    started = Event()
+    release = Event()
+    calls: list[int] = []
+
+    def compute() -> list[str]:
+        calls.append(1)
+        started.set()
+        release.wait()
+        return ["transcript"]
+
+    with ThreadPoolExecutor(3) as executor:
+        first = executor.submit(cache.get_or_compute, "transcript", file, compute)
+        started.wait()
+        others = [executor.submit(cache.get_or_compute, "transcript", file, compute) for _ in range(2)]
+        release.set()
+        assert [f.result() for f in [first, *others]] == [["transcript"]] * 3
+
+    assert len(calls) == 1
+    assert cache._key_locks == {}
+
+
+def test_failed_computations_release_the_key(tmp_path: Path) -> None:
+    (tmp_path / "a.mp3").write_bytes(b"recording")
+    file = SourceFile(path=tmp_path / "a.mp3", mime_type="", file_name="a.mp3")
+    cache = ArtifactCache()
+
+    def fail() -> list[str]:
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("transcript", file, fail)
+
+    assert cache._key_locks == {}
+    assert cache.get_or_compute("transcript", file, lambda: ["transcript"]) == ["transcript"]
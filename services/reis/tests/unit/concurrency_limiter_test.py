@@ -0,0 +1,56 @@
+from threading import Thread
+import time
+
+from rei_s.services.concurrency_limiter import AdaptiveConcurrencyLimiter
+
+
+def test_limiter_halves_once_per_burst_and_recovers() -> None:
+    changes: list[int] = []
+    limiter = AdaptiveConcurrencyLimiter(8, on_change=changes.append)
+
+    with limiter.slot() as first, limiter.slot() as second:
+        limiter.on_rate_limit(first)
+        # the second call was started before the decrease, so it belongs to the same burst
+        limiter.on_rate_limit(second)
+    assert limiter.limit == 4
+
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.limit == 5
+
+    with limiter.slot() as token:
+        limiter.on_rate_limit(token)
+    assert limiter.limit == 2
+    assert changes == [8, 4, 5, 2]
+
+
+def test_limiter_never_drops_below_min_limit() -> None:
+    limiter = AdaptiveConcurrencyLimiter(2)
+
+    for _ in range(3):
+        with limiter.slot() as token:
+            limiter.on_rate_limit(token)
+
+    assert limiter.limit == 1
+
+
+def test_limiter_bounds_concurrent_calls() -> None:
+    limiter = AdaptiveConcurrencyLimiter(2)
+    running = 0
+    max_running = 0
+
+    def call() -> None:
+        nonlocal running, max_running
+        with limiter.slot():
+            running += 1
+            max_running = max(max_running, running)
+            time.sleep(0.01)
+            running -= 1
+
+    threads = [Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max_running == 2
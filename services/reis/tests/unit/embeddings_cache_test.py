@@ -0,0 +1,171 @@
+import asyncio
+from pathlib import Path
+import threading
+
+from langchain_community.embeddings import FakeEmbeddings
+from pytest_mock import MockerFixture
+
+from rei_s.services.embeddings_cache import (
+    CachedQueryEmbeddings,
+    ChunkEmbeddingsCache,
+    InMemoryQueryEmbeddingsCacheBackend,
+    QueryEmbeddingsCacheBackend,
+    aembed_queries,
+    embed_queries,
+    normalize_query,
+    with_query_cache,
+)
+from rei_s.services.ttl_cache import TtlLruCache
+from tests.conftest import get_test_config
+
+
+def test_normalize_query() -> None:
+    assert normalize_query("  what is\tthe   answer?\n") == "what is the answer?"
+
+
+def test_query_embeddings_are_cached(mocker: MockerFixture) -> None:
+    embeddings = FakeEmbeddings(size=8)
+    spy = mocker.spy(FakeEmbeddings, "embed_query")
+    cached = CachedQueryEmbeddings(embeddings, InMemoryQueryEmbeddingsCacheBackend(10, 60), "test")
+
+    first = cached.embed_query("what is the answer?")
+    second = cached.embed_query(" what is  the answer? ")
+
+    assert first == second
+    assert spy.call_count == 1
+
+
+def test_missing_query_embeddings_are_embedded_as_queries(mocker: MockerFixture) -> None:
+    embeddings = FakeEmbeddings(size=8)
+    spy = mocker.spy(FakeEmbeddings, "embed_query")
+    documents = mocker.spy(FakeEmbeddings, "embed_documents")
+    cached = CachedQueryEmbeddings(embeddings, InMemoryQueryEmbeddingsCacheBackend(10, 60), "test")
+    known = cached.embed_query("known")
+
+    vectors = embed_queries(cached, ["first", "known", "second", " first "])
+
+    # some models embed queries and documents differently, so the batch must not use `embed_documents`
+    assert documents.call_count == 0
+    assert sorted(call.args[1] for call in spy.call_args_list[1:]) == ["first", "second"]
+    assert vectors[1] == known
+    assert vectors[0] == vectors[3]
+    assert cached.embed_query("first") == vectors[0]
+
+
+def test_query_embeddings_are_cached_for_async_requests(mocker: MockerFixture) -> None:
+    embeddings = FakeEmbeddings(size=8)
+    spy = mocker.spy(FakeEmbeddings, "aembed_query")
+    documents = mocker.spy(FakeEmbeddings, "aembed_documents")
+    cached = CachedQueryEmbeddings(embeddings, InMemoryQueryEmbeddingsCacheBackend(10, 60), "test")
+    known = cached.embed_query("known")
+
+    vectors = asyncio.run(aembed_queries(cached, ["first", "known", "second"]))
+
+    assert documents.call_count == 0
+    assert sorted(call.args[1] for call in spy.call_args_list) == ["first", "second"]
+    assert vectors[1] == known
+    assert asyncio.run(cached.aembed_query("first")) == vectors[0]
+    assert cached.embed_query("second") == vectors[2]
+
+
+class ThreadRecordingBackend(InMemoryQueryEmbeddingsCacheBackend):
+    # like the redis backend, it only implements the blocking methods
+    aget = QueryEmbeddingsCacheBackend.aget
+    aset = QueryEmbeddingsCacheBackend.aset
+
+    def __init__(self) -> None:
+        super().__init__(10, 60)
+        self.threads: set[int] = set()
+
+    def get(self, key: str) -> list[float] | None:
+        self.threads.add(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key: str, vector: list[float]) -> None:
+        self.threads.add(threading.get_ident())
+        super().set(key, vector)
+
+
+def test_blocking_cache_backends_do_not_block_the_event_loop() -> None:
+    backend = ThreadRecordingBackend()
+    cached = CachedQueryEmbeddings(FakeEmbeddings(size=8), backend, "test")
+
+    async def search() -> int:
+        await cached.aembed_query("query")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(search())
+
+    assert backend.threads
+    assert loop_thread not in backend.threads
+
+
+def test_query_embeddings_are_keyed_by_model() -> None:
+    backend = InMemoryQueryEmbeddingsCacheBackend(10, 60)
+    a = CachedQueryEmbeddings(FakeEmbeddings(size=8), backend, "model-a")
+    b = CachedQueryEmbeddings(FakeEmbeddings(size=8), backend, "model-b")
+
+    assert a.embed_query("query") != b.embed_query("query")
+
+
+def test_query_embeddings_cache_backend_errors_are_ignored(mocker: MockerFixture) -> None:
+    backend = InMemoryQueryEmbeddingsCacheBackend(10, 60)
+    mocker.patch.object(backend, "get", side_effect=ConnectionError())
+    mocker.patch.object(backend, "set", side_effect=ConnectionError())
+    cached = CachedQueryEmbeddings(FakeEmbeddings(size=8), backend, "test")
+
+    assert len(cached.embed_query("query")) == 8
+
+
+def test_query_embeddings_cache_can_be_disabled() -> None:
+    embeddings = FakeEmbeddings(size=8)
+
+    assert with_query_cache(get_test_config(dict(query_embeddings_cache_size=0)), embeddings) is embeddings
+    assert isinstance(with_query_cache(get_test_config(), embeddings), CachedQueryEmbeddings)
+
+
+def test_ttl_lru_cache_evicts_least_recently_used(mocker: MockerFixture) -> None:
+    on_evict = mocker.Mock()
+    cache: TtlLruCache[str, int] = TtlLruCache(2, 60, on_evict=on_evict)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    on_evict.assert_called_once()
+
+
+def test_ttl_lru_cache_expires_entries(mocker: MockerFixture) -> None:
+    monotonic = mocker.patch("rei_s.services.ttl_cache.time.monotonic", return_value=100.0)
+    cache: TtlLruCache[str, int] = TtlLruCache(2, 10)
+
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    monotonic.return_value = 111.0
+    assert cache.get("a") is None
+
+
+def test_chunk_embeddings_are_cached(mocker: MockerFixture, tmp_path: Path) -> None:
+    embeddings = FakeEmbeddings(size=8)
+    spy = mocker.spy(FakeEmbeddings, "embed_documents")
+    cache = ChunkEmbeddingsCache(str(tmp_path / "cache.sqlite"))
+
+    first = cache.embed_documents(embeddings, "test", ["a", "b", "a"])
+    assert first[0] == first[2]
+    spy.assert_called_once_with(embeddings, ["a", "b"])
+
+    # a new instance reads the persisted vectors
+    cache = ChunkEmbeddingsCache(str(tmp_path / "cache.sqlite"))
+    second = cache.embed_documents(embeddings, "test", ["b", "c", "a"])
+    assert second[0] == first[1]
+    assert second[2] == first[0]
+    spy.assert_called_with(embeddings, ["c"])
+
+    # vectors of other models are not used
+    cache.embed_documents(embeddings, "other", ["a"])
+    spy.assert_called_with(embeddings, ["a"])
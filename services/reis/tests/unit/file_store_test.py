@@ -0,0 +1,272 @@
+from pathlib import Path
+from threading import Event
+import time
+from typing import Iterator
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from pytest_mock import MockerFixture
+
+from rei_s.config import Config, get_config
+from rei_s.services.filestore_adapter import DocumentChangedError, DocumentReader
+from rei_s.services.filestores.cached import CachedFileStoreAdapter
+from rei_s.services.filestores.disk_cache import DiskCachedFileStoreAdapter
+from rei_s.services.filestores.filesystem import FSFileStoreAdapter
+from rei_s.types.source_file import SourceFile
+from tests.conftest import get_default_test_config, get_test_config
+
+
+def get_file_store(path: Path) -> FSFileStoreAdapter:
+    return FSFileStoreAdapter.create(get_filesystem_config(path))
+
+
+def get_filesystem_config(path: Path) -> Config:
+    return get_test_config(dict(file_store_type="filesystem", file_store_filesystem_basepath=str(path)))
+
+
+def document(doc_id: str) -> SourceFile:
+    file = SourceFile.new_temporary_file(b"content", "pdf")
+    file.id = doc_id
+    return file
+
+
+def wait_for_downloads(file_store: DiskCachedFileStoreAdapter) -> None:
+    while file_store._downloads:
+        time.sleep(0.01)
+
+
+def test_exists_many(tmp_path: Path) -> None:
+    file_store = get_file_store(tmp_path)
+    file_store.add_document(document("1"))
+    file_store.add_document(document("2"))
+
+    assert file_store.exists_many(["1", "2", "3", "1"]) == {"1": True, "2": True, "3": False}
+    assert file_store.exists_many([]) == {}
+
+
+def test_existence_is_cached(tmp_path: Path) -> None:
+    file_store = CachedFileStoreAdapter(get_file_store(tmp_path), ttl=60)
+    assert file_store.exists_many(["1", "2"]) == {"1": False, "2": False}
+
+    # missing documents are not remembered, such that previews added by another process are seen immediately
+    get_file_store(tmp_path).add_document(document("2"))
+    assert file_store.exists("2") is True
+
+    # documents deleted by another process are only seen after the entries expired
+    get_file_store(tmp_path).delete("2")
+    assert file_store.exists("2") is True
+
+    file_store.add_document(document("1"))
+    assert file_store.exists_many(["1", "2"]) == {"1": True, "2": True}
+
+    file_store.delete("1")
+    assert file_store.exists("1") is False
+
+
+def test_open_document(tmp_path: Path) -> None:
+    file_store = get_file_store(tmp_path)
+    file_store.add_document(document("1"))
+
+    reader = file_store.open_document("1")
+    assert reader.size == 7
+    assert reader.content_hash == document("1").content_hash
+    assert b"".join(reader.iter_chunks(chunk_size=2)) == b"content"
+    assert b"".join(reader.iter_chunks(2, 5, chunk_size=2)) == b"nte"
+
+    # the hashes do not share the directory of the documents
+    assert file_store.hashes_path.parent == tmp_path.parent
+    file_store.add_document(document(".sha256"))
+    assert file_store.open_document(".sha256").content_hash == reader.content_hash
+    assert sorted(path.name for path in tmp_path.iterdir()) == [".sha256", "1"]
+
+    # the hash of documents, which were added before the hashes were stored, is computed once
+    (file_store.hashes_path / "1").unlink()
+    assert file_store.open_document("1").content_hash == reader.content_hash
+    assert (file_store.hashes_path / "1").exists()
+
+    with pytest.raises(FileNotFoundError):
+        file_store.open_document("2")
+
+
+def test_get_document_pdf_from_filesystem(app: FastAPI, tmp_path: Path) -> None:
+    config = get_filesystem_config(tmp_path)
+    app.dependency_overrides[get_config] = lambda: config
+    get_file_store(tmp_path).add_document(document("1"))
+    client = TestClient(app)
+
+    response = client.get("/documents/pdf", params={"doc_id": "1"})
+    assert response.status_code == 200
+    assert response.content == b"content"
+    etag = response.headers["etag"]
+    assert etag == f'"{document("1").content_hash}"'
+
+    response = client.get("/documents/pdf", params={"doc_id": "1"}, headers={"range": "bytes=0-2"})
+    assert response.status_code == 206
+    assert response.content == b"con"
+
+    response = client.get("/documents/pdf", params={"doc_id": "1"}, headers={"if-none-match": etag})
+    assert response.status_code == 304
+
+    assert client.get("/documents/pdf", params={"doc_id": "2"}).status_code == 404
+
+
+class BytesReader(DocumentReader):
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+        self.size = len(content)
+        self.content_hash = "hash"
+
+    def iter_chunks(self, start: int = 0, end: int | None = None, chunk_size: int = 2**20) -> Iterator[bytes]:
+        content = self.content[start:end]
+        for i in range(0, len(content), 2):
+            yield content[i : i + 2]
+
+
+@pytest.mark.parametrize(
+    "headers,status_code,content",
+    [
+        ({}, 200, b"content"),
+        ({"range": "bytes=2-4"}, 206, b"nte"),
+        ({"range": "bytes=4-"}, 206, b"ent"),
+        ({"range": "bytes=-3"}, 206, b"ent"),
+        ({"range": "bytes=5-100"}, 206, b"nt"),
+        ({"range": "bytes=7-"}, 416, None),
+        ({"range": "bytes=0-1,3-4"}, 200, b"content"),
+        ({"range": "lines=0-1"}, 200, b"content"),
+        ({"range": "bytes=2-4", "if-range": '"hash"'}, 206, b"nte"),
+        ({"range": "bytes=2-4", "if-range": '"other"'}, 200, b"content"),
+        ({"if-none-match": '"other", "hash"'}, 304, b""),
+        ({"if-none-match": '"other"'}, 200, b"content"),
+    ],
+)
+def test_get_document_pdf_is_streamed(
+    mocker: MockerFixture, app: FastAPI, headers: dict[str, str], status_code: int, content: bytes | None
+) -> None:
+    app.dependency_overrides[get_config] = get_default_test_config
+    mocker.patch("rei_s.services.store_service.get_document_pdf", return_value=BytesReader(b"content"))
+
+    response = TestClient(app).get("/documents/pdf", params={"doc_id": "1"}, headers=headers)
+
+    assert response.status_code == status_code
+    if content is not None:
+        assert response.content == content
+        assert response.headers["etag"] == '"hash"'
+    if status_code == 206:
+        assert response.headers["content-length"] == str(len(content or b""))
+    if status_code == 416:
+        assert response.headers["content-range"] == "bytes */7"
+
+
+class ChangedReader(BytesReader):
+    def iter_chunks(self, start: int = 0, end: int | None = None, chunk_size: int = 2**20) -> Iterator[bytes]:
+        raise DocumentChangedError()
+
+
+def test_get_document_pdf_reopens_changed_documents(mocker: MockerFixture, app: FastAPI) -> None:
+    app.dependency_overrides[get_config] = get_default_test_config
+    changed = ChangedReader(b"old")
+    changed.content_hash = "old"
+    mocker.patch("rei_s.services.store_service.get_document_pdf", side_effect=[changed, BytesReader(b"new")])
+
+    response = TestClient(app).get("/documents/pdf", params={"doc_id": "1"}, headers={"range": "bytes=1-"})
+
+    # the status and the headers describe the document which is sent
+    assert response.status_code == 206
+    assert response.content == b"ew"
+    assert response.headers["etag"] == '"hash"'
+
+
+def test_documents_are_cached_on_disk(tmp_path: Path) -> None:
+    remote = get_file_store(tmp_path / "remote")
+    remote.add_document(document("1"))
+    file_store = DiskCachedFileStoreAdapter(remote, str(tmp_path / "cache"), max_bytes=10, max_age=60)
+
+    # the first read uses the remote store, while the document is copied
+    reader = file_store.open_document("1")
+    assert reader.path == tmp_path / "remote" / "1"
+    wait_for_downloads(file_store)
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    # later reads do not use the remote store
+    (tmp_path / "remote" / "1").unlink()
+    reader = file_store.open_document("1")
+    assert reader.path is None
+    assert reader.content_hash == document("1").content_hash
+    assert b"".join(reader.iter_chunks(2, 5)) == b"nte"
+    reader.close()
+    assert file_store.exists("1")
+
+    # the copies survive a restart
+    file_store = DiskCachedFileStoreAdapter(remote, str(tmp_path / "cache"), max_bytes=10, max_age=60)
+    assert file_store.exists_many(["1", "2"]) == {"1": True, "2": False}
+
+    with pytest.raises(FileNotFoundError):
+        file_store.delete("1")
+    assert not file_store.exists("1")
+    assert list((tmp_path / "cache").iterdir()) == []
+
+
+def test_disk_cache_is_bounded(tmp_path: Path) -> None:
+    remote = get_file_store(tmp_path / "remote")
+    file_store = DiskCachedFileStoreAdapter(remote, str(tmp_path / "cache"), max_bytes=10, max_age=60)
+
+    # uploads are written through
+    file_store.add_document(document("1"))
+    assert file_store.size == 7
+    file_store.add_document(document("2"))
+    assert file_store.size == 7
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    # the least recently used copy was deleted, it is downloaded again
+    assert file_store.open_document("1").path is not None
+    wait_for_downloads(file_store)
+    assert file_store.size == 7
+
+    # an evicted copy can still be read, when it was opened before
+    reader = file_store.open_document("1")
+    file_store.open_document("2")
+    wait_for_downloads(file_store)
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+    assert b"".join(reader.iter_chunks()) == b"content"
+    reader.close()
+
+    file_store.max_age = 0
+    remote.delete("1")
+    with pytest.raises(FileNotFoundError):
+        file_store.open_document("1")
+
+
+class BlockingReader(BytesReader):
+    def __init__(self, content: bytes) -> None:
+        super().__init__(content)
+        self.released = Event()
+
+    def iter_chunks(self, start: int = 0, end: int | None = None, chunk_size: int = 2**20) -> Iterator[bytes]:
+        self.released.wait(5)
+        return super().iter_chunks(start, end, chunk_size)
+
+
+@pytest.mark.parametrize("change", ["delete", "add"])
+def test_downloads_do_not_overwrite_later_changes(mocker: MockerFixture, tmp_path: Path, change: str) -> None:
+    remote = get_file_store(tmp_path / "remote")
+    remote.add_document(document("1"))
+    file_store = DiskCachedFileStoreAdapter(remote, str(tmp_path / "cache"), max_bytes=10, max_age=60)
+    reader = BlockingReader(b"old")
+    mocker.patch.object(remote, "open_document", return_value=reader)
+
+    # the document is changed while the old version is downloaded
+    file_store.open_document("1")
+    if change == "delete":
+        file_store.delete("1")
+    else:
+        file_store.add_document(document("1"))
+    reader.released.set()
+    wait_for_downloads(file_store)
+
+    cached = list((tmp_path / "cache").iterdir())
+    if change == "delete":
+        assert cached == []
+        assert not file_store.exists("1")
+    else:
+        assert [path.read_bytes() for path in cached] == [b"content"]
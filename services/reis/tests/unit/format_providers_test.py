@@ -1,4 +1,12 @@
+import glob
 from itertools import combinations
+import time
+
+from langchain_core.documents import Document
+from langchain_core.documents.base import Blob
+import ffmpeg
+import pytest
+from pytest_mock import MockerFixture
 
 from rei_s.config import Config
 from rei_s.services.formats import get_format_providers
@@ -13,6 +21,8 @@ from rei_s.services.formats.ms_word_provider import MsWordProvider
 from rei_s.services.formats.outlook_provider import OutlookProvider
 from rei_s.services.formats.pdf_provider import PdfProvider
 from rei_s.services.formats.plain_provider import PlainProvider
+from rei_s.services.formats.utils import ProcessingError
+from rei_s.services.formats.voice_transcription_provider import MediaMetadata, VoiceTranscriptionProvider
 from rei_s.services.formats.xml_provider import XmlProvider
 from rei_s.services.formats.yaml_provider import YamlProvider
 from rei_s.types.source_file import SourceFile, temp_file
@@ -193,12 +203,30 @@ Page 2"""
     assert docs[0].metadata["page"] == 1
     assert docs[1].page_content == expected_p2
     assert docs[1].metadata["page"] == 2
+    # the parser reads the file itself, but the path must not show up as the source
+    assert docs[0].metadata["source"] == "stream"
 
     converted_pdf_file = pdf.convert_file_to_pdf(source_file)
     assert_pdf_contains_text(converted_pdf_file, expected_p1)
     assert converted_pdf_file.id == source_file.id
 
 
+def test_pdf_provider_page_ranges() -> None:
+    source_file = SourceFile(path="tests/data/birthdays.pdf", mime_type="application/pdf", file_name="text.pdf")
+    pdf = PdfProvider()
+
+    ranges = pdf.page_ranges(source_file, 1)
+    assert ranges is not None
+    assert ranges == [range(0, 1), range(1, 2)]
+    assert pdf.page_ranges(source_file, 100) == [range(0, 2)]
+
+    # the chunks of the ranges are the same as the chunks of the whole file
+    docs = [doc for pages in ranges for doc in pdf.iter_page_chunks(source_file, pages)]
+    assert docs == pdf.process_file(source_file)
+    assert [doc.metadata["page"] for doc in docs] == [1, 2]
+    assert [doc.metadata["total_pages"] for doc in docs] == [2, 2]
+
+
 def test_code_provider() -> None:
     content = b'print("Hello World!)'
     expected = content.decode()
@@ -340,6 +368,65 @@ def get_config_all_formats_enabled() -> Config:
     )
 
 
+def test_office_provider_reuses_preview_pdf() -> None:
+    # the preview is converted before chunking, so the chunking must not start libreoffice again
+    preview = SourceFile(path="tests/data/birthdays.pdf", mime_type="application/pdf", file_name="text.pdf")
+    source_file = SourceFile(
+        path="tests/data/birthdays.docx",
+        mime_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        file_name="text.docx",
+        preview_pdf_cache=preview,
+    )
+
+    docs = list(MsWordProvider().iter_chunks(source_file))
+
+    assert any("Darkwing Duck" in doc.page_content for doc in docs)
+    # the preview is still needed for the file store
+    assert preview.exists
+
+
+def test_voice_transcription_provider_keeps_segment_order(mocker: MockerFixture) -> None:
+    provider = VoiceTranscriptionProvider(config=get_config_all_formats_enabled())
+    segments = [SourceFile.new_temporary_file(str(i).encode(), "mp3") for i in range(4)]
+    mocker.patch.object(
+        provider, "split_into_compatible_format", return_value=(segments, [0, 300, 600, 900, 1000], "mp3")
+    )
+
+    def parse(blob: Blob) -> list[Document]:
+        n = int(blob.as_string())
+        # the later segments finish first
+        time.sleep(0.05 * (4 - n))
+        return [Document(page_content=f"segment {n}")]
+
+    mocker.patch.object(provider, "parser").parse.side_effect = parse
+
+    docs = provider.parse_file(SourceFile(path="", mime_type="audio/mp3", file_name="x.mp3"))
+
+    assert [doc.page_content for doc in docs] == ["segment 0", "segment 1", "segment 2", "segment 3"]
+    assert [doc.metadata["segment_begin_seconds"] for doc in docs] == [0, 300, 600, 900]
+    assert docs[-1].metadata["segment_end_seconds"] == 1000
+    assert not any(segment.exists for segment in segments)
+
+
+def test_voice_transcription_provider_removes_segments_of_failed_split(mocker: MockerFixture) -> None:
+    provider = VoiceTranscriptionProvider(config=get_config_all_formats_enabled())
+    mocker.patch.object(provider, "probe_audio_codec", return_value=MediaMetadata(audio_codec="mp3", duration=1000))
+    output = mocker.patch("ffmpeg.input").return_value.output
+
+    def fail(**_kwargs: object) -> None:
+        # ffmpeg wrote the first segment before it failed
+        with open(output.call_args.args[0] % 0, "wb") as f:
+            f.write(b"segment")
+        raise ffmpeg.Error("ffmpeg", b"", b"broken file")
+
+    output.return_value.run.side_effect = fail
+
+    with pytest.raises(ProcessingError):
+        provider.split_into_compatible_format("x.mp3")
+
+    assert not glob.glob(output.call_args.args[0].replace("%05d", "*"))
+
+
 def test_format_providers_unique() -> None:
     # ensure that there are no two providers which handle the same file
     config = get_config_all_formats_enabled()
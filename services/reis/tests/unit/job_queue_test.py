@@ -0,0 +1,190 @@
+from pathlib import Path
+import sqlite3
+import time
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from langchain_community.embeddings import FakeEmbeddings
+from pytest_mock import MockerFixture
+
+from rei_s.config import get_config
+from rei_s.services import store_service
+from rei_s.services.job_queue import Job, JobQueue, JobWorkers, get_job_queue
+from rei_s.services.vectorstores.devnull_store import DevNullVectorStoreAdapter
+from rei_s.types.source_file import SourceFile
+from tests.conftest import get_default_test_config, get_test_config
+
+
+def enqueue(queue: JobQueue, doc_id: str = "1") -> Job:
+    file = SourceFile.new_temporary_file(b"content", extension="txt")
+    file.id = doc_id
+    return queue.enqueue(file, "bucket")
+
+
+def get(queue: JobQueue, job_id: str) -> Job:
+    job = queue.get(job_id)
+    assert job is not None
+    return job
+
+
+def test_jobs_are_claimed_once(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path))
+    job = enqueue(queue)
+
+    claimed = queue.claim()
+    assert claimed is not None
+    assert claimed.id == job.id
+    assert claimed.status == "running"
+    assert claimed.attempts == 1
+    assert queue.claim() is None
+
+    queue.report_progress(claimed, 10, 2)
+    queue.complete(claimed)
+
+    finished = get(queue, job.id)
+    assert finished.status == "completed"
+    assert finished.chunks_parsed == 10
+    assert finished.batches_embedded == 2
+    assert not Path(job.path).exists()
+
+
+def test_jobs_survive_a_restart(tmp_path: Path) -> None:
+    job = enqueue(JobQueue(str(tmp_path)))
+
+    claimed = JobQueue(str(tmp_path)).claim()
+
+    assert claimed is not None
+    assert claimed.id == job.id
+
+
+def test_jobs_of_dead_workers_are_retried(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path), lease_seconds=1, max_attempts=2)
+    job = enqueue(queue)
+
+    assert queue.claim() is not None
+    time.sleep(1.1)
+    retried = queue.claim()
+    assert retried is not None
+    assert retried.id == job.id
+    assert retried.attempts == 2
+
+    time.sleep(1.1)
+    assert queue.claim() is None
+    failed = get(queue, job.id)
+    assert failed.status == "failed"
+
+
+def test_workers_whose_job_was_taken_over_can_not_change_it(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path), lease_seconds=1)
+    job = enqueue(queue)
+
+    first = queue.claim()
+    assert first is not None
+    time.sleep(1.1)
+    second = queue.claim()
+    assert second is not None
+
+    queue.renew(first)
+    queue.report_progress(first, 10, 2)
+    queue.complete(first)
+
+    taken_over = get(queue, job.id)
+    assert taken_over.status == "running"
+    assert taken_over.chunks_parsed == 0
+    assert Path(job.path).exists()
+
+    queue.complete(second)
+    assert get(queue, job.id).status == "completed"
+    assert not Path(job.path).exists()
+
+
+def test_failed_jobs_are_retried_with_backoff(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path))
+    queue.retry_backoff_seconds = 0
+    job = enqueue(queue)
+
+    def handler(job: Job, _on_progress: object) -> None:
+        if job.attempts == 1:
+            raise ConnectionError()
+
+    workers = JobWorkers(queue, handler)
+    claimed = queue.claim()
+    assert claimed is not None
+    workers.run(claimed)
+    assert get(queue, job.id).status == "queued"
+
+    claimed = queue.claim()
+    assert claimed is not None
+    workers.run(claimed)
+    assert get(queue, job.id).status == "completed"
+
+
+def test_workers_survive_failed_purges(mocker: MockerFixture, tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path))
+    purge = mocker.patch.object(queue, "purge", side_effect=sqlite3.OperationalError("database is locked"))
+    workers = JobWorkers(queue, lambda _job, _on_progress: None, poll_interval=0.01)
+    workers.start()
+    try:
+        while not purge.called:
+            time.sleep(0.01)
+        job = enqueue(queue)
+        while get(queue, job.id).status != "completed":
+            time.sleep(0.01)
+    finally:
+        workers.stop()
+    # the purges are not repeated on every poll
+    assert purge.call_count == 1
+
+
+def test_unprocessable_jobs_are_not_retried(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path))
+    job = enqueue(queue)
+
+    def handler(_job: Job, _on_progress: object) -> None:
+        raise HTTPException(status_code=415, detail="File format not supported.")
+
+    claimed = queue.claim()
+    assert claimed is not None
+    JobWorkers(queue, handler).run(claimed)
+
+    failed = get(queue, job.id)
+    assert failed.status == "failed"
+    assert failed.status_code == 415
+
+
+def test_post_job(mocker: MockerFixture, app: FastAPI, tmp_path: Path) -> None:
+    config = get_test_config(dict(job_queue_path=str(tmp_path)))
+    app.dependency_overrides[get_config] = lambda: config
+    mocker.patch("rei_s.services.embeddings_provider.get_embeddings", return_value=FakeEmbeddings(size=1352))
+    mocker.patch("rei_s.services.store_service.get_vector_store", return_value=DevNullVectorStoreAdapter())
+    mocker.patch("rei_s.services.store_service.get_file_store", return_value=None)
+    client = TestClient(app)
+
+    with open("tests/data/birthdays.pdf", "rb") as f:
+        response = client.post(
+            "/jobs",
+            content=f,
+            headers={"bucket": "15", "id": "1", "fileName": "test.pdf", "fileMimeType": "application/pdf"},
+        )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.json()["status"] == "queued"
+
+    # the workers are started by the lifespan of the app, here we run the job ourselves
+    queue = get_job_queue(config)
+    assert queue is not None
+    claimed = queue.claim()
+    assert claimed is not None
+    JobWorkers(queue, lambda job, on_progress: store_service.run_job(config, job, on_progress)).run(claimed)
+
+    response = client.get(f"/jobs/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    assert response.json()["chunksParsed"] > 0
+
+    assert client.get("/jobs/unknown").status_code == 404
+
+
+def test_job_queue_not_configured(app: FastAPI) -> None:
+    app.dependency_overrides[get_config] = get_default_test_config
+    assert TestClient(app).get("/jobs/unknown").status_code == 501
@@ -0,0 +1,69 @@
+import asyncio
+from pathlib import Path
+import shutil
+import subprocess
+import time
+
+from fastapi import FastAPI
+from pytest_mock import MockerFixture
+import pytest
+
+from rei_s.services import libreoffice_pool
+from rei_s.services.libreoffice_pool import LibreOfficePool, _run
+from rei_s.utils import shutdown_libreoffice, startup_libreoffice
+from tests.conftest import get_test_config
+
+
+def test_hanging_process_is_killed() -> None:
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        _run(["sleep", "30"], {}, 0.5)
+    assert time.monotonic() - start < 10
+
+
+def test_stale_profiles_are_removed(mocker: MockerFixture, tmp_path: Path) -> None:
+    mocker.patch.object(LibreOfficePool, "root", tmp_path)
+    mocker.patch.object(libreoffice_pool, "_pid_is_alive", side_effect=lambda pid: pid == 1)
+    (tmp_path / "1" / "x").mkdir(parents=True)
+    (tmp_path / "999999" / "x").mkdir(parents=True)
+
+    LibreOfficePool(size=1)
+
+    assert (tmp_path / "1").exists()
+    assert not (tmp_path / "999999").exists()
+
+
+def test_broken_instance_gets_a_fresh_profile(mocker: MockerFixture, tmp_path: Path) -> None:
+    mocker.patch.object(LibreOfficePool, "root", tmp_path)
+    calls: list[list[str]] = []
+
+    def run(cmd: list[str], env: dict[str, str], timeout: float) -> None:
+        calls.append(cmd)
+        if "--convert-to" in cmd and len([c for c in calls if "--convert-to" in c]) == 1:
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+    mocker.patch.object(libreoffice_pool, "_run", side_effect=run)
+    pool = LibreOfficePool(size=1)
+
+    pdf_paths = [pool.convert("/data/report.docx", "1"), pool.convert("/data/report.docx", "2")]
+    for pdf_path in pdf_paths:
+        shutil.rmtree(Path(pdf_path).parent)
+
+    assert pdf_paths[0].endswith("report.pdf")
+    # the first conversion hangs, so the profile is reset and warmed up again, the second one reuses it
+    assert ["--terminate_after_init" in cmd for cmd in calls] == [True, False, True, False, False]
+
+
+def test_pool_is_only_started_with_libreoffice(mocker: MockerFixture) -> None:
+    app = FastAPI()
+    start = mocker.patch.object(LibreOfficePool, "start")
+
+    mocker.patch("shutil.which", return_value=None)
+    asyncio.run(startup_libreoffice(app, get_test_config()))
+    assert app.state.libreoffice_pool is None
+    asyncio.run(shutdown_libreoffice(app))
+
+    mocker.patch("shutil.which", return_value="/usr/bin/soffice")
+    asyncio.run(startup_libreoffice(app, get_test_config()))
+    assert isinstance(app.state.libreoffice_pool, LibreOfficePool)
+    start.assert_called_once()
@@ -0,0 +1,86 @@
+from threading import Lock
+import time
+from typing import Iterator
+
+import pytest
+
+from rei_s.services.pipeline import run_pipeline
+
+
+def test_pipeline_processes_all_items_in_order() -> None:
+    result: list[int] = []
+
+    run_pipeline(range(10), [lambda x: x * 2, lambda x: x + 1], result.append)
+
+    assert result == [x * 2 + 1 for x in range(10)]
+
+
+def test_pipeline_bounds_items_in_flight() -> None:
+    lock = Lock()
+    produced = 0
+    max_in_flight = 0
+
+    def source() -> Iterator[int]:
+        nonlocal produced, max_in_flight
+        for i in range(20):
+            with lock:
+                produced += 1
+                max_in_flight = max(max_in_flight, produced - len(consumed))
+            yield i
+
+    consumed: list[int] = []
+
+    def slow_sink(x: int) -> None:
+        time.sleep(0.01)
+        consumed.append(x)
+
+    run_pipeline(source(), [lambda x: x], slow_sink, queue_size=1)
+
+    assert consumed == list(range(20))
+    # one item in each queue and one in each step
+    assert max_in_flight <= 5
+
+
+def test_pipeline_reraises_errors_and_closes_source() -> None:
+    closed = False
+
+    def source() -> Iterator[int]:
+        nonlocal closed
+        try:
+            yield from range(1000)
+        finally:
+            closed = True
+
+    def stage(x: int) -> int:
+        if x == 3:
+            raise ValueError("broken")
+        return x
+
+    result: list[int] = []
+    with pytest.raises(ValueError, match="broken"):
+        run_pipeline(source(), [stage], result.append)
+
+    assert result == [0, 1, 2]
+    assert closed
+
+
+def test_pipeline_runs_stage_with_multiple_workers() -> None:
+    lock = Lock()
+    running = 0
+    max_running = 0
+    result: list[int] = []
+
+    def slow_stage(x: int) -> int:
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return x * 2
+
+    run_pipeline(range(20), [slow_stage], result.append, queue_size=4, workers=[4])
+
+    assert sorted(result) == [x * 2 for x in range(20)]
+    assert 1 < max_running <= 4
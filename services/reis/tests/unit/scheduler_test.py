@@ -0,0 +1,74 @@
+from concurrent.futures import Future
+from threading import Event
+
+import pytest
+
+from rei_s.services.scheduler import FairScheduler, Priority
+
+
+def block(scheduler: FairScheduler) -> Event:
+    # occupies the only worker, such that the following tasks are queued
+    release = Event()
+    started = Event()
+
+    def wait() -> None:
+        started.set()
+        release.wait()
+
+    scheduler.submit(wait)
+    started.wait()
+    return release
+
+
+def test_tenants_take_turns() -> None:
+    scheduler = FairScheduler(1)
+    release = block(scheduler)
+
+    order: list[str] = []
+    futures = [scheduler.schedule("interactive", tenant, order.append, tenant) for tenant in ["a", "a", "a", "b"]]
+    release.set()
+    for future in futures:
+        future.result()
+    scheduler.shutdown()
+
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_priority_classes_share_the_workers_by_weight() -> None:
+    scheduler = FairScheduler(1, {"interactive": 2, "bulk": 1})
+    release = block(scheduler)
+
+    order: list[Priority] = []
+    tasks: list[Priority] = ["bulk"] * 3 + ["interactive"] * 4
+    futures = [scheduler.schedule(priority, "a", order.append, priority) for priority in tasks]
+    release.set()
+    for future in futures:
+        future.result()
+    scheduler.shutdown()
+
+    assert order == ["interactive", "bulk", "interactive", "interactive", "bulk", "interactive", "bulk"]
+
+
+def test_exceptions_are_passed_to_the_future() -> None:
+    scheduler = FairScheduler(2)
+
+    def fail() -> None:
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError, match="failed"):
+        scheduler.submit(fail).result()
+    assert scheduler.submit(sum, [1, 2]).result() == 3
+    scheduler.shutdown()
+
+
+def test_shutdown_cancels_waiting_tasks() -> None:
+    scheduler = FairScheduler(1)
+    release = block(scheduler)
+
+    future: Future = scheduler.schedule("bulk", "a", print)
+    release.set()
+    scheduler.shutdown(cancel_futures=True)
+
+    assert future.cancelled()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(print)
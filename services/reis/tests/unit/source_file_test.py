@@ -0,0 +1,29 @@
+import hashlib
+
+from rei_s.types.source_file import SourceFile
+
+
+def test_mapped() -> None:
+    file = SourceFile.new_temporary_file("Grüße".encode())
+    try:
+        with file.mapped() as data:
+            assert data[:2] == b"Gr"
+            assert len(data) == file.size
+        assert file.text() == "Grüße"
+        assert file.content_hash == hashlib.sha256("Grüße".encode()).hexdigest()
+        with file.open() as f:
+            assert f.read() == file.buffer
+    finally:
+        file.delete()
+
+
+def test_mapped_empty_file() -> None:
+    file = SourceFile.new_temporary_file()
+    open(file.path, "wb").close()
+    try:
+        with file.mapped() as data:
+            assert len(data) == 0
+        assert file.text() == ""
+        assert file.content_hash == hashlib.sha256(b"").hexdigest()
+    finally:
+        file.delete()
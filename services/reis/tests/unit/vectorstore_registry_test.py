@@ -0,0 +1,85 @@
+from threading import Event, Thread
+from typing import Any
+
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_core.embeddings import Embeddings
+from pytest_mock import MockerFixture
+
+from rei_s.config import Config
+from rei_s.services.vectorstore_registry import VectorStoreRegistry
+from rei_s.services.vectorstores.devnull_store import DevNullVectorStoreAdapter
+from tests.conftest import get_test_config
+
+
+def test_vector_store_is_reused() -> None:
+    registry = VectorStoreRegistry()
+    calls: list[Config] = []
+
+    def factory(config: Config) -> Embeddings:
+        calls.append(config)
+        return FakeEmbeddings(size=8)
+
+    config = get_test_config()
+    store = registry.get_vector_store(config, "index", factory)
+
+    assert isinstance(store, DevNullVectorStoreAdapter)
+    assert registry.get_vector_store(config, "index", factory) is store
+    assert registry.get_vector_store(config, "other", factory) is not store
+    # the embeddings client is shared between indexes of the same configuration
+    assert len(calls) == 1
+
+
+def test_slow_creations_do_not_block_other_keys(mocker: MockerFixture) -> None:
+    registry = VectorStoreRegistry()
+    started = Event()
+    released = Event()
+    get_vectorstore = mocker.patch("rei_s.services.vectorstore_provider.get_vectorstore")
+
+    def slow(config: Config, embeddings: Embeddings, index_name: str | None, vector_dimension: int | None) -> Any:
+        if index_name == "slow":
+            started.set()
+            released.wait(5)
+        return mocker.Mock()
+
+    get_vectorstore.side_effect = slow
+    config = get_test_config()
+
+    def get(index_name: str) -> None:
+        registry.get_vector_store(config, index_name, lambda _: FakeEmbeddings(size=8))
+        registry.get_embeddings_limiter(config, lambda _: FakeEmbeddings(size=8))
+
+    slow_thread = Thread(target=get, args=("slow",))
+    slow_thread.start()
+    try:
+        assert started.wait(5)
+        # neither the other indexes nor the embeddings wait for the slow creation
+        fast_thread = Thread(target=get, args=("fast",))
+        fast_thread.start()
+        fast_thread.join(1)
+        assert not fast_thread.is_alive()
+    finally:
+        released.set()
+        slow_thread.join()
+
+
+def test_vector_dimension_is_cached(mocker: MockerFixture) -> None:
+    registry = VectorStoreRegistry()
+    embeddings = FakeEmbeddings(size=8)
+    spy = mocker.spy(FakeEmbeddings, "embed_query")
+
+    config = get_test_config()
+    assert registry.get_vector_dimension(config, lambda _: embeddings) == 8
+    assert registry.get_vector_dimension(config, lambda _: embeddings) == 8
+    assert spy.call_count == 1
+
+
+def test_close_releases_vector_stores(mocker: MockerFixture) -> None:
+    registry = VectorStoreRegistry()
+    config = get_test_config()
+    store = registry.get_vector_store(config, None, lambda _: FakeEmbeddings(size=8))
+    close = mocker.spy(store, "close")
+
+    registry.close()
+
+    close.assert_called_once()
+    assert registry.get_vector_store(config, None, lambda _: FakeEmbeddings(size=8)) is not store
@@ -0,0 +1,129 @@
+import os
+import time
+from typing import Any, Generator, Iterator
+
+from langchain_core.documents import Document
+import pytest
+from pytest_mock import MockerFixture
+
+from rei_s.services import store_service, worker_pool
+from rei_s.services.formats.pdf_provider import PdfProvider
+from rei_s.services.formats.utils import ProcessingError
+from rei_s.services.worker_pool import WorkerCrashedError, WorkerPool, WorkerTimeoutError
+from rei_s.types.source_file import SourceFile
+from tests.conftest import get_test_config
+
+
+# the tasks need to be importable by the worker processes, so they are defined on module level
+def get_pid() -> Iterator[int]:
+    yield os.getpid()
+
+
+def count(n: int) -> Iterator[int]:
+    yield from range(n)
+
+
+def fail() -> Iterator[int]:
+    raise ProcessingError("broken file", 422)
+    yield 0
+
+
+def crash() -> Iterator[int]:
+    os._exit(1)
+    yield 0
+
+
+def hang() -> Iterator[int]:
+    time.sleep(60)
+    yield 0
+
+
+def trickle() -> Iterator[int]:
+    for i in range(60):
+        time.sleep(0.5)
+        yield i
+
+
+@pytest.fixture
+def pool() -> Generator[WorkerPool, None, None]:
+    pool = WorkerPool()
+    pool.start(get_test_config(dict(worker_pool_size=1, worker_max_tasks_per_process=3, worker_task_timeout=5)))
+    yield pool
+    pool.close()
+
+
+def test_worker_is_reused_and_recycled(pool: WorkerPool) -> None:
+    first = list(pool.run(get_pid))
+    assert list(pool.run(count, 3)) == [0, 1, 2]
+    assert list(pool.run(get_pid)) == first
+
+    # the worker is replaced after 3 tasks
+    assert list(pool.run(get_pid)) != first
+
+
+def test_worker_errors_are_reraised(pool: WorkerPool) -> None:
+    with pytest.raises(ProcessingError) as e:
+        list(pool.run(fail))
+    assert e.value.status == 422
+
+    assert list(pool.run(count, 1)) == [0]
+
+
+def test_crashed_worker_is_replaced(pool: WorkerPool) -> None:
+    with pytest.raises(WorkerCrashedError):
+        list(pool.run(crash))
+
+    assert list(pool.run(count, 1)) == [0]
+
+
+def test_hanging_worker_is_killed() -> None:
+    pool = WorkerPool()
+    pool.start(get_test_config(dict(worker_pool_size=1, worker_task_timeout=5)))
+    try:
+        with pytest.raises(WorkerTimeoutError):
+            list(pool.run(hang))
+
+        # the timeout applies to the whole task, not to every item
+        with pytest.raises(WorkerTimeoutError):
+            list(pool.run(trickle))
+
+        assert list(pool.run(count, 1)) == [0]
+    finally:
+        pool.close()
+
+
+def test_pdf_pages_are_processed_in_parallel(mocker: MockerFixture) -> None:
+    config = get_test_config(dict(worker_pool_size=2, filesize_threshold=1, worker_pages_per_task=1))
+    pool = WorkerPool()
+    pool.start(config)
+    mocker.patch.object(worker_pool, "pool", pool)
+    run = mocker.spy(pool, "run")
+    try:
+        source_file = SourceFile(path="tests/data/birthdays.pdf", mime_type="application/pdf", file_name="text.pdf")
+        pdf = PdfProvider()
+
+        docs = list(store_service.iter_chunks_synchronously(config, pdf, source_file, None))
+
+        assert run.call_count == 2
+        assert docs == pdf.process_file(source_file)
+    finally:
+        pool.close()
+
+
+def test_page_ranges_are_submitted_when_finished_ones_were_consumed(mocker: MockerFixture) -> None:
+    started: list[range] = []
+
+    def run(
+        function: Any, format_: Any, file: Any, chunk_size: Any, batch_size: Any, pages: range
+    ) -> Iterator[list[Document]]:
+        started.append(pages)
+        yield [Document(page_content=str(pages.start))]
+
+    mocker.patch.object(worker_pool, "pool", mocker.Mock(size=2, run=run))
+    page_ranges = [range(i, i + 1) for i in range(4)]
+    chunks = store_service.iter_page_chunks_in_parallel(mocker.Mock(), mocker.Mock(), None, 1, page_ranges)
+
+    assert next(chunks).page_content == "0"
+    assert range(3, 4) not in started
+    assert [chunk.page_content for chunk in chunks] == ["1", "2", "3"]
+    assert sorted(started, key=lambda pages: pages.start) == page_ranges